@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Geocoder
+Purpose: Fill latitude/longitude/geocoded/geocoded_at (002_add_geocoding_fields) for all un-geocoded clinics
+
+Lookup order per clinic:
+  1. Local gazetteer - ZIP centroid, then city/state centroid (Census Gazetteer files)
+  2. Result cache keyed by normalized address (.cache/geocode_cache.json)
+  3. Remote geocoder - Nominatim at 1 req/sec (same query as dashboard/src/lib/geocoding.ts),
+     or a local stub with --stub
+
+Gazetteer files (download once into data/gazetteer/ from
+https://www.census.gov/geographies/reference-files/time-series/geo/gazetteer-files.html):
+  *_Gaz_zcta_national.txt    ZIP code tabulation area centroids
+  *_Gaz_place_national.txt   City / town / CDP centroids
+
+Usage:
+  python batch_geocoder.py                       # all clinics with geocoded = false
+  python batch_geocoder.py --no-remote           # gazetteer + cache only
+  python batch_geocoder.py --stub --synthetic 50000 --dry-run
+"""
+
+import os
+import re
+import sys
+import glob
+import asyncio
+import hashlib
+import argparse
+import urllib.parse
+from datetime import datetime, timezone
+
+import bench_utils
+import http_utils
+from client_utils import TokenBucket, TTLCache
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_GAZETTEER_DIR = os.path.join('data', 'gazetteer')
+DEFAULT_CACHE_FILE = os.path.join('.cache', 'geocode_cache.json')
+DEFAULT_TTL_DAYS = 180
+
+NOMINATIM_URL = 'https://nominatim.openstreetmap.org/search'
+USER_AGENT = 'USAC-RHC-Dashboard/1.0'  # Required by Nominatim
+
+# Census place names carry the legal/statistical area type as a suffix ("Bethel city")
+PLACE_SUFFIX = re.compile(r'\s+(city|town|village|borough|municipality|CDP|city and borough|'
+                          r'consolidated government|metro government|unified government)(\s*\(.*\))?$',
+                          re.IGNORECASE)
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'[^a-z0-9 ]', ' ', str(text or '').lower()).split())
+
+
+def zip5(value):
+    digits = re.sub(r'\D', '', str(value or ''))
+    return digits[:5].zfill(5) if digits else ''
+
+
+def address_key(clinic):
+    """Normalized address used as the cache key"""
+    return '|'.join((normalize(clinic.get('address')), normalize(clinic.get('city')),
+                     normalize(clinic.get('state')), zip5(clinic.get('zip'))))
+
+
+class GeocodeCache(TTLCache):
+    """TTLCache keyed by normalized address; values are [lat, lon] or [] for "not found" """
+
+    @staticmethod
+    def key(clinic):
+        return address_key(clinic)
+
+
+class Gazetteer:
+    """ZIP and city/state centroids loaded from Census Gazetteer files"""
+
+    def __init__(self):
+        self.zips = {}
+        self.places = {}
+
+    @staticmethod
+    def _read_tsv(path):
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            header = [h.strip() for h in f.readline().split('\t')]
+            for line in f:
+                yield dict(zip(header, (v.strip() for v in line.split('\t'))))
+
+    @classmethod
+    def load(cls, directory=DEFAULT_GAZETTEER_DIR):
+        gaz = cls()
+        for path in glob.glob(os.path.join(directory, '*zcta*.txt')):
+            for row in cls._read_tsv(path):
+                gaz.zips[row['GEOID'].zfill(5)] = (float(row['INTPTLAT']), float(row['INTPTLONG']))
+        for path in glob.glob(os.path.join(directory, '*place*.txt')):
+            for row in cls._read_tsv(path):
+                name = normalize(PLACE_SUFFIX.sub('', row['NAME']))
+                key = (name, row['USPS'].lower())
+                # Keep the first entry when a name repeats within a state
+                gaz.places.setdefault(key, (float(row['INTPTLAT']), float(row['INTPTLONG'])))
+        return gaz
+
+    def __len__(self):
+        return len(self.zips) + len(self.places)
+
+    def lookup(self, clinic):
+        """(lat, lon, source) from the ZIP centroid, else the city centroid, else None"""
+        point = self.zips.get(zip5(clinic.get('zip')))
+        if point:
+            return point[0], point[1], 'zip'
+        point = self.places.get((normalize(clinic.get('city')), normalize(clinic.get('state'))))
+        if point:
+            return point[0], point[1], 'city'
+        return None
+
+
+class NominatimGeocoder:
+    """OpenStreetMap Nominatim, 1 request/sec per their usage policy"""
+
+    def __init__(self, rate_per_sec=1.0, url=NOMINATIM_URL):
+        self.bucket = TokenBucket(rate_per_sec, burst=1)
+        self.url = url
+
+    async def lookup(self, clinic):
+        await self.bucket.acquire()
+        return await asyncio.to_thread(self.fetch, clinic)
+
+    def fetch(self, clinic):
+        parts = [clinic.get(k) for k in ('address', 'city', 'state', 'zip') if clinic.get(k)]
+        if not parts:
+            return []
+        query = urllib.parse.urlencode({'q': ', '.join(parts), 'format': 'json', 'limit': '1',
+                                        'countrycodes': 'us'})
+        resp = http_utils.request('GET', f"{self.url}?{query}", headers={'User-Agent': USER_AGENT})
+        if not resp.ok:
+            raise RuntimeError(f'nominatim HTTP {resp.status}')
+        data = resp.json()
+        return [float(data[0]['lat']), float(data[0]['lon'])] if data else []
+
+
+class StubGeocoder(NominatimGeocoder):
+    """Deterministic local stand-in: a point inside the continental US derived from the address"""
+
+    def __init__(self, rate_per_sec=200.0, latency_ms=20):
+        super().__init__(rate_per_sec)
+        self.bucket = TokenBucket(rate_per_sec)
+        self.latency_ms = latency_ms
+
+    async def lookup(self, clinic):
+        await self.bucket.acquire()
+        await asyncio.sleep(self.latency_ms / 1000)
+        return self.fetch(clinic)
+
+    def fetch(self, clinic):
+        digest = hashlib.sha256(address_key(clinic).encode('utf-8')).digest()
+        lat = 25 + int.from_bytes(digest[:4], 'big') / 2 ** 32 * 24
+        lon = -124 + int.from_bytes(digest[4:8], 'big') / 2 ** 32 * 57
+        return [round(lat, 6), round(lon, 6)]
+
+
+class BatchGeocoder:
+    """Resolve clinics in chunks: gazetteer, then cache, then one remote call per distinct address"""
+
+    def __init__(self, gazetteer, cache, remote=None, workers=4, writer=None):
+        self.gazetteer = gazetteer
+        self.cache = cache
+        self.remote = remote
+        self.workers = workers
+        self.writer = writer
+        self.sources = {'zip': 0, 'city': 0, 'cache': 0, 'remote': 0, 'not_found': 0, 'error': 0}
+        self.remote_calls = 0
+        self.written = 0
+
+    async def _remote_many(self, clinics_by_key):
+        semaphore = asyncio.Semaphore(self.workers)
+        results = {}
+
+        async def one(key, clinic):
+            async with semaphore:
+                try:
+                    results[key] = await self.remote.lookup(clinic)
+                    self.cache.put(clinic, results[key])
+                except Exception as e:
+                    results[key] = e
+                self.remote_calls += 1
+
+        await asyncio.gather(*(one(k, c) for k, c in clinics_by_key.items()))
+        return results
+
+    async def run_chunk(self, clinics):
+        now = datetime.now(timezone.utc).isoformat()
+        rows = []
+        pending = {}
+        for clinic in clinics:
+            hit = self.gazetteer.lookup(clinic)
+            if hit:
+                self.sources[hit[2]] += 1
+                rows.append({'id': clinic['id'], 'latitude': hit[0], 'longitude': hit[1]})
+                continue
+            cached = self.cache.get(clinic)
+            if cached is not None:
+                self.sources['cache' if cached else 'not_found'] += 1
+                if cached:
+                    rows.append({'id': clinic['id'], 'latitude': cached[0], 'longitude': cached[1]})
+                continue
+            pending.setdefault(address_key(clinic), []).append(clinic)
+
+        if pending and self.remote is not None:
+            results = await self._remote_many({k: group[0] for k, group in pending.items()})
+            for key, group in pending.items():
+                result = results[key]
+                if isinstance(result, Exception):
+                    self.sources['error'] += len(group)
+                elif result:
+                    self.sources['remote'] += len(group)
+                    rows.extend({'id': c['id'], 'latitude': result[0], 'longitude': result[1]} for c in group)
+                else:
+                    self.sources['not_found'] += len(group)
+        elif pending:
+            self.sources['not_found'] += sum(len(group) for group in pending.values())
+
+        for row in rows:
+            row['geocoded'] = True
+            row['geocoded_at'] = now
+        if self.writer and rows:
+            self.writer(rows)
+        self.written += len(rows)
+        return rows
+
+    async def run(self, chunks, on_chunk=None):
+        """Process every chunk in one event loop (the rate limiter is bound to it)"""
+        total = 0
+        for chunk in chunks:
+            await self.run_chunk(chunk)
+            total += len(chunk)
+            if on_chunk:
+                on_chunk(total)
+        return total
+
+    def cache_hit_ratio(self):
+        lookups = self.sources['cache'] + self.remote_calls
+        return self.sources['cache'] / lookups if lookups else 0.0
+
+
+def iter_ungeocoded(conn, chunk_size):
+    """Un-geocoded clinics in chunks (uses the idx_clinics_geocoded partial index)"""
+    import db_utils
+    chunk = []
+    for row in db_utils.iter_rows(conn, f"""
+        SELECT id, address, city, state, zip FROM {db_utils.CLINICS_TABLE}
+        WHERE geocoded = false OR geocoded IS NULL
+    """, name='geocoder_cursor'):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def make_db_writer(conn):
+    """Bulk write-back over a second connection (the first one holds the server-side cursor)"""
+    import db_utils
+
+    def write(rows):
+        db_utils.bulk_update(conn, db_utils.CLINICS_TABLE, rows,
+                             ['latitude', 'longitude', 'geocoded', 'geocoded_at'],
+                             casts={'id': 'uuid', 'latitude': 'numeric', 'longitude': 'numeric',
+                                    'geocoded_at': 'timestamptz'})
+    return write
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Batch geocode clinics (gazetteer, cache, then remote)')
+    parser.add_argument('--gazetteer-dir', default=DEFAULT_GAZETTEER_DIR)
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE)
+    parser.add_argument('--ttl-days', type=float, default=DEFAULT_TTL_DAYS)
+    parser.add_argument('--chunk-size', type=int, default=5000, help='Clinics per bulk write')
+    parser.add_argument('--rps', type=float, default=1.0, help='Remote geocoder requests/sec')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent remote requests')
+    parser.add_argument('--no-remote', action='store_true', help='Gazetteer + cache only')
+    parser.add_argument('--stub', action='store_true', help='Use the local stub instead of Nominatim')
+    parser.add_argument('--synthetic', type=int, default=0, help='Geocode N synthetic clinics (no DB)')
+    parser.add_argument('--dry-run', action='store_true', help='Skip the DB write-back')
+    args = parser.parse_args()
+
+    gazetteer = Gazetteer.load(args.gazetteer_dir)
+    if not len(gazetteer):
+        print(f"[WARNING] No gazetteer files in {args.gazetteer_dir}; every clinic goes to cache/remote")
+    else:
+        print(f"[GAZETTEER] {len(gazetteer.zips):,} ZIP and {len(gazetteer.places):,} place centroids")
+
+    remote = None
+    if not args.no_remote:
+        remote = StubGeocoder() if args.stub else NominatimGeocoder(rate_per_sec=args.rps)
+    cache = GeocodeCache(args.cache_file, ttl_seconds=args.ttl_days * 86400)
+
+    read_conn = write_conn = None
+    if args.synthetic:
+        import synthetic_data
+        rows = synthetic_data.synthetic_clinic_rows(args.synthetic)
+        for i, row in enumerate(rows):
+            row['id'] = f"synthetic-{i}"
+        chunks = (rows[i:i + args.chunk_size] for i in range(0, len(rows), args.chunk_size))
+    else:
+        import db_utils
+        read_conn = db_utils.get_connection()
+        chunks = iter_ungeocoded(read_conn, args.chunk_size)
+        if not args.dry_run:
+            write_conn = db_utils.get_connection()
+
+    geocoder = BatchGeocoder(gazetteer, cache, remote, workers=args.workers,
+                             writer=make_db_writer(write_conn) if write_conn is not None else None)
+
+    def progress(total):
+        cache.save()
+        print(f"[PROGRESS] {total:,} clinics, {geocoder.written:,} geocoded")
+
+    with bench_utils.Stopwatch() as sw:
+        try:
+            total = asyncio.run(geocoder.run(chunks, on_chunk=progress))
+        finally:
+            cache.save()
+            for conn in (read_conn, write_conn):
+                if conn is not None:
+                    conn.close()
+
+    print(f"[SUCCESS] {geocoder.written:,}/{total:,} geocoded in {sw.seconds:.1f}s "
+          f"({total / sw.seconds if sw.seconds else 0:,.1f} clinics/sec)")
+    print("[SOURCES] " + ', '.join(f"{k}={v:,}" for k, v in geocoder.sources.items()))
+    print(f"[CACHE] hit ratio {geocoder.cache_hit_ratio():.1%} "
+          f"({geocoder.sources['cache']:,} hits, {geocoder.remote_calls:,} remote calls)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Small benchmark helpers shared by the Python tooling
+Purpose: Consistent latency percentiles and throughput reporting across jobs
+"""
+
+import math
+import time
+import subprocess
+import tracemalloc
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile (pct in 0-100) of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def latency_summary(latencies_ms):
+    """p50/p95/p99/max summary for a list of latencies in milliseconds"""
+    return {
+        'count': len(latencies_ms),
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'max_ms': round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+
+def print_latency_summary(label, latencies_ms):
+    """Print a one-line latency summary in the [STATS] format the scripts use"""
+    s = latency_summary(latencies_ms)
+    print(f"[STATS] {label}: n={s['count']} p50={s['p50_ms']}ms "
+          f"p95={s['p95_ms']}ms p99={s['p99_ms']}ms max={s['max_ms']}ms")
+    return s
+
+
+class Stopwatch:
+    """Context manager measuring wall time: `with Stopwatch() as sw: ...; sw.seconds`"""
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        self.seconds = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._start
+        return False
+
+
+def measure_memory(build):
+    """Call build() and return (result, bytes allocated while building it)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def git_build_id():
+    """Short HEAD sha for report names (None outside a git checkout)"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
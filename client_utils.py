@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Client-side throttling and caching helpers shared by the Python tooling (stdlib only)
+Purpose: One token bucket and one persisted TTL cache for jobs that call rate-limited APIs
+"""
+
+import os
+import json
+import time
+import asyncio
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+
+
+class TokenBucket:
+    """Async token bucket: `rate` tokens/sec, holding at most `burst` tokens"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TTLCache:
+    """Dict cache with per-entry expiry, optionally persisted as JSON; keyed by clinic name/city/state unless key() is overridden"""
+
+    def __init__(self, path=None, ttl_seconds=DEFAULT_TTL_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    @staticmethod
+    def key(clinic):
+        parts = (clinic.get('clinic_name'), clinic.get('city'), clinic.get('state'))
+        return '|'.join(' '.join(str(p or '').lower().split()) for p in parts)
+
+    def get(self, clinic):
+        entry = self.entries.get(self.key(clinic))
+        if entry and entry['expires_at'] > time.time():
+            self.hits += 1
+            return entry['value']
+        self.misses += 1
+        return None
+
+    def put(self, clinic, value):
+        self.entries[self.key(clinic)] = {'expires_at': time.time() + self.ttl_seconds, 'value': value}
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        live = {k: v for k, v in self.entries.items() if v['expires_at'] > now}
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(live, f)
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clinic Aggregates Materialization
+Purpose: Keep clinic_hcp_aggregates (one row per HCP number / manual group) in sync with
+clinics_pending_review, so the dashboard can page over pre-aggregated records instead of
+pulling every filing and running clinic-aggregation.ts in the browser.
+
+Each run:
+  1. finds group keys touched since the last watermark (clinics.updated_at); a changed row
+     marks both its current key and its plain HCP key, so clinics moved into a manual
+     group also shrink their old HCP aggregate; manual groups whose stored size differs from
+     their current member count are added too, so the group a clinic left is recomputed
+  2. recomputes only those keys in SQL (funding by year, application numbers, locations,
+     base clinic = newest filing) and upserts them
+  3. drops aggregates whose keys no longer have any rows
+
+Deleted clinics are only noticed when another row of the same key changes; run --full
+after bulk deletes. Requires database/migrations/add_clinic_hcp_aggregates.sql.
+
+Usage:
+  python clinic_aggregates.py                          # incremental
+  python clinic_aggregates.py --full                   # rebuild every aggregate
+  python clinic_aggregates.py --benchmark --filings 50000   # local Postgres only
+"""
+
+import sys
+import json
+import argparse
+from datetime import timedelta
+
+import bench_utils
+import db_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+JOB_NAME = 'clinic_aggregates'
+AGGREGATES_TABLE = 'clinic_hcp_aggregates'
+
+# Re-scan this much before the watermark so rows committed late are still picked up
+WATERMARK_OVERLAP = timedelta(minutes=5)
+
+# Group keys per refresh statement
+KEYS_PER_STATEMENT = 5000
+
+CHANGED_KEYS_SQL = f"""
+    SELECT k.group_key, max(c.updated_at) AS latest
+    FROM {db_utils.CLINICS_TABLE} c
+    CROSS JOIN LATERAL (VALUES (clinic_aggregate_key(c.hcp_number, c.belongs_to_group_id)),
+                               ('hcp:' || COALESCE(c.hcp_number, ''))) AS k(group_key)
+    WHERE %(since)s::timestamptz IS NULL OR c.updated_at > %(since)s
+    GROUP BY 1
+"""
+
+# Row order inside a group matches use-clinics.ts (filing_date DESC, created_at DESC)
+REFRESH_KEYS_SQL = f"""
+    WITH src AS (
+        SELECT clinic_aggregate_key(c.hcp_number, c.belongs_to_group_id) AS group_key, c.*
+        FROM {db_utils.CLINICS_TABLE} c
+        WHERE clinic_aggregate_key(c.hcp_number, c.belongs_to_group_id) = ANY(%(keys)s::text[])
+    ),
+    funding AS (
+        SELECT s.group_key, f->>'year' AS year, sum(COALESCE((f->>'amount')::numeric, 0)) AS amount
+        FROM src s
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(s.historical_funding) = 'array' THEN s.historical_funding
+                 ELSE '[]'::jsonb END) AS f
+        WHERE f->>'year' IS NOT NULL
+        GROUP BY 1, 2
+    ),
+    funding_totals AS (
+        SELECT group_key, jsonb_object_agg(year, amount) AS aggregated_funding, sum(amount) AS total_funding
+        FROM funding
+        GROUP BY 1
+    ),
+    base AS (
+        SELECT DISTINCT ON (group_key)
+               group_key, id, hcp_number, belongs_to_group_id, clinic_name, state,
+               to_jsonb(src) - 'group_key' - 'historical_funding' - 'enrichment_data' AS base_clinic
+        FROM src
+        ORDER BY group_key, filing_date DESC NULLS LAST, created_at DESC NULLS LAST
+    ),
+    agg AS (
+        SELECT group_key,
+               count(*) AS application_count,
+               COALESCE(array_agg(application_number ORDER BY filing_date DESC NULLS LAST, created_at DESC NULLS LAST)
+                        FILTER (WHERE COALESCE(application_number, '') <> ''), '{{}}') AS application_numbers,
+               jsonb_agg(jsonb_build_object(
+                   'address', COALESCE(address, ''), 'city', COALESCE(city, ''),
+                   'state', COALESCE(state, ''), 'zip', COALESCE(zip, ''),
+                   'application_number', application_number, 'filing_date', filing_date)
+                   ORDER BY filing_date DESC NULLS LAST, created_at DESC NULLS LAST) AS locations,
+               max(filing_date)::date AS latest_filing_date,
+               bool_and(COALESCE(processed, false)) AS all_processed,
+               bool_or(notes IS NOT NULL AND notes <> '[]'::jsonb) AS has_notes,
+               max(updated_at) AS source_updated_at
+        FROM src
+        GROUP BY 1
+    )
+    INSERT INTO {AGGREGATES_TABLE}
+        (group_key, hcp_number, belongs_to_group_id, base_clinic_id, base_clinic, clinic_name, state,
+         latest_filing_date, application_count, application_numbers, aggregated_funding, total_funding,
+         locations, all_processed, has_notes, source_updated_at, refreshed_at)
+    SELECT a.group_key, b.hcp_number, b.belongs_to_group_id, b.id, b.base_clinic, b.clinic_name, b.state,
+           a.latest_filing_date, a.application_count, a.application_numbers,
+           COALESCE(f.aggregated_funding, '{{}}'::jsonb), COALESCE(f.total_funding, 0),
+           a.locations, a.all_processed, a.has_notes, a.source_updated_at, now()
+    FROM agg a
+    JOIN base b USING (group_key)
+    LEFT JOIN funding_totals f USING (group_key)
+    ON CONFLICT (group_key) DO UPDATE SET
+        hcp_number = EXCLUDED.hcp_number,
+        belongs_to_group_id = EXCLUDED.belongs_to_group_id,
+        base_clinic_id = EXCLUDED.base_clinic_id,
+        base_clinic = EXCLUDED.base_clinic,
+        clinic_name = EXCLUDED.clinic_name,
+        state = EXCLUDED.state,
+        latest_filing_date = EXCLUDED.latest_filing_date,
+        application_count = EXCLUDED.application_count,
+        application_numbers = EXCLUDED.application_numbers,
+        aggregated_funding = EXCLUDED.aggregated_funding,
+        total_funding = EXCLUDED.total_funding,
+        locations = EXCLUDED.locations,
+        all_processed = EXCLUDED.all_processed,
+        has_notes = EXCLUDED.has_notes,
+        source_updated_at = EXCLUDED.source_updated_at,
+        refreshed_at = now()
+"""
+
+# Manual groups whose stored size no longer matches their members: a clinic left (or was deleted),
+# and its row no longer carries the old group id, so CHANGED_KEYS_SQL cannot see that key
+STALE_GROUP_KEYS_SQL = f"""
+    SELECT a.group_key
+    FROM {AGGREGATES_TABLE} a
+    LEFT JOIN (
+        SELECT belongs_to_group_id, count(*) AS members
+        FROM {db_utils.CLINICS_TABLE}
+        WHERE belongs_to_group_id IS NOT NULL
+        GROUP BY 1
+    ) g ON g.belongs_to_group_id = a.belongs_to_group_id
+    WHERE a.belongs_to_group_id IS NOT NULL
+      AND a.application_count <> COALESCE(g.members, 0)
+"""
+
+DELETE_EMPTY_SQL = f"""
+    DELETE FROM {AGGREGATES_TABLE} a
+    WHERE a.group_key = ANY(%(keys)s::text[])
+      AND NOT EXISTS (
+          SELECT 1 FROM {db_utils.CLINICS_TABLE} c
+          WHERE clinic_aggregate_key(c.hcp_number, c.belongs_to_group_id) = a.group_key
+      )
+"""
+
+
+def refresh_keys(conn, keys, commit=True):
+    """Recompute the given group keys; returns (upserted, deleted)
+
+    commit=False leaves every chunk in the caller's open transaction.
+    """
+    upserted = deleted = 0
+    for i in range(0, len(keys), KEYS_PER_STATEMENT):
+        chunk = keys[i:i + KEYS_PER_STATEMENT]
+        with conn.cursor() as cur:
+            cur.execute(REFRESH_KEYS_SQL, {'keys': chunk})
+            upserted += cur.rowcount
+            cur.execute(DELETE_EMPTY_SQL, {'keys': chunk})
+            deleted += cur.rowcount
+        if commit:
+            conn.commit()
+    return upserted, deleted
+
+
+def run_refresh(conn, full=False):
+    """One incremental pass; returns a summary dict"""
+    watermark = None if full else db_utils.get_watermark(conn, JOB_NAME)
+    since = watermark - WATERMARK_OVERLAP if watermark else None
+
+    summary = {'keys': 0, 'upserted': 0, 'deleted': 0}
+    with bench_utils.Stopwatch() as sw:
+        if full:
+            # TRUNCATE, recompute and watermark commit together so readers never see an empty table
+            with conn.cursor() as cur:
+                cur.execute(f"TRUNCATE {AGGREGATES_TABLE}")
+        changed = db_utils.fetch_all(conn, CHANGED_KEYS_SQL, {'since': since})
+        stale = [] if full else db_utils.fetch_all(conn, STALE_GROUP_KEYS_SQL)
+        if changed or stale:
+            keys = sorted({r['group_key'] for r in changed} | {r['group_key'] for r in stale})
+            latest = max((r['latest'] for r in changed if r['latest']), default=watermark)
+            summary['upserted'], summary['deleted'] = refresh_keys(conn, keys, commit=not full)
+            if latest:
+                db_utils.set_watermark(conn, JOB_NAME, latest, commit=not full)
+            summary['keys'] = len(keys)
+        if full:
+            conn.commit()
+    summary['seconds'] = round(sw.seconds, 3)
+    return summary
+
+
+def aggregate_clinics_by_hcp(clinics):
+    """Python port of aggregateClinicsByHCP (clinic-aggregation.ts), used as the benchmark baseline"""
+    grouped = {}
+    manual = {}
+    for clinic in clinics:
+        if clinic.get('belongs_to_group_id'):
+            manual.setdefault(f"group-{clinic['belongs_to_group_id']}", []).append(clinic)
+        else:
+            grouped.setdefault(clinic.get('hcp_number'), []).append(clinic)
+    grouped.update(manual)
+
+    result = []
+    for group in grouped.values():
+        funding_by_year = {}
+        total = 0
+        for clinic in group:
+            for item in clinic.get('historical_funding') or []:
+                amount = item.get('amount') or 0
+                funding_by_year[item.get('year')] = funding_by_year.get(item.get('year'), 0) + amount
+                total += amount
+        result.append(dict(
+            group[0],
+            application_count=len(group),
+            application_numbers=[c['application_number'] for c in group if c.get('application_number')],
+            aggregated_funding=funding_by_year,
+            total_funding=total,
+            locations=[{'address': c.get('address') or '', 'city': c.get('city') or '',
+                        'state': c.get('state') or '', 'zip': c.get('zip') or '',
+                        'application_number': c.get('application_number'),
+                        'filing_date': c.get('filing_date')} for c in group],
+        ))
+    return result
+
+
+def payload_bytes(rows):
+    """Approximate PostgREST JSON response size"""
+    return len(json.dumps(rows, default=str, separators=(',', ':')).encode('utf-8'))
+
+
+BENCH_SCHEMA_SQL = """
+    DROP SCHEMA IF EXISTS aggregates_bench CASCADE;
+    CREATE SCHEMA aggregates_bench;
+    SET search_path TO aggregates_bench, public;
+    CREATE TABLE clinic_groups (id uuid PRIMARY KEY);
+    CREATE TABLE clinics_pending_review (
+        id uuid PRIMARY KEY DEFAULT gen_random_uuid(),
+        hcp_number text, application_number text, clinic_name text, address text, city text, state text,
+        zip text, contact_phone text, contact_email text, mail_contact_first_name text,
+        mail_contact_last_name text, mail_contact_org_name text, mail_contact_phone text,
+        mail_contact_email text, mail_contact_is_consultant boolean, contact_is_consultant boolean,
+        filing_date timestamptz, form_465_hash text UNIQUE, funding_year text, application_type text,
+        request_for_services text, service_type text, historical_funding jsonb DEFAULT '[]'::jsonb,
+        processed boolean DEFAULT false, notes jsonb DEFAULT '[]'::jsonb,
+        belongs_to_group_id uuid REFERENCES clinic_groups(id) ON DELETE SET NULL,
+        created_at timestamptz DEFAULT now(), updated_at timestamptz DEFAULT now());
+    CREATE TABLE job_watermarks (job text PRIMARY KEY, watermark timestamptz, updated_at timestamptz DEFAULT now());
+"""
+
+DASHBOARD_SELECT_SQL = f"""
+    SELECT * FROM {db_utils.CLINICS_TABLE} ORDER BY filing_date DESC, created_at DESC
+"""
+
+PAGE_SELECT_SQL = f"""
+    SELECT * FROM {AGGREGATES_TABLE}
+    ORDER BY latest_filing_date DESC NULLS LAST, group_key
+    LIMIT %s
+"""
+
+
+def run_benchmark(conn, filings, changed, page_size):
+    """Seed a throwaway schema with synthetic filings and compare raw+client aggregation vs the table"""
+    import synthetic_data
+    with bench_utils.Stopwatch() as sw:
+        with conn.cursor() as cur:
+            cur.execute(BENCH_SCHEMA_SQL)
+            with open('database/migrations/add_clinic_hcp_aggregates.sql', 'r', encoding='utf-8') as f:
+                statements = [s for s in f.read().split(';')
+                              if s.strip() and 'POLICY' not in s and 'ROW LEVEL SECURITY' not in s]
+            for statement in statements:
+                cur.execute(statement.replace('public.', ''))
+        conn.commit()
+        synthetic_data.seed_clinics(conn, filings)
+        with conn.cursor() as cur:
+            # Seeded rows look old, so only the rows changed below fall after the watermark
+            cur.execute(f"UPDATE {db_utils.CLINICS_TABLE} SET created_at = filing_date, updated_at = filing_date")
+            cur.execute("ANALYZE")
+        conn.commit()
+    print(f"[BENCH] Seeded {filings:,} synthetic filings in {sw.seconds:.1f}s")
+
+    results = {'filings': filings}
+    with bench_utils.Stopwatch() as sw:
+        raw = db_utils.fetch_all(conn, DASHBOARD_SELECT_SQL)
+    results['before'] = {'query_s': round(sw.seconds, 3), 'rows': len(raw), 'payload_bytes': payload_bytes(raw)}
+    for row in raw:
+        if isinstance(row['historical_funding'], str):
+            row['historical_funding'] = json.loads(row['historical_funding'])
+    with bench_utils.Stopwatch() as sw:
+        client_side = aggregate_clinics_by_hcp(raw)
+    results['before']['aggregate_s'] = round(sw.seconds, 3)
+    results['before']['aggregates'] = len(client_side)
+
+    results['full_refresh'] = run_refresh(conn, full=True)
+
+    with bench_utils.Stopwatch() as sw:
+        page = db_utils.fetch_all(conn, PAGE_SELECT_SQL, (page_size,))
+    results['after_page'] = {'query_s': round(sw.seconds, 4), 'rows': len(page), 'payload_bytes': payload_bytes(page)}
+    with bench_utils.Stopwatch() as sw:
+        everything = db_utils.fetch_all(conn, f"SELECT * FROM {AGGREGATES_TABLE}")
+    results['after_all'] = {'query_s': round(sw.seconds, 3), 'rows': len(everything),
+                            'payload_bytes': payload_bytes(everything)}
+
+    # Parity with the client-side port on totals and counts
+    expected = {(f"group:{a['belongs_to_group_id']}" if a.get('belongs_to_group_id') else f"hcp:{a['hcp_number']}"):
+                (a['application_count'], round(a['total_funding'], 2)) for a in client_side}
+    actual = {r['group_key']: (r['application_count'], round(float(r['total_funding']), 2)) for r in everything}
+    results['parity_mismatches'] = sum(1 for k, v in expected.items() if actual.get(k) != v)
+
+    with conn.cursor() as cur:
+        cur.execute(f"""
+            UPDATE {db_utils.CLINICS_TABLE}
+            SET notes = '[{{"note": "bench"}}]'::jsonb, processed = true, updated_at = now()
+            WHERE id IN (SELECT id FROM {db_utils.CLINICS_TABLE} ORDER BY random() LIMIT %s)
+        """, (changed,))
+    conn.commit()
+    results['incremental_refresh'] = run_refresh(conn)
+
+    before, page_stats = results['before'], results['after_page']
+    print(f"[BENCH] before: {before['rows']:,} raw rows, {before['payload_bytes'] / 1e6:.1f} MB, "
+          f"query {before['query_s']}s + client aggregation {before['aggregate_s']}s "
+          f"-> {before['aggregates']:,} aggregates")
+    print(f"[BENCH] after:  first page of {page_stats['rows']} aggregates, "
+          f"{page_stats['payload_bytes'] / 1e3:.1f} KB, query {page_stats['query_s']}s")
+    print(f"[BENCH] after (all aggregates): {results['after_all']['rows']:,} rows, "
+          f"{results['after_all']['payload_bytes'] / 1e6:.1f} MB, query {results['after_all']['query_s']}s")
+    print(f"[BENCH] full refresh: {results['full_refresh']['seconds']}s "
+          f"({results['full_refresh']['upserted']:,} aggregates)")
+    print(f"[BENCH] incremental refresh after {changed:,} changed filings: "
+          f"{results['incremental_refresh']['seconds']}s ({results['incremental_refresh']['keys']:,} keys)")
+    print(f"[BENCH] parity mismatches vs client-side aggregation: {results['parity_mismatches']}")
+
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA aggregates_bench CASCADE")
+    conn.commit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental per-HCP clinic aggregates')
+    parser.add_argument('--full', action='store_true', help='Ignore the watermark and rebuild everything')
+    parser.add_argument('--benchmark', action='store_true', help='Run against a throwaway schema')
+    parser.add_argument('--filings', type=int, default=50_000, help='Benchmark synthetic filings')
+    parser.add_argument('--changed', type=int, default=500, help='Benchmark filings changed before re-run')
+    parser.add_argument('--page-size', type=int, default=100, help='Benchmark dashboard page size')
+    args = parser.parse_args()
+
+    conn = db_utils.get_connection()
+    try:
+        if args.benchmark:
+            results = run_benchmark(conn, args.filings, args.changed, args.page_size)
+            with open('aggregates_benchmark.json', 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, default=str)
+            print("[SAVED] aggregates_benchmark.json")
+            return
+
+        summary = run_refresh(conn, full=args.full)
+        if summary['keys']:
+            print(f"[SUCCESS] Refreshed {summary['upserted']:,} aggregates, removed {summary['deleted']:,} "
+                  f"({summary['keys']:,} changed keys) in {summary['seconds']}s")
+        else:
+            print("[OK] No changed clinics since last run")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Clinic Grouping Job
+Purpose: Propose clinic_groups for related sites filed under different HCP numbers
+
+The dashboard already aggregates rows sharing an hcp_number (clinic-aggregation.ts),
+so this job works on one record per HCP and looks for HCPs that belong together
+(same organization, different names/addresses). Instead of comparing every pair,
+each record gets a few blocking keys and is only compared within its blocks:
+
+  name    - state + significant name tokens (whole name and each rare token)
+  addr    - normalized street line + ZIP
+  domain  - contact email domain (free-mail domains ignored)
+  consult - consultant email domain + each name token (consultants file for many clinics)
+
+Blocks larger than --max-block are skipped as uninformative, which keeps the
+number of comparisons roughly linear in the number of records. Matches are
+merged with union-find into proposed groups.
+
+Usage:
+  python clinic_grouping.py --output proposals.json          # propose only
+  python clinic_grouping.py --apply                          # insert clinic_groups + members
+  python clinic_grouping.py --benchmark 25000 50000 100000 200000
+"""
+
+import re
+import sys
+import json
+import random
+import argparse
+import uuid
+from collections import defaultdict, Counter
+
+import bench_utils
+
+try:
+    from rapidfuzz import fuzz
+    HAS_RAPIDFUZZ = True
+except ImportError:
+    HAS_RAPIDFUZZ = False
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_THRESHOLD = 0.7
+DEFAULT_MAX_BLOCK = 100
+CREATED_BY = 'clinic_grouping.py'
+
+# Words every clinic name has; they say nothing about which organization it is
+NAME_STOPWORDS = {
+    'the', 'of', 'and', 'at', 'inc', 'llc', 'pc', 'pllc', 'dba', 'co', 'corp',
+    'clinic', 'clinics', 'health', 'healthcare', 'medical', 'center', 'centre', 'hospital',
+    'rural', 'community', 'family', 'services', 'service', 'regional', 'memorial',
+    'critical', 'access', 'care', 'practice', 'primary', 'associates', 'group', 'system',
+    'north', 'south', 'east', 'west', 'main', 'downtown', 'satellite', 'site', 'campus',
+}
+FREE_MAIL_DOMAINS = {
+    'gmail.com', 'yahoo.com', 'hotmail.com', 'outlook.com', 'aol.com', 'icloud.com',
+    'live.com', 'msn.com', 'comcast.net', 'att.net', 'sbcglobal.net',
+}
+STREET_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'road': 'rd', 'drive': 'dr', 'highway': 'hwy', 'boulevard': 'blvd',
+    'lane': 'ln', 'north': 'n', 'south': 's', 'east': 'e', 'west': 'w', 'suite': 'ste',
+}
+
+
+def normalize(text):
+    return ' '.join(re.sub(r'[^a-z0-9 ]', ' ', str(text or '').lower()).split())
+
+
+def name_tokens(name):
+    return [t for t in normalize(name).split() if t not in NAME_STOPWORDS and len(t) > 1]
+
+
+def street_key(address, zip_code):
+    words = [STREET_ABBREVIATIONS.get(w, w) for w in normalize(address).split()]
+    zip5 = re.sub(r'\D', '', str(zip_code or ''))[:5]
+    return f"{' '.join(words)}|{zip5}" if words and zip5 else None
+
+
+def email_domain(email):
+    email = str(email or '').strip().lower()
+    return email.rsplit('@', 1)[1] if '@' in email else None
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class HcpRecord:
+    """One HCP number with the clinic rows filed under it"""
+
+    __slots__ = ('hcp_number', 'clinic_ids', 'name', 'city', 'state', 'tokens', 'grams',
+                 'street', 'domain', 'consultant_domain', 'funding', 'names')
+
+    def __init__(self, hcp_number):
+        self.hcp_number = hcp_number
+        self.clinic_ids = []
+        self.names = Counter()
+        self.funding = {}
+        self.name = self.city = self.state = self.street = self.domain = self.consultant_domain = None
+        self.tokens = ()
+        self.grams = frozenset()
+
+    def add(self, clinic):
+        self.clinic_ids.append(clinic['id'])
+        self.names[clinic.get('clinic_name') or ''] += 1
+        funding = clinic.get('historical_funding') or []
+        if isinstance(funding, str):
+            funding = json.loads(funding)
+        self.funding[clinic['id']] = sum(item.get('amount') or 0 for item in funding)
+        if self.name is None:
+            self.city = normalize(clinic.get('city'))
+            self.state = normalize(clinic.get('state'))
+            self.street = street_key(clinic.get('address'), clinic.get('zip'))
+        domain = email_domain(clinic.get('contact_email'))
+        if domain and domain not in FREE_MAIL_DOMAINS:
+            self.domain = self.domain or domain
+        mail_domain = email_domain(clinic.get('mail_contact_email'))
+        if clinic.get('mail_contact_is_consultant') and mail_domain and mail_domain not in FREE_MAIL_DOMAINS:
+            self.consultant_domain = self.consultant_domain or mail_domain
+        elif mail_domain and mail_domain not in FREE_MAIL_DOMAINS:
+            self.domain = self.domain or mail_domain
+        self.name = self.names.most_common(1)[0][0]
+
+    def finalize(self):
+        self.tokens = tuple(sorted(set(name_tokens(self.name))))
+        self.grams = trigrams(' '.join(self.tokens) or normalize(self.name))
+
+    def blocking_keys(self, token_counts):
+        keys = []
+        if self.tokens:
+            keys.append(f"name:{self.state}:{' '.join(self.tokens)}")
+            # Each token that is rare enough to identify an organization (per state)
+            keys.extend(f"tok:{self.state}:{t}" for t in self.tokens if token_counts[(self.state, t)] <= 50)
+        if self.street:
+            keys.append(f"addr:{self.street}")
+        if self.domain:
+            keys.append(f"domain:{self.domain}")
+        if self.consultant_domain:
+            # A consultant files for many unrelated clinics; only its clinics sharing a name token pair up
+            keys.extend(f"consult:{self.consultant_domain}:{t}" for t in self.tokens)
+        return keys
+
+
+def name_similarity(a, b):
+    """Token-set similarity: one name's significant tokens contained in the other's scores 1.0"""
+    if HAS_RAPIDFUZZ:
+        return fuzz.token_set_ratio(' '.join(a.tokens), ' '.join(b.tokens)) / 100
+    if not a.grams or not b.grams:
+        return 0.0
+    if a.tokens and b.tokens:
+        shared = len(set(a.tokens) & set(b.tokens))
+        if shared:
+            return max(shared / min(len(a.tokens), len(b.tokens)),
+                       len(a.grams & b.grams) / len(a.grams | b.grams))
+    return len(a.grams & b.grams) / len(a.grams | b.grams)
+
+
+def pair_score(a, b):
+    """0..1 evidence that two HCPs are the same organization"""
+    score = 0.6 * name_similarity(a, b)
+    if a.domain and a.domain == b.domain:
+        score += 0.25
+    if a.street and a.street == b.street:
+        score += 0.25
+    if a.city and a.city == b.city and a.state == b.state:
+        score += 0.1
+    return min(score, 1.0)
+
+
+class UnionFind:
+    def __init__(self, size):
+        self.parent = list(range(size))
+
+    def find(self, x):
+        while self.parent[x] != x:
+            self.parent[x] = self.parent[self.parent[x]]
+            x = self.parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def build_records(clinics):
+    records = {}
+    for clinic in clinics:
+        hcp = clinic.get('hcp_number') or f"no-hcp-{clinic['id']}"
+        record = records.get(hcp)
+        if record is None:
+            record = records[hcp] = HcpRecord(hcp)
+        record.add(clinic)
+    for record in records.values():
+        record.finalize()
+    return list(records.values())
+
+
+def find_groups(records, threshold=DEFAULT_THRESHOLD, max_block=DEFAULT_MAX_BLOCK):
+    """Blocked pairwise matching + union-find; returns (groups as record index lists, stats)"""
+    token_counts = Counter((r.state, t) for r in records for t in r.tokens)
+    blocks = defaultdict(list)
+    for i, record in enumerate(records):
+        for key in record.blocking_keys(token_counts):
+            blocks[key].append(i)
+
+    uf = UnionFind(len(records))
+    compared = set()
+    stats = {'records': len(records), 'blocks': 0, 'skipped_blocks': 0, 'comparisons': 0, 'matches': 0}
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block:
+            stats['skipped_blocks'] += 1
+            continue
+        stats['blocks'] += 1
+        for x in range(len(members)):
+            a = members[x]
+            for b in members[x + 1:]:
+                pair = (a, b) if a < b else (b, a)
+                if pair in compared:
+                    continue
+                compared.add(pair)
+                stats['comparisons'] += 1
+                if uf.find(a) != uf.find(b) and pair_score(records[a], records[b]) >= threshold:
+                    uf.union(a, b)
+                    stats['matches'] += 1
+
+    components = defaultdict(list)
+    for i in range(len(records)):
+        components[uf.find(i)].append(i)
+    groups = [members for members in components.values() if len(members) > 1]
+    stats['groups'] = len(groups)
+    return groups, stats
+
+
+def build_proposals(records, groups):
+    """Rows shaped for clinic_groups / clinic_group_members (same totals as POST /api/clinic-groups)"""
+    proposals = []
+    for members in groups:
+        group_records = [records[i] for i in members]
+        funding = {cid: amount for r in group_records for cid, amount in r.funding.items()}
+        clinic_ids = [cid for r in group_records for cid in r.clinic_ids]
+        names = Counter()
+        for r in group_records:
+            names.update(r.names)
+        proposals.append({
+            'id': str(uuid.uuid4()),
+            'group_name': names.most_common(1)[0][0],
+            'primary_clinic_id': max(clinic_ids, key=lambda cid: funding.get(cid, 0)),
+            'total_funding_amount': sum(funding.values()),
+            'location_count': len(clinic_ids),
+            'hcp_numbers': [r.hcp_number for r in group_records],
+            'clinic_ids': clinic_ids,
+        })
+    return proposals
+
+
+def load_clinics(conn):
+    """Clinics not yet in a manual group"""
+    import db_utils
+    return db_utils.iter_rows(conn, f"""
+        SELECT id::text AS id, hcp_number, clinic_name, address, city, state, zip,
+               contact_email, mail_contact_email, mail_contact_is_consultant, historical_funding
+        FROM {db_utils.CLINICS_TABLE}
+        WHERE belongs_to_group_id IS NULL
+    """, name='grouping_cursor')
+
+
+def apply_proposals(conn, proposals):
+    """Bulk insert groups and members, then point the clinics at their group (one transaction)"""
+    import db_utils
+    groups = [dict(p, created_by=CREATED_BY) for p in proposals]
+    db_utils.bulk_insert(conn, 'clinic_groups', groups,
+                         ['id', 'group_name', 'primary_clinic_id', 'total_funding_amount',
+                          'location_count', 'created_by'], commit=False)
+    members = [{'group_id': p['id'], 'clinic_id': cid} for p in proposals for cid in p['clinic_ids']]
+    db_utils.bulk_insert(conn, 'clinic_group_members', members, ['group_id', 'clinic_id'],
+                         on_conflict='(group_id, clinic_id) DO NOTHING', commit=False)
+    db_utils.bulk_update(conn, db_utils.CLINICS_TABLE,
+                         [{'id': m['clinic_id'], 'belongs_to_group_id': m['group_id']} for m in members],
+                         ['belongs_to_group_id'], casts={'id': 'uuid', 'belongs_to_group_id': 'uuid'},
+                         commit=False)
+    # Groups without members (or members whose clinics still look ungrouped) would be proposed again
+    conn.commit()
+    return len(groups), len(members)
+
+
+SYLLABLES = ['ka', 'lo', 'mer', 'vin', 'ta', 'ro', 'sel', 'dun', 'bri', 'ash', 'cor', 'wen',
+             'hal', 'mor', 'tis', 'el', 'fen', 'gar', 'lin', 'ov', 'pra', 'qui', 'sto', 'ux',
+             'bel', 'cas', 'dra', 'fal', 'jun', 'kel', 'nor', 'pem', 'ril', 'sha', 'tor', 'val']
+SITE_SUFFIXES = ['Clinic', 'Rural Health Clinic', 'Medical Center', 'Family Clinic', 'Health Center']
+SITE_QUALIFIERS = ['', 'North', 'South', 'East', 'West', 'Main', 'Downtown', 'Satellite']
+
+
+def synthetic_network(count, seed=33):
+    """Synthetic clinics where organizations run 1-5 sites under separate HCP numbers
+
+    Returns (clinic rows, {hcp_number: organization id}) so matches can be scored.
+    """
+    import synthetic_data
+    rng = random.Random(seed)
+    rows, truth = [], {}
+    used_names = set()
+    org = 0
+    while len(rows) < count:
+        base = ''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(3, 4))).title()
+        if base in used_names:
+            continue
+        used_names.add(base)
+        org += 1
+        state = rng.choice(synthetic_data.STATES)
+        domain = f"{base.lower()}health.org"
+        consultant = rng.random() < 0.3
+        consultant_domain = f"consult{rng.randint(1, 40)}.com"
+        for site in range(min(rng.choice([1, 1, 1, 2, 2, 3, 4, 5]), count - len(rows))):
+            hcp = f"{synthetic_data.SYNTHETIC_HCP_PREFIX}{len(rows):07d}"
+            qualifier = rng.choice(SITE_QUALIFIERS) if site else ''
+            city = f"{rng.choice(synthetic_data.NAME_PREFIXES)} {rng.choice(['City', 'Falls', 'Springs'])}"
+            rows.append({
+                'id': str(uuid.UUID(int=rng.getrandbits(128))),
+                'hcp_number': hcp,
+                'clinic_name': ' '.join(p for p in (base, qualifier, rng.choice(SITE_SUFFIXES)) if p),
+                'address': f"{rng.randint(1, 9999)} {rng.choice(synthetic_data.STREETS)}",
+                'city': city,
+                'state': state,
+                'zip': f"{rng.randint(10000, 99999)}",
+                # Some sites only give a personal mailbox
+                'contact_email': f"info@{domain}" if rng.random() < 0.7 else f"site{site}@gmail.com",
+                'mail_contact_email': f"filer@{consultant_domain}" if consultant else f"admin@{domain}",
+                'mail_contact_is_consultant': consultant,
+                'historical_funding': [{'year': '2024', 'amount': rng.randint(5, 400) * 1000}],
+            })
+            truth[hcp] = org
+    return rows, truth
+
+
+def score_against_truth(records, groups, truth):
+    """Pairwise precision/recall of proposed groups against the synthetic organizations"""
+    predicted = set()
+    for members in groups:
+        hcps = sorted(records[i].hcp_number for i in members)
+        predicted.update((a, b) for x, a in enumerate(hcps) for b in hcps[x + 1:])
+    by_org = defaultdict(list)
+    for hcp, org in truth.items():
+        by_org[org].append(hcp)
+    actual = set()
+    for hcps in by_org.values():
+        hcps = sorted(hcps)
+        actual.update((a, b) for x, a in enumerate(hcps) for b in hcps[x + 1:])
+    true_pos = len(predicted & actual)
+    return (true_pos / len(predicted) if predicted else 1.0,
+            true_pos / len(actual) if actual else 1.0)
+
+
+def run_benchmark(sizes, threshold, max_block):
+    print(f"[BENCHMARK] similarity: {'rapidfuzz' if HAS_RAPIDFUZZ else 'trigram jaccard'}")
+    print(f"{'clinics':>9} {'seconds':>8} {'us/rec':>7} {'comparisons':>12} {'cmp/rec':>8} "
+          f"{'groups':>7} {'precision':>9} {'recall':>7}")
+    for size in sizes:
+        clinics, truth = synthetic_network(size)
+        with bench_utils.Stopwatch() as sw:
+            records = build_records(clinics)
+            groups, stats = find_groups(records, threshold, max_block)
+        precision, recall = score_against_truth(records, groups, truth)
+        print(f"{size:>9,} {sw.seconds:>8.2f} {sw.seconds / size * 1e6:>7.1f} {stats['comparisons']:>12,} "
+              f"{stats['comparisons'] / size:>8.2f} {stats['groups']:>7,} {precision:>9.3f} {recall:>7.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Propose clinic groups across HCP numbers')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Minimum pair score')
+    parser.add_argument('--max-block', type=int, default=DEFAULT_MAX_BLOCK,
+                        help='Skip blocking keys shared by more records than this')
+    parser.add_argument('--output', help='Write proposed groups as JSON')
+    parser.add_argument('--apply', action='store_true', help='Insert proposals into clinic_groups')
+    parser.add_argument('--benchmark', type=int, nargs='*', help='Synthetic sizes to time (no DB)')
+    args = parser.parse_args()
+
+    if args.benchmark is not None:
+        run_benchmark(args.benchmark or [25000, 50000, 100000, 200000], args.threshold, args.max_block)
+        return
+
+    import db_utils
+    conn = db_utils.get_connection()
+    try:
+        with bench_utils.Stopwatch() as sw:
+            records = build_records(load_clinics(conn))
+            groups, stats = find_groups(records, args.threshold, args.max_block)
+            proposals = build_proposals(records, groups)
+        print(f"[OK] {stats['records']:,} HCPs, {stats['comparisons']:,} comparisons in "
+              f"{stats['blocks']:,} blocks ({stats['skipped_blocks']:,} oversized skipped), {sw.seconds:.1f}s")
+        print(f"[PROPOSED] {len(proposals):,} groups covering "
+              f"{sum(p['location_count'] for p in proposals):,} clinics")
+        for p in sorted(proposals, key=lambda p: -p['location_count'])[:10]:
+            print(f"   {p['group_name']}: {len(p['hcp_numbers'])} HCPs, {p['location_count']} clinics")
+
+        if args.output:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(proposals, f, indent=2, default=str)
+            print(f"[SAVED] {args.output}")
+        if args.apply:
+            groups_added, members_added = apply_proposals(conn, proposals)
+            print(f"[SUCCESS] Inserted {groups_added:,} groups, {members_added:,} members")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -16,7 +16,8 @@ import { Input } from '@/components/ui/input'
 import { Loader2, Search, Grid3x3, List, Columns2, FolderOpen, Map as MapIcon } from 'lucide-react'
 import { startOfDay, addDays, subDays } from 'date-fns'
 import dynamic from 'next/dynamic'
-import { aggregateClinicsByHCP } from '@/lib/clinic-aggregation'
+import { aggregateClinicsByHCP, fromServerAggregate } from '@/lib/clinic-aggregation'
+import { useClinicAggregates } from '@/hooks/use-clinic-aggregates'
 
 // Dynamically import MapView to avoid SSR issues with Leaflet
 const MapView = dynamic(
@@ -26,6 +27,17 @@ const MapView = dynamic(
 
 type ViewMode = 'grid' | 'list' | 'compact' | 'map'
 
+// clinic_hcp_aggregates has no per-filing columns for these, so they need the browser path
+const ROW_LEVEL_FILTERS: (keyof ClinicsFilters)[] = [
+  'funding_year', 'application_type', 'request_for_services', 'service_type', 'isConsultant',
+]
+
+// ?aggregation=client forces the browser aggregation (before/after runs of test_dashboard.py --benchmark)
+function serverAggregationAllowed() {
+  return typeof window === 'undefined' ||
+    new URLSearchParams(window.location.search).get('aggregation') !== 'client'
+}
+
 export function ClinicList() {
   const [filters, setFilters] = useState<ClinicsFilters>({})
   // Default to yesterday since data is pulled from previous day
@@ -40,13 +52,41 @@ export function ClinicList() {
   const [showAll, setShowAll] = useState(false)
   const [viewMode, setViewMode] = useState<ViewMode>('grid')
 
-  const { data: clinics, isLoading, error, refetch } = useClinics(filters)
+  const [aggregationAllowed] = useState(serverAggregationAllowed)
+
+  // Page pre-aggregated HCP groups from clinic_hcp_aggregates when the filters allow it;
+  // otherwise (and for the map, which plots every filing) fetch filings and aggregate here
+  const serverAggregates = aggregationAllowed && viewMode !== 'map' &&
+    ROW_LEVEL_FILTERS.every((key) => filters[key] === undefined)
+
+  const clinicsQuery = useClinics(filters, { enabled: !serverAggregates })
+  const aggregatesQuery = useClinicAggregates({
+    state: filters.state,
+    processed: filters.processed,
+    dateFrom: filters.dateFrom,
+    dateTo: filters.dateTo,
+    searchTerm: filters.searchTerm,
+    pageSize: showAll ? 10000 : displayLimit,
+  }, { enabled: serverAggregates })
+
+  const clinics = clinicsQuery.data
+  const { isLoading, error } = serverAggregates ? aggregatesQuery : clinicsQuery
+  const refetch = serverAggregates ? aggregatesQuery.refetch : clinicsQuery.refetch
 
   // Aggregate clinics by HCP number
   const aggregatedClinics = useMemo(() => {
+    if (serverAggregates) {
+      return (aggregatesQuery.data?.rows ?? []).map(fromServerAggregate)
+    }
     if (!clinics) return []
     return aggregateClinicsByHCP(clinics)
-  }, [clinics])
+  }, [serverAggregates, aggregatesQuery.data, clinics])
+
+  // Groups matching the filters (server count, or everything aggregated here)
+  const groupTotal = serverAggregates ? (aggregatesQuery.data?.total ?? 0) : aggregatedClinics.length
+  const applicationTotal = serverAggregates
+    ? aggregatedClinics.reduce((sum, clinic) => sum + clinic.application_count, 0)
+    : clinics?.length || 0
 
   // Initialize filters with yesterday's date on mount
   useEffect(() => {
@@ -143,7 +183,7 @@ export function ClinicList() {
 
   // Calculate counts for consultant filter (removed - consultant detection not in current schema)
   const consultantCounts = {
-    all: clinics?.length || 0,
+    all: applicationTotal,
     direct: 0,
     consultant: 0,
   }
@@ -330,28 +370,28 @@ export function ClinicList() {
           )}
 
           {/* Load More / Show All Controls (hide in map view) */}
-          {viewMode !== 'map' && !showAll && aggregatedClinics.length > displayLimit && (
+          {viewMode !== 'map' && !showAll && groupTotal > displayLimit && (
             <div className="flex flex-col items-center gap-4 pt-6">
               <div className="text-sm text-muted-foreground">
-                Showing {displayLimit} of {aggregatedClinics.length} HCP groups ({clinics?.length || 0} total applications)
+                Showing {displayLimit} of {groupTotal} HCP groups ({applicationTotal} {serverAggregates ? 'applications shown' : 'total applications'})
               </div>
               <div className="flex gap-3">
                 <Button
                   variant="outline"
-                  onClick={() => setDisplayLimit(prev => Math.min(prev + 50, clinics.length))}
+                  onClick={() => setDisplayLimit(prev => Math.min(prev + 50, groupTotal))}
                 >
                   Load 50 More
                 </Button>
                 <Button
                   onClick={() => setShowAll(true)}
                 >
-                  Show All ({clinics.length})
+                  Show All ({groupTotal})
                 </Button>
               </div>
             </div>
           )}
 
-          {viewMode !== 'map' && showAll && clinics.length > 50 && (
+          {viewMode !== 'map' && showAll && groupTotal > 50 && (
             <div className="text-center pt-6">
               <Button
                 variant="outline"
@@ -391,9 +431,9 @@ export function ClinicList() {
         </div>
       )}
 
-      {clinics && clinics.length > 0 && showAll && (
+      {applicationTotal > 0 && showAll && (
         <div className="text-sm text-muted-foreground text-center">
-          Showing all {clinics.length} clinic{clinics.length !== 1 ? 's' : ''}
+          Showing all {applicationTotal} clinic{applicationTotal !== 1 ? 's' : ''}
         </div>
       )}
       </div>
@@ -0,0 +1,73 @@
+import { keepPreviousData, useQuery } from '@tanstack/react-query'
+import { createClient } from '@/lib/supabase/client'
+import type { Database } from '@/types/database.types'
+
+export type ClinicHcpAggregate = Database['public']['Tables']['clinic_hcp_aggregates']['Row']
+
+export interface ClinicAggregatesFilters {
+  state?: string
+  processed?: boolean | 'has_notes'  // Same values as ClinicsFilters.processed
+  dateFrom?: string  // Applied to the group's latest filing date
+  dateTo?: string
+  searchTerm?: string  // Clinic name, HCP number or state
+  page?: number
+  pageSize?: number
+}
+
+/**
+ * One page of pre-aggregated clinics (one row per HCP number or manual group),
+ * maintained server-side by clinic_aggregates.py instead of aggregateClinicsByHCP
+ */
+export function useClinicAggregates(filters: ClinicAggregatesFilters = {}, options: { enabled?: boolean } = {}) {
+  const supabase = createClient()
+  const page = filters.page ?? 0
+  const pageSize = filters.pageSize ?? 100
+
+  return useQuery({
+    queryKey: ['clinic-aggregates', filters],
+    enabled: options.enabled ?? true,
+    // "Load 50 More" widens the range; keep the current page on screen while it loads
+    placeholderData: keepPreviousData,
+    queryFn: async () => {
+      let query = supabase
+        .from('clinic_hcp_aggregates')
+        .select('*', { count: 'exact' })
+        .order('latest_filing_date', { ascending: false, nullsFirst: false })
+        .order('group_key', { ascending: true })
+        .range(page * pageSize, (page + 1) * pageSize - 1)
+
+      if (filters.state) {
+        query = query.eq('state', filters.state)
+      }
+
+      if (filters.processed === 'has_notes') {
+        query = query.eq('has_notes', true)
+      } else if (filters.processed !== undefined) {
+        query = query.eq('all_processed', filters.processed)
+      }
+
+      if (filters.dateFrom) {
+        query = query.gte('latest_filing_date', filters.dateFrom.slice(0, 10))
+      }
+
+      if (filters.dateTo) {
+        query = query.lt('latest_filing_date', filters.dateTo.slice(0, 10))
+      }
+
+      if (filters.searchTerm && filters.searchTerm.trim()) {
+        const searchPattern = `%${filters.searchTerm.trim()}%`
+        query = query.or(
+          `clinic_name.ilike.${searchPattern},hcp_number.ilike.${searchPattern},state.ilike.${searchPattern}`
+        )
+      }
+
+      const { data, error, count } = await query
+
+      if (error) {
+        throw error
+      }
+
+      return { rows: data as ClinicHcpAggregate[], total: count ?? 0 }
+    },
+  })
+}
@@ -17,11 +17,12 @@ export interface ClinicsFilters {
   isConsultant?: boolean  // Consultant contact filter
 }
 
-export function useClinics(filters: ClinicsFilters = {}) {
+export function useClinics(filters: ClinicsFilters = {}, options: { enabled?: boolean } = {}) {
   const supabase = createClient()
 
   return useQuery({
     queryKey: ['clinics', filters],
+    enabled: options.enabled ?? true,
     queryFn: async () => {
       let query = supabase
         .from('clinics_pending_review')
@@ -1,6 +1,7 @@
 import type { Database } from '@/types/database.types'
 
 type Clinic = Database['public']['Tables']['clinics_pending_review']['Row']
+type ClinicHcpAggregate = Database['public']['Tables']['clinic_hcp_aggregates']['Row']
 
 export interface HistoricalFundingItem {
   year: string
@@ -125,6 +126,29 @@ export function aggregateClinicsByHCP(clinics: Clinic[]): AggregatedClinic[] {
   })
 }
 
+/**
+ * Same shape as aggregateClinicsByHCP output, from a clinic_hcp_aggregates row
+ * (base_clinic is the newest filing; its historical_funding is rebuilt from the group totals)
+ */
+export function fromServerAggregate(row: ClinicHcpAggregate): AggregatedClinic {
+  const aggregatedFunding = (row.aggregated_funding || {}) as AggregatedFunding
+  const historicalFunding: HistoricalFundingItem[] = getSortedYears(aggregatedFunding)
+    .map(year => ({ year, amount: Number(aggregatedFunding[year]) }))
+
+  return {
+    ...(row.base_clinic as unknown as Clinic),
+    id: row.base_clinic_id,
+    hcp_number: row.hcp_number || '',
+    clinic_name: row.clinic_name || '',
+    historical_funding: historicalFunding,
+    application_count: row.application_count,
+    application_numbers: row.application_numbers,
+    aggregated_funding: aggregatedFunding,
+    total_funding: Number(row.total_funding),
+    locations: (row.locations || []) as unknown as LocationInfo[],
+  } as AggregatedClinic
+}
+
 /**
  * Format currency amount
  */
@@ -296,6 +296,73 @@ export interface Database {
           }
         ]
       }
+      clinic_hcp_aggregates: {
+        Row: {
+          group_key: string
+          hcp_number: string | null
+          belongs_to_group_id: string | null
+          base_clinic_id: string | null
+          base_clinic: Json | null
+          clinic_name: string | null
+          state: string | null
+          latest_filing_date: string | null
+          application_count: number
+          application_numbers: string[]
+          aggregated_funding: Json
+          total_funding: number
+          locations: Json
+          all_processed: boolean
+          has_notes: boolean
+          source_updated_at: string | null
+          refreshed_at: string
+        }
+        Insert: {
+          group_key: string
+          hcp_number?: string | null
+          belongs_to_group_id?: string | null
+          base_clinic_id?: string | null
+          base_clinic?: Json | null
+          clinic_name?: string | null
+          state?: string | null
+          latest_filing_date?: string | null
+          application_count?: number
+          application_numbers?: string[]
+          aggregated_funding?: Json
+          total_funding?: number
+          locations?: Json
+          all_processed?: boolean
+          has_notes?: boolean
+          source_updated_at?: string | null
+          refreshed_at?: string
+        }
+        Update: {
+          group_key?: string
+          hcp_number?: string | null
+          belongs_to_group_id?: string | null
+          base_clinic_id?: string | null
+          base_clinic?: Json | null
+          clinic_name?: string | null
+          state?: string | null
+          latest_filing_date?: string | null
+          application_count?: number
+          application_numbers?: string[]
+          aggregated_funding?: Json
+          total_funding?: number
+          locations?: Json
+          all_processed?: boolean
+          has_notes?: boolean
+          source_updated_at?: string | null
+          refreshed_at?: string
+        }
+        Relationships: [
+          {
+            foreignKeyName: 'clinic_hcp_aggregates_belongs_to_group_id_fkey'
+            columns: ['belongs_to_group_id']
+            referencedRelation: 'clinic_groups'
+            referencedColumns: ['id']
+          }
+        ]
+      }
     }
     Views: {}
     Functions: {}
@@ -0,0 +1,63 @@
+-- ============================================================================
+-- Migration: Pre-aggregated clinics per HCP / manual group
+-- Date: 2025-11-21
+-- Description: Server-side copy of what clinic-aggregation.ts computes in the
+--              browser (aggregated_funding, application_numbers, locations),
+--              one row per HCP number or manual clinic group. Maintained
+--              incrementally by clinic_aggregates.py from changed rows.
+-- ============================================================================
+
+-- Same grouping rule as aggregateClinicsByHCP: manual group first, else HCP number
+CREATE OR REPLACE FUNCTION public.clinic_aggregate_key(hcp_number text, group_id uuid)
+RETURNS text
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT CASE WHEN group_id IS NOT NULL THEN 'group:' || group_id::text
+              ELSE 'hcp:' || COALESCE(hcp_number, '') END
+$$;
+
+CREATE TABLE IF NOT EXISTS public.clinic_hcp_aggregates (
+  group_key text PRIMARY KEY,
+  hcp_number text,
+  belongs_to_group_id uuid REFERENCES public.clinic_groups(id) ON DELETE CASCADE,
+
+  -- Newest filing in the group (the "base clinic" the dashboard card shows)
+  base_clinic_id uuid,
+  base_clinic jsonb,
+  clinic_name text,
+  state text,
+  latest_filing_date date,
+
+  application_count integer NOT NULL DEFAULT 0,
+  application_numbers text[] NOT NULL DEFAULT '{}',
+  aggregated_funding jsonb NOT NULL DEFAULT '{}'::jsonb,
+  total_funding numeric(14, 2) NOT NULL DEFAULT 0,
+  locations jsonb NOT NULL DEFAULT '[]'::jsonb,
+  all_processed boolean NOT NULL DEFAULT false,
+  has_notes boolean NOT NULL DEFAULT false,
+
+  source_updated_at timestamptz,
+  refreshed_at timestamptz DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_clinic_hcp_aggregates_latest
+ON public.clinic_hcp_aggregates(latest_filing_date DESC NULLS LAST, group_key);
+
+CREATE INDEX IF NOT EXISTS idx_clinic_hcp_aggregates_state
+ON public.clinic_hcp_aggregates(state);
+
+COMMENT ON TABLE public.clinic_hcp_aggregates IS
+  'Per-HCP / per-group clinic aggregates (same shape as clinic-aggregation.ts), maintained by clinic_aggregates.py';
+
+-- Lets the refresh find all rows of a group key, and the changed rows since the watermark
+CREATE INDEX IF NOT EXISTS idx_clinics_aggregate_key
+ON public.clinics_pending_review (public.clinic_aggregate_key(hcp_number, belongs_to_group_id));
+
+CREATE INDEX IF NOT EXISTS idx_clinics_updated_at
+ON public.clinics_pending_review(updated_at);
+
+ALTER TABLE public.clinic_hcp_aggregates ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow authenticated read clinic_hcp_aggregates" ON public.clinic_hcp_aggregates FOR SELECT TO authenticated USING (true);
+CREATE POLICY "Allow service role all clinic_hcp_aggregates" ON public.clinic_hcp_aggregates FOR ALL TO service_role USING (true);
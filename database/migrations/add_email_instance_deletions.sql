@@ -0,0 +1,34 @@
+-- ============================================================================
+-- Migration: Deletion log for email_instances
+-- Date: 2025-11-25
+-- Description: A deleted instance leaves no updated_at behind, so incremental
+--              readers (weekly_rollup.py) would never notice it. The trigger
+--              keeps the timestamps that decide which weeks it was counted in.
+--              weekly_rollup.py prunes rows once they are behind its watermark.
+-- ============================================================================
+
+CREATE TABLE IF NOT EXISTS public.email_instance_deletions (
+  id bigserial PRIMARY KEY,
+  instance_id uuid NOT NULL,
+  created_at timestamptz,
+  sent_at timestamptz,
+  deleted_at timestamptz NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_email_instance_deletions_deleted_at
+ON public.email_instance_deletions(deleted_at);
+
+CREATE OR REPLACE FUNCTION public.log_email_instance_deletion()
+RETURNS trigger AS $$
+BEGIN
+  INSERT INTO public.email_instance_deletions (instance_id, created_at, sent_at)
+  VALUES (old.id, old.created_at, old.sent_at);
+  RETURN old;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS log_email_instance_deletion ON public.email_instances;
+CREATE TRIGGER log_email_instance_deletion
+  AFTER DELETE ON public.email_instances
+  FOR EACH ROW
+  EXECUTE FUNCTION public.log_email_instance_deletion();
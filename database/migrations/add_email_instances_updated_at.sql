@@ -0,0 +1,31 @@
+-- ============================================================================
+-- Migration: updated_at on email_instances
+-- Date: 2025-11-24
+-- Description: Change timestamp for incremental readers (snapshot_export.py).
+--              The event columns (sent_at, opened_at, ...) miss in-place edits
+--              such as edited_body, user_edited and edit_summary, so every
+--              update now bumps updated_at through handle_updated_at().
+-- ============================================================================
+
+ALTER TABLE public.email_instances
+ADD COLUMN IF NOT EXISTS updated_at timestamptz;
+
+-- Backfill before the trigger exists so existing rows keep their last event time
+UPDATE public.email_instances
+SET updated_at = COALESCE(GREATEST(created_at, draft_created_at, sent_at, opened_at, clicked_at, responded_at), now())
+WHERE updated_at IS NULL;
+
+ALTER TABLE public.email_instances
+ALTER COLUMN updated_at SET DEFAULT now();
+
+CREATE INDEX IF NOT EXISTS idx_email_instances_updated_at
+ON public.email_instances(updated_at);
+
+-- ============================================================================
+-- Auto-update updated_at trigger
+-- ============================================================================
+DROP TRIGGER IF EXISTS set_email_instances_updated_at ON public.email_instances;
+CREATE TRIGGER set_email_instances_updated_at
+  BEFORE UPDATE ON public.email_instances
+  FOR EACH ROW
+  EXECUTE FUNCTION public.handle_updated_at();
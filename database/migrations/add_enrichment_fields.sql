@@ -0,0 +1,23 @@
+-- ============================================================================
+-- Migration: Add enrichment result fields
+-- Date: 2025-11-20
+-- Description: Stores batch enrichment results (enrichment_service.py) on the
+--              clinic row so outreach can reuse them without re-querying
+--              Perplexity / Google. Replaces the enriched/enrichment_date
+--              columns dropped in schema_cleanup_v4.
+-- ============================================================================
+
+ALTER TABLE public.clinics_pending_review
+ADD COLUMN IF NOT EXISTS enrichment_data jsonb,
+ADD COLUMN IF NOT EXISTS enriched_at timestamptz;
+
+COMMENT ON COLUMN public.clinics_pending_review.enrichment_data IS
+  'Enrichment lookup results: {"enrichment_context": "...", "enrichment_finding": "...", "years_experience": 12, "has_telecom_background": true}';
+
+COMMENT ON COLUMN public.clinics_pending_review.enriched_at IS
+  'When enrichment_data was last written';
+
+-- Batch selection of clinics that still need enrichment
+CREATE INDEX IF NOT EXISTS idx_clinics_not_enriched
+ON public.clinics_pending_review(created_at DESC)
+WHERE enriched_at IS NULL;
@@ -0,0 +1,62 @@
+-- ============================================================================
+-- Migration: Weekly template stats rollup + job watermarks
+-- Date: 2025-11-20
+-- Description: Backing tables for weekly_rollup.py, which incrementally folds
+--              email_instances into per-week / per-template / per-route
+--              counters and derives weekly_performance and the aggregate
+--              counters on email_templates from them.
+-- ============================================================================
+
+-- Per-week, per-template, per-route counters (additive, one row per key)
+CREATE TABLE IF NOT EXISTS public.weekly_template_stats (
+  week_start date NOT NULL,
+  template_id uuid NOT NULL REFERENCES public.email_templates(id) ON DELETE CASCADE,
+  route text NOT NULL DEFAULT 'unassigned',
+
+  drafted integer NOT NULL DEFAULT 0,
+  sent integer NOT NULL DEFAULT 0,
+  opens integer NOT NULL DEFAULT 0,
+  clicks integer NOT NULL DEFAULT 0,
+  responses integer NOT NULL DEFAULT 0,
+  response_hours_total bigint NOT NULL DEFAULT 0,
+
+  updated_at timestamptz DEFAULT now(),
+
+  PRIMARY KEY (week_start, template_id, route)
+);
+
+CREATE INDEX IF NOT EXISTS idx_weekly_template_stats_template
+ON public.weekly_template_stats(template_id);
+
+COMMENT ON TABLE public.weekly_template_stats IS
+  'Materialized email_instances counters bucketed by week of COALESCE(sent_at, created_at); maintained by weekly_rollup.py';
+
+-- Watermarks for incremental jobs (one row per job name)
+CREATE TABLE IF NOT EXISTS public.job_watermarks (
+  job text PRIMARY KEY,
+  watermark timestamptz,
+  updated_at timestamptz DEFAULT now()
+);
+
+COMMENT ON TABLE public.job_watermarks IS
+  'Last processed change timestamp per incremental Python job';
+
+-- Indexes so the rollup only touches changed rows / affected weeks
+CREATE INDEX IF NOT EXISTS idx_email_instances_activity_time
+ON public.email_instances ((COALESCE(sent_at, created_at)));
+
+CREATE INDEX IF NOT EXISTS idx_email_instances_created
+ON public.email_instances(created_at);
+
+CREATE INDEX IF NOT EXISTS idx_email_instances_clicked
+ON public.email_instances(clicked_at) WHERE clicked_at IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_email_instances_responded
+ON public.email_instances(responded_at) WHERE responded_at IS NOT NULL;
+
+ALTER TABLE public.weekly_template_stats ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.job_watermarks ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Allow authenticated read weekly_template_stats" ON public.weekly_template_stats FOR SELECT TO authenticated USING (true);
+CREATE POLICY "Allow service role all weekly_template_stats" ON public.weekly_template_stats FOR ALL TO service_role USING (true);
+CREATE POLICY "Allow service role all job_watermarks" ON public.job_watermarks FOR ALL TO service_role USING (true);
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Form 465 Dedup Index
+Purpose: Local on-disk index of form_465_hash digests so a batch of USAC filings can be
+classified as new/seen without one Supabase "Check if Already Exists" round trip per filing.
+
+Layout (under .dedup/ by default):
+  form_465_hashes.bin  - sorted, concatenated 32-byte SHA-256 digests (32 bytes per hash)
+  form_465_hashes.bloom - optional Bloom filter header + bit array
+  meta.json            - sync watermark (max created_at seen) and counts; bloom_count is the
+                         number of hashes the Bloom filter was built from, and a filter that
+                         does not match the index count is rebuilt (or refused in Bloom-only mode)
+
+Usage:
+  python dedup_index.py sync                      # pull hashes from clinics_pending_review
+  python dedup_index.py classify filings.json     # split USAC API rows into new / seen
+  python dedup_index.py benchmark --sizes 100000 1000000
+"""
+
+import os
+import sys
+import json
+import math
+import heapq
+import random
+import hashlib
+import argparse
+from datetime import datetime
+
+import bench_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DIGEST_SIZE = 32
+DEFAULT_INDEX_DIR = '.dedup'
+INDEX_FILE = 'form_465_hashes.bin'
+BLOOM_FILE = 'form_465_hashes.bloom'
+META_FILE = 'meta.json'
+
+
+def _js_str(value):
+    """Stringify a value the way a JS template literal would"""
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def form_465_hash(filing):
+    """SHA-256 hex digest matching the "Process & Extract All Fields" n8n node
+
+    JS: `${data.hcp_number}-${data.posting_date}-${data.site_name}-${data.site_address}`
+    Missing keys render as 'undefined', JSON nulls as 'null'.
+    """
+    parts = []
+    for key in ('hcp_number', 'posting_date', 'site_name', 'site_address'):
+        parts.append(_js_str(filing[key]) if key in filing else 'undefined')
+    return hashlib.sha256('-'.join(parts).encode('utf-8')).hexdigest()
+
+
+class HashIndex:
+    """Exact set of 32-byte digests stored as one sorted bytes blob (binary-searched)"""
+
+    def __init__(self, blob=b''):
+        if len(blob) % DIGEST_SIZE:
+            raise ValueError('Corrupt index: size is not a multiple of 32 bytes')
+        self._blob = blob
+
+    def __len__(self):
+        return len(self._blob) // DIGEST_SIZE
+
+    def __contains__(self, digest):
+        blob = self._blob
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = mid * DIGEST_SIZE
+            current = blob[offset:offset + DIGEST_SIZE]
+            if current < digest:
+                lo = mid + 1
+            elif current > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __iter__(self):
+        blob = self._blob
+        for offset in range(0, len(blob), DIGEST_SIZE):
+            yield blob[offset:offset + DIGEST_SIZE]
+
+    @classmethod
+    def from_digests(cls, digests):
+        return cls(b''.join(sorted(set(digests))))
+
+    def add_many(self, digests):
+        """Merge new digests in (linear merge, keeps the blob sorted and unique)"""
+        new = sorted(set(d for d in digests if d not in self))
+        if not new:
+            return 0
+        self._blob = b''.join(heapq.merge(iter(self), new))
+        return len(new)
+
+    @classmethod
+    def load(cls, path):
+        if not os.path.exists(path):
+            return cls()
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self._blob)
+        os.replace(tmp_path, path)
+
+
+class BloomFilter:
+    """Bloom filter keyed directly on SHA-256 digests
+
+    The digests are already uniformly distributed, so the k bit positions are taken
+    from successive 4-byte slices of the digest instead of re-hashing.
+    """
+
+    HEADER = b'BLM1'
+
+    def __init__(self, num_bits, num_hashes, bits=None):
+        if num_hashes > DIGEST_SIZE // 4:
+            raise ValueError('At most 8 hash functions per 32-byte digest')
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, fp_rate=0.01):
+        """Size the filter for `capacity` items at the target false-positive rate"""
+        capacity = max(capacity, 1)
+        num_bits = int(math.ceil(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, min(DIGEST_SIZE // 4, round(num_bits / capacity * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    @property
+    def capacity(self):
+        """Item count at which the filter reaches its design false-positive rate"""
+        return int(self.num_bits * math.log(2) / self.num_hashes)
+
+    def _positions(self, digest):
+        for i in range(self.num_hashes):
+            yield int.from_bytes(digest[i * 4:i * 4 + 4], 'little') % self.num_bits
+
+    def add(self, digest):
+        bits = self.bits
+        for pos in self._positions(digest):
+            bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, digest):
+        bits = self.bits
+        for pos in self._positions(digest):
+            if not bits[pos >> 3] & (1 << (pos & 7)):
+                return False
+        return True
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:4] != cls.HEADER:
+            raise ValueError(f'Not a Bloom filter file: {path}')
+        num_bits = int.from_bytes(data[4:12], 'little')
+        num_hashes = data[12]
+        return cls(num_bits, num_hashes, bytearray(data[13:]))
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER + self.num_bits.to_bytes(8, 'little') + bytes([self.num_hashes]))
+            f.write(self.bits)
+        os.replace(tmp_path, path)
+
+
+class DedupIndex:
+    """Exact hash index plus optional Bloom filter front, persisted in one directory"""
+
+    def __init__(self, index_dir=DEFAULT_INDEX_DIR, use_bloom=True, fp_rate=0.01):
+        self.index_dir = index_dir
+        self.use_bloom = use_bloom
+        self.fp_rate = fp_rate
+        self.hashes = HashIndex()
+        self.bloom = None
+        self.exact = True
+        self.meta = {'watermark': None, 'count': 0}
+
+    @classmethod
+    def load(cls, index_dir=DEFAULT_INDEX_DIR, use_bloom=True, exact=True):
+        """Load from disk; exact=False loads only the Bloom filter (smallest footprint)
+
+        A Bloom filter built from a different number of hashes than the index holds (e.g. left
+        behind by a later `sync --no-bloom`) would report newer hashes as new, so it is rebuilt
+        from the exact index, or refused when only the filter is loaded.
+        """
+        index = cls(index_dir, use_bloom=use_bloom)
+        index.exact = exact
+        meta_path = os.path.join(index_dir, META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                index.meta = json.load(f)
+        if exact:
+            index.hashes = HashIndex.load(os.path.join(index_dir, INDEX_FILE))
+        bloom_path = os.path.join(index_dir, BLOOM_FILE)
+        current = os.path.exists(bloom_path) and index.meta.get('bloom_count') == index.meta.get('count')
+        if not exact:
+            if not current:
+                raise RuntimeError(f"No up-to-date Bloom filter in {index_dir} "
+                                   f"(run 'dedup_index.py sync' without --no-bloom first)")
+            index.bloom = BloomFilter.load(bloom_path)
+        elif use_bloom:
+            if current:
+                index.bloom = BloomFilter.load(bloom_path)
+            elif len(index.hashes):
+                print("[WARNING] Bloom filter missing or out of date, rebuilding from the index")
+                index.rebuild_bloom()
+        return index
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        self.hashes.save(os.path.join(self.index_dir, INDEX_FILE))
+        if self.bloom is not None:
+            self.bloom.save(os.path.join(self.index_dir, BLOOM_FILE))
+        self.meta['count'] = len(self.hashes)
+        # Without a Bloom filter in memory any bloom file on disk no longer covers the index
+        self.meta['bloom_count'] = len(self.hashes) if self.bloom is not None else None
+        with open(os.path.join(self.index_dir, META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+
+    def rebuild_bloom(self):
+        """Resize the Bloom filter for the current index (with 2x headroom)"""
+        self.bloom = BloomFilter.for_capacity(len(self.hashes) * 2, self.fp_rate)
+        for digest in self.hashes:
+            self.bloom.add(digest)
+
+    def add_many(self, digests):
+        digests = list(digests)
+        added = self.hashes.add_many(digests)
+        if self.use_bloom:
+            if self.bloom is None or len(self.hashes) > self.bloom.capacity:
+                self.rebuild_bloom()
+            else:
+                for digest in digests:
+                    self.bloom.add(digest)
+        return added
+
+    def classify(self, hex_hashes):
+        """Split hex hashes into (new, seen, unconfirmed)
+
+        With the exact index loaded every hash is either new or seen. In Bloom-only mode
+        Bloom hits are returned as unconfirmed; pass them to confirm_existing().
+        """
+        new, seen, unconfirmed = [], [], []
+        for hex_hash in hex_hashes:
+            digest = bytes.fromhex(hex_hash)
+            if self.bloom is not None and digest not in self.bloom:
+                new.append(hex_hash)
+            elif not self.exact:
+                unconfirmed.append(hex_hash)
+            elif digest in self.hashes:
+                seen.append(hex_hash)
+            else:
+                new.append(hex_hash)
+        return new, seen, unconfirmed
+
+
+def confirm_existing(conn, hex_hashes):
+    """One bulk IN (...) query returning the subset of hashes already in the clinics table"""
+    if not hex_hashes:
+        return set()
+    import db_utils
+    rows = db_utils.fetch_all(
+        conn,
+        f"SELECT form_465_hash FROM {db_utils.CLINICS_TABLE} WHERE form_465_hash = ANY(%s)",
+        (list(hex_hashes),)
+    )
+    return {row['form_465_hash'] for row in rows}
+
+
+def sync_from_db(index, conn, full=False):
+    """Pull hashes inserted since the stored created_at watermark into the index"""
+    import db_utils
+    watermark = None if full else index.meta.get('watermark')
+    sql = f"SELECT form_465_hash, created_at FROM {db_utils.CLINICS_TABLE}"
+    params = None
+    if watermark:
+        sql += " WHERE created_at >= %s"
+        params = (watermark,)
+
+    digests = []
+    latest = watermark
+    for row in db_utils.iter_rows(conn, sql, params, name='dedup_sync'):
+        if row['form_465_hash']:
+            digests.append(bytes.fromhex(row['form_465_hash']))
+        created_at = row['created_at'].isoformat() if row['created_at'] else None
+        if created_at and (latest is None or created_at > latest):
+            latest = created_at
+
+    if full:
+        index.hashes = HashIndex.from_digests(digests)
+        if index.use_bloom:
+            index.rebuild_bloom()
+        added = len(index.hashes)
+    else:
+        added = index.add_many(digests)
+    index.meta['watermark'] = latest
+    index.meta['synced_at'] = datetime.now().isoformat()
+    return added
+
+
+def classify_filings(index, filings, conn=None):
+    """Classify raw USAC API filings; returns (new_filings, seen_count)
+
+    Unconfirmed Bloom hits are resolved with a single bulk query when a connection is given,
+    otherwise they are treated as seen (the n8n insert is still protected by the unique key).
+    """
+    by_hash = {}
+    for filing in filings:
+        by_hash.setdefault(form_465_hash(filing), filing)
+
+    new, seen, unconfirmed = index.classify(list(by_hash))
+    if unconfirmed:
+        existing = confirm_existing(conn, unconfirmed) if conn is not None else set(unconfirmed)
+        new.extend(h for h in unconfirmed if h not in existing)
+        seen.extend(h for h in unconfirmed if h in existing)
+
+    new_filings = [dict(by_hash[h], form_465_hash=h) for h in new]
+    return new_filings, len(seen) + (len(filings) - len(by_hash))
+
+
+def run_benchmark(sizes, lookups=100000, fp_rate=0.01, seed=465):
+    """Memory-per-million and lookup latency for the exact index, Bloom filter and a plain set"""
+    rng = random.Random(seed)
+    results = []
+    for size in sizes:
+        digests = [rng.randbytes(DIGEST_SIZE) for _ in range(size)]
+        probes = [rng.choice(digests) for _ in range(lookups // 2)] + \
+                 [rng.randbytes(DIGEST_SIZE) for _ in range(lookups // 2)]
+        rng.shuffle(probes)
+
+        index, index_bytes = bench_utils.measure_memory(lambda: HashIndex.from_digests(digests))
+
+        def build_bloom():
+            bloom = BloomFilter.for_capacity(size, fp_rate)
+            for d in digests:
+                bloom.add(d)
+            return bloom
+        bloom, bloom_bytes = bench_utils.measure_memory(build_bloom)
+        plain_set, set_bytes = bench_utils.measure_memory(lambda: set(bytes(d) for d in digests))
+
+        row = {'size': size, 'lookups': len(probes)}
+        for name, structure, nbytes in (('sorted_index', index, index_bytes),
+                                        ('bloom', bloom, bloom_bytes),
+                                        ('python_set', plain_set, set_bytes)):
+            with bench_utils.Stopwatch() as sw:
+                hits = sum(1 for p in probes if p in structure)
+            row[name] = {
+                'mb_per_million': round(nbytes / size * 1_000_000 / 1024 / 1024, 2),
+                'lookup_us': round(sw.seconds / len(probes) * 1_000_000, 3),
+                'hits': hits,
+            }
+        row['bloom']['measured_fp_rate'] = round(
+            (row['bloom']['hits'] - row['sorted_index']['hits']) / (lookups // 2), 5)
+        results.append(row)
+
+        print(f"[BENCH] {size:,} hashes")
+        for name in ('sorted_index', 'bloom', 'python_set'):
+            r = row[name]
+            print(f"   {name:<13} {r['mb_per_million']:>8} MB/million  {r['lookup_us']:>7} us/lookup")
+        print(f"   bloom false-positive rate: {row['bloom']['measured_fp_rate']}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local form_465_hash dedup index')
+    parser.add_argument('--index-dir', default=DEFAULT_INDEX_DIR)
+    parser.add_argument('--no-bloom', action='store_true', help='Skip the Bloom filter front')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sync = sub.add_parser('sync', help='Sync index with the clinics table')
+    sync.add_argument('--full', action='store_true', help='Rebuild from scratch')
+
+    classify = sub.add_parser('classify', help='Classify a JSON array of USAC API filings')
+    classify.add_argument('filings_file')
+    classify.add_argument('--output', default='new_filings.json')
+    classify.add_argument('--bloom-only', action='store_true',
+                          help='Load only the Bloom filter and confirm hits with one DB query')
+
+    bench = sub.add_parser('benchmark', help='Memory and lookup latency benchmark')
+    bench.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000])
+    bench.add_argument('--lookups', type=int, default=100000)
+
+    args = parser.parse_args()
+    use_bloom = not args.no_bloom
+
+    if args.command == 'benchmark':
+        results = run_benchmark(args.sizes, args.lookups)
+        with open('dedup_benchmark.json', 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print("[SAVED] dedup_benchmark.json")
+        return
+
+    import db_utils
+
+    if args.command == 'sync':
+        index = DedupIndex.load(args.index_dir, use_bloom=use_bloom)
+        conn = db_utils.get_connection()
+        try:
+            added = sync_from_db(index, conn, full=args.full)
+        finally:
+            conn.close()
+        index.save()
+        print(f"[OK] Added {added} hashes, index now holds {len(index.hashes)}")
+        return
+
+    if args.command == 'classify':
+        with open(args.filings_file, 'r', encoding='utf-8') as f:
+            filings = json.load(f)
+        try:
+            index = DedupIndex.load(args.index_dir, use_bloom=use_bloom or args.bloom_only,
+                                    exact=not args.bloom_only)
+        except RuntimeError as e:
+            print(f"[ERROR] {e}")
+            sys.exit(1)
+        conn = db_utils.get_connection() if args.bloom_only else None
+        try:
+            new_filings, seen_count = classify_filings(index, filings, conn)
+        finally:
+            if conn is not None:
+                conn.close()
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(new_filings, f, indent=2)
+        print(f"[OK] {len(new_filings)} new, {seen_count} already seen")
+        print(f"[SAVED] {args.output}")
+
+
+if __name__ == '__main__':
+    main()
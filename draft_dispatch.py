@@ -0,0 +1,440 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Outlook Draft Dispatch
+Purpose: Create Outlook drafts for rendered email_instances in bulk through Microsoft Graph
+JSON batching, instead of one "Outlook - Create Draft" n8n execution per email.
+
+- up to 20 create-message requests per $batch call (Graph limit)
+- a bounded number of batch calls in flight at once
+- 429/503 handling (outer and per-request) honouring Retry-After; only those are re-sent, and
+  instances still pending after MAX_ATTEMPTS are marked failed
+- $batch is not idempotent, so after a network error, a 504 or a failed DB write the instances are
+  recorded in .cache/draft_dispatch_unknown.json and skipped by later runs until reconciled
+  (check the Drafts folder, then run with --forget-unknown)
+- draft_id / draft_url / draft_created_at written back to email_instances in bulk
+
+Usage:
+  python draft_dispatch.py --limit 500 --in-flight 4
+  python draft_dispatch.py --stand-in 400          # local Graph stand-in, reports drafts/minute
+  python draft_dispatch.py --forget-unknown         # after reconciling unknown outcomes by hand
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+import http.client
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bench_utils
+import http_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+GRAPH_URL = 'https://graph.microsoft.com/v1.0'
+GRAPH_BATCH_LIMIT = 20
+RETRYABLE_STATUSES = (429, 503)
+MAX_ATTEMPTS = 5
+DEFAULT_UNKNOWN_FILE = os.path.join('.cache', 'draft_dispatch_unknown.json')
+
+
+def get_graph_token():
+    """GRAPH_ACCESS_TOKEN if set, otherwise client-credentials flow with the MICROSOFT_* app settings"""
+    token = os.getenv('GRAPH_ACCESS_TOKEN')
+    if token:
+        return token
+    from urllib.parse import urlencode
+    import urllib.request
+    tenant = os.getenv('MICROSOFT_TENANT_ID')
+    data = urlencode({
+        'client_id': os.getenv('MICROSOFT_CLIENT_ID'),
+        'client_secret': os.getenv('MICROSOFT_CLIENT_SECRET'),
+        'scope': 'https://graph.microsoft.com/.default',
+        'grant_type': 'client_credentials',
+    }).encode('utf-8')
+    req = urllib.request.Request(f'https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token', data=data)
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.loads(resp.read())['access_token']
+
+
+def build_message(instance):
+    """Graph message payload; same fields as the "O365: Create Draft" node"""
+    return {
+        'subject': instance['subject_rendered'],
+        'importance': 'Normal',
+        'body': {'contentType': 'Text', 'content': instance['body_rendered']},
+        'toRecipients': [{'emailAddress': {
+            'address': instance.get('recipient_email') or '',
+            'name': instance.get('recipient_name') or '',
+        }}],
+    }
+
+
+def _retry_after(headers, default=1.0):
+    for key, value in (headers or {}).items():
+        if key.lower() == 'retry-after':
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return default
+    return default
+
+
+class DraftDispatcher:
+    """Send instances to Graph in $batch calls with at most `in_flight` calls outstanding"""
+
+    def __init__(self, token, graph_url=GRAPH_URL, mailbox_path='/me', folder_id=None,
+                 batch_size=GRAPH_BATCH_LIMIT, in_flight=4, writer=None):
+        self.token = token
+        self.graph_url = graph_url.rstrip('/')
+        self.messages_path = f"{mailbox_path}/mailFolders/{folder_id}/messages" if folder_id \
+            else f"{mailbox_path}/messages"
+        self.batch_size = min(batch_size, GRAPH_BATCH_LIMIT)
+        self.semaphore = asyncio.Semaphore(in_flight)
+        self.writer = writer
+        self.created = []
+        self.failed = []
+        self.unknown = []
+        self.throttled = 0
+        self.network_errors = 0
+        self.batch_latencies_ms = []
+
+    def _post_batch(self, requests):
+        return http_utils.request('POST', f"{self.graph_url}/$batch",
+                                  headers={'Authorization': f'Bearer {self.token}'},
+                                  json_body={'requests': requests})
+
+    def _unknown(self, instances, reason, draft_ids=None):
+        """Instances whose drafts may exist in Outlook without a draft_id in the DB"""
+        for inst in instances:
+            entry = {'id': inst['id'], 'status': None, 'error': reason}
+            if draft_ids and draft_ids.get(inst['id']):
+                entry['draft_id'] = draft_ids[inst['id']]
+            self.failed.append(entry)
+            self.unknown.append(entry)
+
+    async def send_batch(self, instances):
+        """Create drafts for up to 20 instances, re-sending only sub-requests Graph answered 429/503
+
+        $batch is not idempotent: after a network error, a 504 or an unreadable response the
+        drafts may already exist, so those instances are reported as unknown instead of re-sent.
+        """
+        pending = {str(i): inst for i, inst in enumerate(instances)}
+        results = []
+        resp = None
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            last = attempt == MAX_ATTEMPTS
+            requests = [{
+                'id': req_id,
+                'method': 'POST',
+                'url': self.messages_path,
+                'headers': {'Content-Type': 'application/json'},
+                'body': build_message(inst),
+            } for req_id, inst in pending.items()]
+
+            async with self.semaphore:
+                start = time.perf_counter()
+                try:
+                    resp = await asyncio.to_thread(self._post_batch, requests)
+                except (OSError, http.client.HTTPException) as e:
+                    self.network_errors += 1
+                    self._unknown(pending.values(), f"outcome unknown ({type(e).__name__}: {e})")
+                    pending = {}
+                    break
+                finally:
+                    self.batch_latencies_ms.append((time.perf_counter() - start) * 1000)
+
+            if resp.status in RETRYABLE_STATUSES:
+                # Throttled as a whole: Graph ran none of the sub-requests
+                self.throttled += len(pending)
+                if not last:
+                    await asyncio.sleep(_retry_after(resp.headers, default=2 ** attempt))
+                continue
+            if not resp.ok:
+                reason = f"outcome unknown (HTTP {resp.status})" if resp.status == 504 else f"HTTP {resp.status}"
+                if resp.status == 504:
+                    self._unknown(pending.values(), reason)
+                else:
+                    self.failed.extend({'id': inst['id'], 'status': resp.status, 'error': reason}
+                                       for inst in pending.values())
+                pending = {}
+                break
+            try:
+                responses = resp.json().get('responses', [])
+            except ValueError as e:
+                self._unknown(pending.values(), f"outcome unknown (unreadable $batch response: {e})")
+                pending = {}
+                break
+
+            wait = 0.0
+            for item in responses:
+                inst = pending.get(item.get('id'))
+                if inst is None:
+                    continue
+                status = item.get('status', 0)
+                if 200 <= status < 300:
+                    body = item.get('body') or {}
+                    results.append({
+                        'id': inst['id'],
+                        'clinic_id': inst.get('clinic_id'),
+                        'draft_id': body.get('id'),
+                        'draft_url': body.get('webLink'),
+                        'draft_created_at': body.get('createdDateTime') or datetime.now(timezone.utc).isoformat(),
+                    })
+                    del pending[item['id']]
+                elif status in RETRYABLE_STATUSES:
+                    self.throttled += 1
+                    wait = max(wait, _retry_after(item.get('headers'), default=2 ** attempt))
+                else:
+                    self.failed.append({'id': inst['id'], 'status': status,
+                                        'error': (item.get('body') or {}).get('error')})
+                    del pending[item['id']]
+            if not pending:
+                break
+            if not last:
+                await asyncio.sleep(wait)
+
+        for inst in pending.values():
+            self.failed.append({'id': inst['id'], 'status': resp.status if resp is not None else None,
+                                'error': 'retries exhausted'})
+
+        if results and self.writer is not None:
+            try:
+                await asyncio.to_thread(self.writer, results)
+            except Exception as e:
+                # The drafts exist; keep their ids so they can be recorded instead of created again
+                self._unknown(results, f"draft created, DB write failed ({type(e).__name__}: {e})",
+                              draft_ids={r['id']: r['draft_id'] for r in results})
+                return []
+        self.created.extend(results)
+        return results
+
+    async def run(self, instances):
+        batches = [instances[i:i + self.batch_size] for i in range(0, len(instances), self.batch_size)]
+        outcomes = await asyncio.gather(*(self.send_batch(b) for b in batches), return_exceptions=True)
+        settled = {r['id'] for r in self.created} | {f['id'] for f in self.failed}
+        for batch, outcome in zip(batches, outcomes):
+            if isinstance(outcome, Exception):
+                self._unknown([inst for inst in batch if inst['id'] not in settled],
+                              f"outcome unknown ({type(outcome).__name__}: {outcome})")
+
+
+def load_unknown(path=DEFAULT_UNKNOWN_FILE):
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_unknown(entries, path=DEFAULT_UNKNOWN_FILE):
+    """Keep instances with an unknown outcome out of later runs until they are reconciled"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=2)
+
+
+def load_pending_instances(conn, limit, exclude=()):
+    """Rendered instances without a draft yet, with the recipient from the clinic row
+
+    `exclude` holds ids whose last dispatch had an unknown outcome (see DEFAULT_UNKNOWN_FILE).
+    """
+    import db_utils
+    return db_utils.fetch_all(conn, f"""
+        SELECT ei.id::text AS id, ei.clinic_id::text AS clinic_id,
+               ei.subject_rendered, ei.body_rendered,
+               CASE WHEN c.mail_contact_is_consultant THEN c.mail_contact_email
+                    ELSE COALESCE(c.contact_email, c.mail_contact_email) END AS recipient_email,
+               concat_ws(' ', c.mail_contact_first_name, c.mail_contact_last_name) AS recipient_name
+        FROM email_instances ei
+        JOIN {db_utils.CLINICS_TABLE} c ON c.id = ei.clinic_id
+        WHERE ei.draft_id IS NULL AND ei.id::text <> ALL(%s)
+        ORDER BY ei.created_at
+        LIMIT %s
+    """, (list(exclude), limit))
+
+
+def make_db_writer(conn):
+    """Record draft ids on email_instances and flag the clinics in two bulk statements"""
+    import db_utils
+    lock = threading.Lock()
+
+    def write(results):
+        with lock:
+            db_utils.bulk_update(conn, 'email_instances', results,
+                                 ['draft_id', 'draft_url', 'draft_created_at'],
+                                 casts={'id': 'uuid', 'draft_created_at': 'timestamptz'})
+            clinic_rows = [{'id': cid, 'email_draft_created': True}
+                           for cid in {r['clinic_id'] for r in results if r.get('clinic_id')}]
+            db_utils.bulk_update(conn, db_utils.CLINICS_TABLE, clinic_rows, ['email_draft_created'],
+                                 casts={'id': 'uuid'})
+    return write
+
+
+class GraphStandIn:
+    """Local stand-in for the Graph $batch endpoint
+
+    Each sub-request takes `latency_ms`, and `throttle_rate` of them come back 429 with a
+    Retry-After header, so the dispatcher's retry path is exercised.
+    """
+
+    def __init__(self, latency_ms=60, throttle_rate=0.05, retry_after=1, seed=28):
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.batch_calls = 0
+        self.drafts = {}
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                if not self.path.endswith('/$batch'):
+                    self.send_error(404)
+                    return
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                body = json.dumps({'responses': stand_in.handle(payload['requests'])}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1.0"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def handle(self, requests):
+        if len(requests) > GRAPH_BATCH_LIMIT:
+            return [{'id': r['id'], 'status': 400, 'body': {'error': {'code': 'BadRequest'}}} for r in requests]
+        with self.lock:
+            self.batch_calls += 1
+        time.sleep(self.latency_ms / 1000)
+        responses = []
+        for r in requests:
+            with self.lock:
+                throttled = self.rng.random() < self.throttle_rate
+                draft_id = f"AAMk{len(self.drafts):08d}"
+                if not throttled:
+                    self.drafts[draft_id] = r['body']
+            if throttled:
+                responses.append({'id': r['id'], 'status': 429,
+                                  'headers': {'Retry-After': str(self.retry_after)},
+                                  'body': {'error': {'code': 'TooManyRequests'}}})
+            else:
+                responses.append({'id': r['id'], 'status': 201, 'body': {
+                    'id': draft_id,
+                    'webLink': f"https://outlook.office365.com/owa/?ItemID={draft_id}",
+                    'createdDateTime': datetime.now(timezone.utc).isoformat(),
+                }})
+        return responses
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+def synthetic_instances(count):
+    return [{
+        'id': f'instance-{i}',
+        'clinic_id': f'clinic-{i}',
+        'subject_rendered': f'USAC RHC Support - Clinic {i}',
+        'body_rendered': f'Contact,\n\nI saw Clinic {i} filed a Form 465.\n\nThanks,\nMike',
+        'recipient_email': f'contact{i}@example.org',
+        'recipient_name': f'Contact {i}',
+    } for i in range(count)]
+
+
+def report(dispatcher, total, seconds):
+    rate = len(dispatcher.created) / seconds * 60 if seconds else 0
+    print(f"[SUCCESS] {len(dispatcher.created)}/{total} drafts created in {seconds:.1f}s "
+          f"({rate:.0f} drafts/minute)")
+    print(f"[STATS] {dispatcher.throttled} throttled sub-requests retried, {dispatcher.network_errors} network errors, "
+          f"{len(dispatcher.failed)} failed ({len(dispatcher.unknown)} with unknown outcome)")
+    bench_utils.print_latency_summary('$batch call latency', dispatcher.batch_latencies_ms)
+    for failure in dispatcher.failed[:10]:
+        print(f"[ERROR] {failure['id']}: HTTP {failure['status'] or '-'} {failure['error']}")
+    if dispatcher.unknown:
+        print(f"[WARNING] {len(dispatcher.unknown)} instances may already have drafts; reconcile them before "
+              f"re-sending (--forget-unknown)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk Outlook draft creation via Graph $batch')
+    parser.add_argument('--limit', type=int, default=500, help='Max instances to dispatch')
+    parser.add_argument('--in-flight', type=int, default=4, help='Max concurrent $batch calls')
+    parser.add_argument('--batch-size', type=int, default=GRAPH_BATCH_LIMIT)
+    parser.add_argument('--mailbox', default=os.getenv('GRAPH_MAILBOX'),
+                        help='User principal name (app-only auth); defaults to /me')
+    parser.add_argument('--folder-id', default=os.getenv('GRAPH_DRAFTS_FOLDER_ID'),
+                        help='Mail folder id for "USAC Drafts" (default: Drafts)')
+    parser.add_argument('--stand-in', type=int, default=0,
+                        help='Dispatch N synthetic drafts to a local Graph stand-in')
+    parser.add_argument('--throttle-rate', type=float, default=0.05)
+    parser.add_argument('--unknown-file', default=DEFAULT_UNKNOWN_FILE,
+                        help='Instances with an unknown outcome, skipped until reconciled')
+    parser.add_argument('--forget-unknown', action='store_true',
+                        help='Clear the unknown-outcome list (after checking the Drafts folder)')
+    args = parser.parse_args()
+
+    if args.forget_unknown:
+        forgotten = load_unknown(args.unknown_file)
+        save_unknown([], args.unknown_file)
+        print(f"[OK] {len(forgotten)} unknown-outcome instances will be dispatched again")
+        return
+
+    if args.stand_in:
+        instances = synthetic_instances(args.stand_in)
+        with GraphStandIn(throttle_rate=args.throttle_rate) as stand_in:
+            dispatcher = DraftDispatcher('stand-in-token', graph_url=stand_in.url,
+                                         batch_size=args.batch_size, in_flight=args.in_flight)
+            with bench_utils.Stopwatch() as sw:
+                asyncio.run(dispatcher.run(instances))
+            print(f"[STAND-IN] {stand_in.batch_calls} $batch calls, {len(stand_in.drafts)} drafts stored")
+        report(dispatcher, len(instances), sw.seconds)
+        return
+
+    import db_utils
+    conn = db_utils.get_connection()
+    unknown = load_unknown(args.unknown_file)
+    try:
+        if unknown:
+            print(f"[WARNING] Skipping {len(unknown)} instances with an unknown outcome ({args.unknown_file})")
+        instances = load_pending_instances(conn, args.limit, exclude=[u['id'] for u in unknown])
+        if not instances:
+            print("[OK] No rendered instances waiting for drafts")
+            return
+        mailbox_path = f"/users/{args.mailbox}" if args.mailbox else '/me'
+        dispatcher = DraftDispatcher(get_graph_token(), mailbox_path=mailbox_path, folder_id=args.folder_id,
+                                     batch_size=args.batch_size, in_flight=args.in_flight,
+                                     writer=make_db_writer(conn))
+        print(f"[DISPATCHING] {len(instances)} drafts, {args.in_flight} batches in flight")
+        with bench_utils.Stopwatch() as sw:
+            try:
+                asyncio.run(dispatcher.run(instances))
+            finally:
+                if dispatcher.unknown:
+                    save_unknown(unknown + dispatcher.unknown, args.unknown_file)
+        report(dispatcher, len(instances), sw.seconds)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,640 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Template Edit Miner
+Purpose: Turn Mike's manual draft edits (email_instances.original_body -> edited_body) into
+template_edits rows, recurring edit patterns and new voice-profile avoid phrases
+
+Each body is split into sentences once and the sentences are diffed with Myers' O(ND)
+algorithm (after trimming the common prefix/suffix). Only sentences that changed are tokenized
+into interned word ids and diffed again at word level, so one row describes e.g. a whole
+shortened opening rather than three word swaps. The speedup over difflib comes from diffing
+sentences first: myers_opcodes itself is pure Python and no faster than
+difflib.SequenceMatcher on a whole body (about 0.9x in --benchmark); it is kept for its
+minimal edit scripts and the MAX_EDIT_DISTANCE cut-off. Clinic-specific values are replaced by
+{{placeholders}} and numbers by '#', and the normalized edit is the cluster label stored in
+pattern_identified. Pairs are mined across a process pool.
+
+Only edited instances without an edit_summary are mined; the job sets edit_summary on every
+instance it processes. Removed phrases (3+ words) that recur in --min-support instances (and
+--min-share of the batch) are appended to avoid_phrases in mike_voice_profile.json.
+
+Usage:
+  python edit_mining.py --dry-run
+  python edit_mining.py                        # mine pending edits, write template_edits + edit_summary
+  python edit_mining.py --full                 # re-mine every edited instance
+  python edit_mining.py --snapshot data/snapshots   # read-only analysis of a Parquet snapshot
+  python edit_mining.py --benchmark 20000      # synthetic pairs: difflib vs Myers vs pool
+  python edit_mining.py --benchmark 5000 --workers 2   # also checks the pool against one process
+"""
+
+import re
+import sys
+import math
+import json
+import difflib
+import argparse
+import multiprocessing
+from datetime import datetime
+
+import bench_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+VOICE_PROFILE_FILE = 'mike_voice_profile.json'
+TOKEN_RE = re.compile(r"\n{2,}|\n|\w+(?:['’]\w+)*|[^\w\s]")
+# A sentence runs to its closing punctuation or the end of the line; line breaks come out separately
+SENTENCE_RE = re.compile(r"\n{2,}|\n|[^\n.!?]+[.!?]*|[.!?]+")
+CTA_WORDS = {'call', 'schedule', 'minutes', 'meet', 'discuss', 'chat'}
+CLOSING_WORDS = {'thanks', 'thank', 'regards', 'best', 'cheers'}
+# Beyond this many edits a pair is treated as a rewrite: one replacement of the changed middle
+MAX_EDIT_DISTANCE = 400
+MIN_FRAGMENT_WORDS = 3
+MAX_FRAGMENT_WORDS = 12
+
+
+def tokenize(text):
+    """[(token, start, end)] with \r\n normalized; blank-line runs are one paragraph token"""
+    text = (text or '').replace('\r\n', '\n')
+    return text, [(m.group(), m.start(), m.end()) for m in TOKEN_RE.finditer(text)]
+
+
+def intern_tokens(a_tokens, b_tokens):
+    vocab = {}
+    a = [vocab.setdefault(t, len(vocab)) for t, _, _ in a_tokens]
+    b = [vocab.setdefault(t, len(vocab)) for t, _, _ in b_tokens]
+    return a, b
+
+
+def _myers_matches(a, b, a0, b0, max_d):
+    """Matched (i, j) index pairs of a shortest edit script for a[a0:] vs b[b0:], or None past max_d"""
+    n, m = len(a) - a0, len(b) - b0
+    limit = min(n + m, max_d)
+    offset = limit + 1
+    v = [0] * (2 * limit + 3)
+    trace = []
+    for d in range(limit + 1):
+        trace.append(v[offset - d - 1:offset + d + 2])
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[offset + k - 1] < v[offset + k + 1]):
+                x = v[offset + k + 1]
+            else:
+                x = v[offset + k - 1] + 1
+            y = x - k
+            while x < n and y < m and a[a0 + x] == b[b0 + y]:
+                x += 1
+                y += 1
+            v[offset + k] = x
+            if x >= n and y >= m:
+                return _backtrack(trace, n, m, a0, b0)
+    return None
+
+
+def _backtrack(trace, x, y, a0, b0):
+    matches = []
+    for d in range(len(trace) - 1, -1, -1):
+        # trace[d] holds V for diagonals -d-1 .. d+1 before step d
+        v = trace[d]
+        k = x - y
+        if d == 0:
+            prev_x = prev_y = 0
+        else:
+            prev_k = k + 1 if k == -d or (k != d and v[k + d] < v[k + d + 2]) else k - 1
+            prev_x = v[prev_k + d + 1]
+            prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((a0 + x, b0 + y))
+        x, y = prev_x, prev_y
+    matches.reverse()
+    return matches
+
+
+def myers_opcodes(a, b, max_d=MAX_EDIT_DISTANCE):
+    """difflib-style opcodes ('equal'/'delete'/'insert'/'replace', i1, i2, j1, j2) from a Myers diff"""
+    n, m = len(a), len(b)
+    prefix = 0
+    while prefix < n and prefix < m and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < n - prefix and suffix < m - prefix and a[n - 1 - suffix] == b[m - 1 - suffix]:
+        suffix += 1
+
+    middle = _myers_matches(a[:n - suffix], b[:m - suffix], prefix, prefix, max_d)
+    matches = [(i, i) for i in range(prefix)] + (middle or [])
+    matches += [(n - suffix + i, m - suffix + i) for i in range(suffix)]
+
+    opcodes = []
+    i = j = 0
+    for mi, mj in matches + [(n, m)]:
+        if mi > i or mj > j:
+            tag = 'replace' if mi > i and mj > j else ('delete' if mi > i else 'insert')
+            opcodes.append([tag, i, mi, j, mj])
+        if mi < n or mj < m:
+            if opcodes and opcodes[-1][0] == 'equal':
+                opcodes[-1][2] += 1
+                opcodes[-1][4] += 1
+            else:
+                opcodes.append(['equal', mi, mi + 1, mj, mj + 1])
+        i, j = mi + 1, mj + 1
+    return [tuple(op) for op in opcodes]
+
+
+def similarity(a, b):
+    """Overlap coefficient of the token sets, so a shortened sentence still pairs with its original"""
+    a, b = set(a), set(b)
+    return len(a & b) / min(len(a), len(b)) if a and b else 0.0
+
+
+def align_sentences(a_ids, b_ids, min_similarity=0.4):
+    """Monotone pairing of the sentences in a replaced block; unpaired ones become deletions/additions"""
+    n, m = len(a_ids), len(b_ids)
+    if n == m == 1:
+        return [(0, 0)]
+    sims = [[similarity(x, y) for y in b_ids] for x in a_ids]
+    best = [[0.0] * (m + 1) for _ in range(n + 1)]
+    for i in range(n - 1, -1, -1):
+        for j in range(m - 1, -1, -1):
+            paired = best[i + 1][j + 1] + sims[i][j] if sims[i][j] >= min_similarity else -1.0
+            best[i][j] = max(paired, best[i + 1][j], best[i][j + 1])
+    pairs = []
+    i = j = 0
+    while i < n and j < m:
+        if sims[i][j] >= min_similarity and best[i][j] == best[i + 1][j + 1] + sims[i][j]:
+            pairs.append((i, j))
+            i, j = i + 1, j + 1
+        elif best[i][j] == best[i + 1][j]:
+            pairs.append((i, None))
+            i += 1
+        else:
+            pairs.append((None, j))
+            j += 1
+    pairs += [(k, None) for k in range(i, n)] + [(None, k) for k in range(j, m)]
+    return pairs
+
+
+def classify_field(words, paragraph, last_paragraph, enrichment):
+    lowered = {w.lower() for w in words}
+    text = ' '.join(words).lower()
+    if enrichment and text and text in enrichment.lower():
+        return 'enrichment'
+    if paragraph <= 1:
+        return 'opening'
+    if paragraph >= last_paragraph - 1 and lowered & CLOSING_WORDS:
+        return 'closing'
+    if '?' in words or lowered & CTA_WORDS:
+        return 'cta'
+    return 'body'
+
+
+def classify_edit(original_words, edited_words):
+    if not edited_words:
+        return 'deletion'
+    if not original_words:
+        return 'addition'
+    if len(edited_words) > len(original_words) and ' '.join(original_words) in ' '.join(edited_words):
+        return 'addition'
+    if len(edited_words) <= 0.7 * len(original_words):
+        return 'shortening'
+    return 'replacement'
+
+
+def normalize(text, context):
+    """Lowercase with clinic values as {{placeholders}} and digit runs as '#'"""
+    text = ' '.join(text.split())
+    for placeholder, value in context.items():
+        if value and len(value) > 1:
+            text = re.sub(re.escape(value), '{{' + placeholder + '}}', text, flags=re.IGNORECASE)
+    return re.sub(r'\d+', '#', text.lower())
+
+
+def pattern_label(edit_type, field, original, edited):
+    if edit_type == 'deletion':
+        return f'{edit_type}/{field}: "{original}"'
+    if edit_type == 'addition':
+        return f'{edit_type}/{field}: + "{edited}"'
+    return f'{edit_type}/{field}: "{original}" -> "{edited}"'
+
+
+class _Side:
+    """One body split into sentences; words are tokenized (and interned) only for sentences that changed"""
+
+    def __init__(self, body, vocab):
+        self.text = (body or '').replace('\r\n', '\n')
+        self.vocab = vocab
+        self.spans = []
+        paragraph = 0
+        for m in SENTENCE_RE.finditer(self.text):
+            chunk = m.group()
+            if chunk[0] == '\n':
+                paragraph += len(chunk) > 1
+                continue
+            stripped = chunk.strip()
+            if stripped:
+                start = m.start() + chunk.index(stripped[0])
+                self.spans.append((start, start + len(stripped), paragraph))
+        # Whitespace-only differences do not count as edits
+        self.keys = [' '.join(self.text[s:e].split()) for s, e, _ in self.spans]
+        self.last_paragraph = self.spans[-1][2] if self.spans else 0
+        self._tokens = {}
+
+    def sentence_text(self, n):
+        start, end, _ = self.spans[n]
+        return self.text[start:end]
+
+    def tokens(self, n):
+        """[(token, start, end)] for sentence n, tokenized on first use"""
+        if n not in self._tokens:
+            start, end, _ = self.spans[n]
+            self._tokens[n] = [(m.group(), m.start(), m.end()) for m in TOKEN_RE.finditer(self.text, start, end)]
+        return self._tokens[n]
+
+    def words(self, n):
+        return [t for t, _, _ in self.tokens(n)]
+
+    def sentence_ids(self, n):
+        return [self.vocab.setdefault(t, len(self.vocab)) for t, _, _ in self.tokens(n)]
+
+
+def diff_pair(orig, edit):
+    """[(original sentence or None, edited sentence or None, word opcodes or None)] for every changed sentence
+
+    Sentences are diffed first (each interned as one symbol), so the word-level Myers diff only
+    runs inside sentence pairs that actually changed.
+    """
+    keys = {}
+    a = [keys.setdefault(k, len(keys)) for k in orig.keys]
+    b = [keys.setdefault(k, len(keys)) for k in edit.keys]
+    changed = []
+    for tag, i1, i2, j1, j2 in myers_opcodes(a, b):
+        if tag == 'delete':
+            changed += [(i, None, None) for i in range(i1, i2)]
+        elif tag == 'insert':
+            changed += [(None, j, None) for j in range(j1, j2)]
+        elif tag == 'replace':
+            block = align_sentences([orig.sentence_ids(i) for i in range(i1, i2)],
+                                    [edit.sentence_ids(j) for j in range(j1, j2)])
+            for i, j in block:
+                if i is None or j is None:
+                    changed.append((None if i is None else i1 + i, None if j is None else j1 + j, None))
+                else:
+                    changed.append((i1 + i, j1 + j, myers_opcodes(orig.sentence_ids(i1 + i),
+                                                                    edit.sentence_ids(j1 + j))))
+    return changed
+
+
+def mine_pair(pair):
+    """Sentence-level edits for one instance; runs in the worker processes"""
+    context = {k: pair.get(k) for k in ('clinic_name', 'city', 'state', 'first_name')}
+    # Fragments naming the clinic or contact are specific to one email, never avoid phrases
+    context_words = {w.lower() for value in context.values() if value for w in TOKEN_RE.findall(value)}
+    vocab = {}
+    orig, edit = _Side(pair['original_body'], vocab), _Side(pair['edited_body'], vocab)
+
+    edits = []
+    removed_words = added_words = 0
+    for i, j, word_opcodes in diff_pair(orig, edit):
+        original_words = orig.words(i) if i is not None else []
+        edited_words = edit.words(j) if j is not None else []
+        fragments = []
+        if word_opcodes is not None:
+            # What exactly was taken out of the sentence
+            for tag, w1, w2, v1, v2 in word_opcodes:
+                if tag in ('delete', 'replace'):
+                    words = original_words[w1:w2]
+                    removed_words += len(words)
+                    if context_words & {w.lower() for w in words}:
+                        continue
+                    if MIN_FRAGMENT_WORDS <= sum(1 for w in words if w[0].isalnum()) <= MAX_FRAGMENT_WORDS:
+                        tokens = orig.tokens(i)
+                        fragments.append(orig.text[tokens[w1][1]:tokens[w2 - 1][2]].strip(' .,;:!?'))
+                if tag in ('insert', 'replace'):
+                    added_words += v2 - v1
+        else:
+            removed_words += len(original_words)
+            added_words += len(edited_words)
+            if (i is not None and MIN_FRAGMENT_WORDS <= len(original_words) <= MAX_FRAGMENT_WORDS
+                    and not context_words & {w.lower() for w in original_words}):
+                fragments.append(orig.sentence_text(i).strip(' .,;:!?'))
+
+        original_text = orig.sentence_text(i) if i is not None else ''
+        edited_text = edit.sentence_text(j) if j is not None else ''
+        if i is not None:
+            field = classify_field(original_words, orig.spans[i][2], orig.last_paragraph, pair.get('enrichment'))
+        else:
+            field = classify_field(edited_words, edit.spans[j][2], edit.last_paragraph, pair.get('enrichment'))
+        edit_type = classify_edit(original_words, edited_words)
+        edits.append({
+            'field_changed': field,
+            'edit_type': edit_type,
+            'original_text': original_text,
+            'edited_text': edited_text,
+            'pattern': pattern_label(edit_type, field, normalize(original_text, context),
+                                     normalize(edited_text, context)),
+            'fragments': [(normalize(f, context), f) for f in fragments],
+        })
+    return {'id': pair['id'], 'edits': edits, 'words_removed': removed_words, 'words_added': added_words}
+
+
+def mine_pairs(pairs, workers=None, chunksize=64):
+    """mine_pair over all pairs, across a process pool when workers > 1"""
+    workers = workers or multiprocessing.cpu_count()
+    if workers <= 1 or len(pairs) < chunksize * 2:
+        return [mine_pair(p) for p in pairs]
+    with multiprocessing.Pool(workers) as pool:
+        return list(pool.imap(mine_pair, pairs, chunksize=chunksize))
+
+
+def cluster(results):
+    """(pattern -> instance count, fragment -> (instance count, display text)) over mined results"""
+    patterns, fragments = {}, {}
+    for result in results:
+        seen_patterns, seen_fragments = set(), set()
+        for edit in result['edits']:
+            seen_patterns.add(edit['pattern'])
+            for key, text in edit['fragments']:
+                if key not in seen_fragments:
+                    seen_fragments.add(key)
+                    count, display = fragments.get(key, (0, text))
+                    fragments[key] = (count + 1, display)
+        for p in seen_patterns:
+            patterns[p] = patterns.get(p, 0) + 1
+    return patterns, fragments
+
+
+def support_threshold(instances, min_support, min_share):
+    """Instances an edit must recur in: at least min_support, and min_share of the batch"""
+    return max(min_support, math.ceil(min_share * instances))
+
+
+def avoid_additions(fragments, existing, min_support):
+    """Recurring removed phrases not already covered by an avoid phrase (no placeholders/numbers)"""
+    covered = [p.lower() for p in existing]
+    additions = []
+    for key, (count, text) in sorted(fragments.items(), key=lambda kv: -kv[1][0]):
+        if count < min_support or '{{' in key or '#' in key:
+            continue
+        if any(c in key for c in covered) or any(key in c for c in covered):
+            continue
+        additions.append(text)
+        covered.append(key)
+    return additions
+
+
+def update_voice_profile(additions, path=VOICE_PROFILE_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        profile = json.load(f)
+    profile['avoid_phrases'] = profile.get('avoid_phrases', []) + additions
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profile, f, indent=2)
+
+
+def edit_rows(pair, result):
+    return [{
+        'template_id': pair.get('template_id'),
+        'instance_id': pair['id'],
+        'field_changed': e['field_changed'],
+        'original_text': e['original_text'],
+        'edited_text': e['edited_text'],
+        'edit_type': e['edit_type'],
+        'resulted_in_open': pair.get('opened'),
+        'resulted_in_response': pair.get('responded'),
+        'pattern_identified': e['pattern'],
+    } for e in result['edits']]
+
+
+def edit_summary(result, mined_at):
+    return json.dumps({
+        'edits': len(result['edits']),
+        'words_removed': result['words_removed'],
+        'words_added': result['words_added'],
+        'fields': sorted({e['field_changed'] for e in result['edits']}),
+        'edit_types': sorted({e['edit_type'] for e in result['edits']}),
+        'mined_at': mined_at,
+    })
+
+
+PENDING_SQL = """
+    SELECT ei.id::text AS id, ei.template_id::text AS template_id, ei.original_body, ei.edited_body,
+           ei.enrichment_data->>'formatted' AS enrichment,
+           ei.opened_at IS NOT NULL AS opened, ei.responded_at IS NOT NULL AS responded,
+           c.clinic_name, c.city, c.state, c.mail_contact_first_name AS first_name
+    FROM email_instances ei
+    LEFT JOIN {clinics} c ON c.id = ei.clinic_id
+    WHERE ei.user_edited
+      AND ei.original_body IS NOT NULL AND ei.edited_body IS NOT NULL
+      {pending}
+"""
+
+TOP_PATTERNS_SQL = """
+    SELECT pattern_identified, count(DISTINCT instance_id) AS instances
+    FROM template_edits
+    WHERE pattern_identified IS NOT NULL
+    GROUP BY pattern_identified
+    HAVING count(DISTINCT instance_id) >= %s
+    ORDER BY instances DESC
+    LIMIT 20
+"""
+
+EDIT_COLUMNS = ['template_id', 'instance_id', 'field_changed', 'original_text', 'edited_text', 'edit_type',
+                'resulted_in_open', 'resulted_in_response', 'pattern_identified']
+
+
+def print_clusters(patterns, min_support, limit=20):
+    recurring = sorted(((n, p) for p, n in patterns.items() if n >= min_support), reverse=True)
+    print(f"\n[PATTERNS] {len(recurring)} recurring (>= {min_support} instances) of {len(patterns)} distinct edits")
+    for n, p in recurring[:limit]:
+        print(f"   {n:>6,}  {p[:140]}")
+
+
+def snapshot_pairs(root, full=False):
+    """Same rows as PENDING_SQL, read from a snapshot_export.py Parquet snapshot"""
+    import pyarrow.compute as pc
+    import snapshot_export
+    instances = snapshot_export.read_table('email_instances', root, columns=[
+        'id', 'template_id', 'clinic_id', 'user_edited', 'original_body', 'edited_body', 'enrichment_data',
+        'opened_at', 'responded_at', 'edit_summary'])
+    mask = pc.and_(pc.fill_null(instances['user_edited'], False),
+                   pc.and_(pc.is_valid(instances['original_body']), pc.is_valid(instances['edited_body'])))
+    if not full:
+        mask = pc.and_(mask, pc.is_null(instances['edit_summary']))
+    instances = instances.filter(mask)
+
+    clinics = {c['id']: c for c in snapshot_export.iter_rows(
+        'clinics', root, columns=['id', 'clinic_name', 'city', 'state', 'mail_contact_first_name'])}
+    pairs = []
+    for row in instances.to_pylist():
+        clinic = clinics.get(row['clinic_id']) or {}
+        enrichment = json.loads(row['enrichment_data']) if row['enrichment_data'] else {}
+        pairs.append({
+            'id': row['id'], 'template_id': row['template_id'],
+            'original_body': row['original_body'], 'edited_body': row['edited_body'],
+            'enrichment': enrichment.get('formatted') if isinstance(enrichment, dict) else None,
+            'opened': row['opened_at'] is not None, 'responded': row['responded_at'] is not None,
+            'clinic_name': clinic.get('clinic_name'), 'city': clinic.get('city'), 'state': clinic.get('state'),
+            'first_name': clinic.get('mail_contact_first_name'),
+        })
+    return pairs
+
+
+def analyze(pairs, workers, min_support, min_share, profile_file):
+    """Mine and cluster the pairs, print the recurring patterns; returns (results, avoid additions)"""
+    with bench_utils.Stopwatch() as sw:
+        results = mine_pairs(pairs, workers)
+    print(f"[MINED] {sum(len(r['edits']) for r in results):,} edits in {sw.seconds:.2f}s "
+          f"({len(pairs) / sw.seconds:,.0f} pairs/sec)")
+
+    patterns, fragments = cluster(results)
+    threshold = support_threshold(len(pairs), min_support, min_share)
+    print_clusters(patterns, threshold)
+    with open(profile_file, 'r', encoding='utf-8') as f:
+        existing = json.load(f).get('avoid_phrases', [])
+    additions = avoid_additions(fragments, existing, threshold)
+    for phrase in additions:
+        print(f"[AVOID] + {phrase}")
+    return results, additions
+
+
+def run_snapshot_analysis(root, full=False, workers=None, min_support=3, min_share=0.01,
+                          profile_file=VOICE_PROFILE_FILE):
+    """Pattern report from a Parquet snapshot; never touches the database or the voice profile"""
+    pairs = snapshot_pairs(root, full)
+    print(f"[INFO] {len(pairs):,} edited instances in the snapshot at {root}")
+    if pairs:
+        analyze(pairs, workers, min_support, min_share, profile_file)
+        print("\n[SNAPSHOT] Read-only analysis, nothing written")
+
+
+def run_mining(full=False, dry_run=False, workers=None, min_support=3, min_share=0.01,
+               profile_file=VOICE_PROFILE_FILE):
+    import db_utils
+    conn = db_utils.get_connection()
+    try:
+        pending = '' if full else 'AND ei.edit_summary IS NULL'
+        pairs = db_utils.fetch_all(conn, PENDING_SQL.format(clinics=db_utils.CLINICS_TABLE, pending=pending))
+        print(f"[INFO] {len(pairs):,} edited instances to mine")
+        if not pairs:
+            return
+
+        results, additions = analyze(pairs, workers, min_support, min_share, profile_file)
+
+        if dry_run:
+            print("\n[DRY RUN] Nothing written")
+            return
+
+        mined_at = datetime.now().isoformat()
+        rows = [row for pair, result in zip(pairs, results) for row in edit_rows(pair, result)]
+        summaries = [{'id': r['id'], 'edit_summary': edit_summary(r, mined_at)} for r in results]
+        if full:
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM template_edits WHERE instance_id = ANY(%s::uuid[])", ([p['id'] for p in pairs],))
+        # One transaction: edits without a summary would be mined again and duplicated on the next run
+        db_utils.bulk_insert(conn, 'template_edits', rows, EDIT_COLUMNS, commit=False)
+        db_utils.bulk_update(conn, 'email_instances', summaries, ['edit_summary'],
+                             casts={'id': 'uuid', 'edit_summary': 'jsonb'}, commit=False)
+        conn.commit()
+        print(f"\n[SUCCESS] {len(rows):,} template_edits rows, {len(summaries):,} edit summaries written")
+
+        print("\n[PATTERNS] Recurring across all mined edits:")
+        for row in db_utils.fetch_all(conn, TOP_PATTERNS_SQL, (min_support,)):
+            print(f"   {row['instances']:>6,}  {row['pattern_identified'][:140]}")
+    finally:
+        conn.close()
+
+    if additions:
+        update_voice_profile(additions, profile_file)
+        print(f"[OK] {len(additions)} phrases added to avoid_phrases in {profile_file}")
+
+
+def apply_opcodes(a, b, opcodes):
+    out = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        out.extend(a[i1:i2] if tag == 'equal' else b[j1:j2])
+    return out
+
+
+def run_benchmark(count, workers=None, min_support=3, min_share=0.01):
+    import synthetic_data
+    pairs = synthetic_data.synthetic_edit_pairs(count)
+    with bench_utils.Stopwatch() as sw:
+        interned = [intern_tokens(tokenize(p['original_body'])[1], tokenize(p['edited_body'])[1]) for p in pairs]
+    tokenize_rate = count / sw.seconds
+    print(f"[BENCH] tokenize+intern whole bodies: {tokenize_rate:,.0f} pairs/sec")
+
+    sample = interned[:min(count, 5000)]
+    with bench_utils.Stopwatch() as sw:
+        for a, b in sample:
+            difflib.SequenceMatcher(None, a, b, autojunk=False).get_opcodes()
+    difflib_rate = len(sample) / sw.seconds
+    print(f"[BENCH] difflib.SequenceMatcher (whole body): {difflib_rate:,.0f} pairs/sec")
+
+    with bench_utils.Stopwatch() as sw:
+        opcodes = [myers_opcodes(a, b) for a, b in interned]
+    rate = count / sw.seconds
+    print(f"[BENCH] myers_opcodes (whole body): {rate:,.0f} pairs/sec ({rate / difflib_rate:.1f}x difflib)")
+    broken = sum(1 for (a, b), ops in zip(interned, opcodes) if apply_opcodes(a, b, ops) != b)
+    print(f"[CHECK] opcodes reproduce the edited text for {count - broken:,}/{count:,} pairs")
+
+    with bench_utils.Stopwatch() as sw:
+        for p in pairs:
+            vocab = {}
+            diff_pair(_Side(p['original_body'], vocab), _Side(p['edited_body'], vocab))
+    rate = count / sw.seconds
+    print(f"[BENCH] diff_pair incl. tokenizing (sentences, then words): {rate:,.0f} pairs/sec "
+          f"(whole-body tokenize + difflib: {1 / (1 / tokenize_rate + 1 / difflib_rate):,.0f})")
+
+    with bench_utils.Stopwatch() as sw:
+        results = mine_pairs(pairs, workers=1)
+    print(f"[BENCH] mine_pair end to end (1 process): {count / sw.seconds:,.0f} pairs/sec")
+    workers = workers or multiprocessing.cpu_count()
+    pool_mismatch = 0
+    if workers > 1:
+        # The pool only kicks in from chunksize * 2 pairs; use a small chunk so it always runs here
+        with bench_utils.Stopwatch() as sw:
+            pooled = mine_pairs(pairs, workers, chunksize=max(1, min(64, count // (workers * 2))))
+        print(f"[BENCH] mine_pairs end to end (pool of {workers}): {count / sw.seconds:,.0f} pairs/sec")
+        pool_mismatch = sum(1 for a, b in zip(results, pooled) if a != b) + abs(len(results) - len(pooled))
+        print(f"[CHECK] pool results match the single process for {count - pool_mismatch:,}/{count:,} pairs")
+
+    patterns, fragments = cluster(results)
+    threshold = support_threshold(count, min_support, min_share)
+    print_clusters(patterns, threshold, limit=10)
+    with open(VOICE_PROFILE_FILE, 'r', encoding='utf-8') as f:
+        existing = json.load(f).get('avoid_phrases', [])
+    for phrase in avoid_additions(fragments, existing, threshold):
+        print(f"[AVOID] would add: {phrase}")
+    injected = sum(len(p['injected']) for p in pairs)
+    print(f"[INFO] {injected:,} scripted edits injected across {count:,} pairs")
+    if broken or pool_mismatch:
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mine Mike's draft edits into template_edits patterns")
+    parser.add_argument('--full', action='store_true', help='Re-mine every edited instance')
+    parser.add_argument('--dry-run', action='store_true', help='Report patterns without writing')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--min-support', type=int, default=3, help='Instances needed for a recurring pattern')
+    parser.add_argument('--min-share', type=float, default=0.01,
+                        help='...and at least this share of the mined instances (0.01 = 1%%)')
+    parser.add_argument('--profile-file', default=VOICE_PROFILE_FILE)
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Benchmark on N synthetic edit pairs')
+    parser.add_argument('--snapshot', metavar='DIR', help='Analyze a snapshot_export.py Parquet snapshot instead of the DB')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        run_benchmark(args.benchmark, args.workers, args.min_support, args.min_share)
+        return
+    if args.snapshot:
+        run_snapshot_analysis(args.snapshot, full=args.full, workers=args.workers, min_support=args.min_support,
+                              min_share=args.min_share, profile_file=args.profile_file)
+        return
+    run_mining(full=args.full, dry_run=args.dry_run, workers=args.workers,
+               min_support=args.min_support, min_share=args.min_share, profile_file=args.profile_file)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Batch Enrichment Service
+Purpose: Enrich a batch of clinics concurrently (Perplexity context + Google profile lookup)
+instead of one webhook execution per clinic in 02-enrichment-sub-workflow.
+
+- asyncio worker pool, one token bucket per provider (requests/sec + burst)
+- results cached by (clinic name, city, state) with a TTL, persisted to .cache/
+- write-back to clinics_pending_review in batches (one UPDATE ... FROM VALUES per batch)
+- per-clinic latency p50/p95 at the end of each run
+
+Usage:
+  python enrichment_service.py --ids-file selected_ids.txt --workers 16
+  python enrichment_service.py --stub --synthetic 300          # fully local, no DB/API
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import threading
+from datetime import datetime
+
+import bench_utils
+import http_utils
+from client_utils import TokenBucket, TTLCache
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_CACHE_FILE = os.path.join('.cache', 'enrichment_cache.json')
+DEFAULT_TTL_HOURS = 24 * 7
+
+# Same keywords the "Extract Enrichment Findings (Text Only)" node looks for
+TELECOM_KEYWORDS = ['RCDD', 'CCNA', 'PMP', 'CISSP', 'telecom', 'network']
+
+
+def addressee(clinic):
+    """Same routing as the "Determine Contact Type" node, on the current (v4) clinic columns"""
+    name = clinic.get('contact_name') or ' '.join(
+        p for p in (clinic.get('mail_contact_first_name'), clinic.get('mail_contact_last_name')) if p)
+    if clinic.get('mail_contact_is_consultant') or clinic.get('contact_is_consultant'):
+        company = clinic.get('mail_contact_org_name') or ''
+    else:
+        company = clinic.get('clinic_name') or ''
+    return name, company
+
+
+class EnrichmentProvider:
+    """Base provider: subclasses implement fetch() (blocking) and return a dict"""
+
+    name = 'provider'
+
+    def __init__(self, rate_per_sec, burst=None):
+        self.bucket = TokenBucket(rate_per_sec, burst)
+
+    async def lookup(self, clinic):
+        await self.bucket.acquire()
+        return await asyncio.to_thread(self.fetch, clinic)
+
+    def fetch(self, clinic):
+        raise NotImplementedError
+
+
+class PerplexityProvider(EnrichmentProvider):
+    """Recent-news context (same prompt as the outreach workflow's Perplexity node)"""
+
+    name = 'perplexity'
+    URL = 'https://api.perplexity.ai/chat/completions'
+
+    def __init__(self, api_key, rate_per_sec=2, burst=None):
+        super().__init__(rate_per_sec, burst)
+        self.api_key = api_key
+
+    def fetch(self, clinic):
+        name, _ = addressee(clinic)
+        prompt = (f"Find recent (last 6 months) information about {clinic.get('clinic_name')} in "
+                  f"{clinic.get('city')}, {clinic.get('state')}. Also find information about "
+                  f"{name} and their role. Focus on: recent expansions, awards, "
+                  f"leadership changes, community involvement, healthcare initiatives. Return 2-3 specific, "
+                  f"relevant facts for a personalized outreach email. Be concise.")
+        resp = http_utils.request('POST', self.URL, headers={'Authorization': f'Bearer {self.api_key}'},
+                                  json_body={
+                                      'model': 'llama-3.1-sonar-small-128k-online',
+                                      'messages': [{'role': 'user', 'content': prompt}],
+                                      'temperature': 0.3,
+                                      'max_tokens': 200,
+                                  })
+        if not resp.ok:
+            raise RuntimeError(f'perplexity HTTP {resp.status}')
+        return {'enrichment_context': resp.json()['choices'][0]['message']['content']}
+
+
+class GoogleSearchProvider(EnrichmentProvider):
+    """Professional profile lookup (same query as "Google Search - Find Professional Profile")"""
+
+    name = 'google'
+    URL = 'https://www.googleapis.com/customsearch/v1'
+
+    def __init__(self, api_key, cse_id, rate_per_sec=5, burst=None):
+        super().__init__(rate_per_sec, burst)
+        self.api_key = api_key
+        self.cse_id = cse_id
+
+    def fetch(self, clinic):
+        from urllib.parse import urlencode
+        name, company = addressee(clinic)
+        query = urlencode({'key': self.api_key, 'cx': self.cse_id, 'q': f"{name} {company} LinkedIn", 'num': 3})
+        resp = http_utils.request('GET', f"{self.URL}?{query}")
+        if not resp.ok:
+            raise RuntimeError(f'google HTTP {resp.status}')
+        return extract_findings(resp.json())
+
+
+class StubProvider(EnrichmentProvider):
+    """Local stand-in with configurable latency, used for tests and benchmarks"""
+
+    def __init__(self, name, latency_ms=200, jitter_ms=100, rate_per_sec=50, burst=None,
+                 failure_rate=0.0, seed=0):
+        super().__init__(rate_per_sec, burst)
+        self.name = name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def lookup(self, clinic):
+        await self.bucket.acquire()
+        self.calls += 1
+        await asyncio.sleep((self.latency_ms + self.rng.uniform(0, self.jitter_ms)) / 1000)
+        if self.rng.random() < self.failure_rate:
+            raise RuntimeError(f'{self.name} stub failure')
+        if self.name == 'google':
+            name, _ = addressee(clinic)
+            return extract_findings({'items': [{'snippet': f"{name} - 12 years telecom network"}]})
+        return {'enrichment_context': f"{clinic.get('clinic_name')} recently expanded services in {clinic.get('city')}."}
+
+
+def extract_findings(search_result):
+    """Port of the "Extract Enrichment Findings (Text Only)" node"""
+    import re
+    findings = {}
+    snippet = ''
+    items = (search_result or {}).get('items') or []
+    if items:
+        snippet = items[0].get('snippet') or ''
+        if 'years' in snippet:
+            match = re.search(r'(\d+)\s*years', snippet)
+            if match:
+                findings['years_experience'] = int(match.group(1))
+        lowered = snippet.lower()
+        if any(k.lower() in lowered for k in TELECOM_KEYWORDS):
+            findings['has_telecom_background'] = True
+    findings['enrichment_finding'] = snippet or 'Healthcare telecom professional'
+    return findings
+
+
+class EnrichmentService:
+    """Fan clinic lookups out over a worker pool and write results back in batches"""
+
+    def __init__(self, providers, cache=None, workers=8, batch_size=50, writer=None):
+        self.providers = providers
+        self.cache = cache or TTLCache()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.writer = writer
+        self.latencies_ms = []
+        self.errors = []
+        self.written = 0
+
+    async def enrich_one(self, clinic):
+        cached = self.cache.get(clinic)
+        if cached is not None:
+            return cached
+        lookups = await asyncio.gather(*(p.lookup(clinic) for p in self.providers), return_exceptions=True)
+        result = {}
+        for provider, value in zip(self.providers, lookups):
+            if isinstance(value, Exception):
+                raise RuntimeError(f'{provider.name}: {value}')
+            result.update(value)
+        self.cache.put(clinic, result)
+        return result
+
+    async def _worker(self, queue, pending):
+        while True:
+            clinic = await queue.get()
+            if clinic is None:
+                queue.task_done()
+                return
+            start = time.perf_counter()
+            try:
+                result = await self.enrich_one(clinic)
+                pending.append({'id': clinic['id'], **result})
+            except Exception as e:
+                self.errors.append({'id': clinic.get('id'), 'error': str(e)})
+            # Latency covers the lookups only; batch writes are not charged to one clinic
+            self.latencies_ms.append((time.perf_counter() - start) * 1000)
+            try:
+                if len(pending) >= self.batch_size:
+                    await self._flush(pending)
+            finally:
+                queue.task_done()
+
+    async def _flush(self, pending):
+        """Write the pending batch; on a writer error every clinic in it is recorded as failed"""
+        batch = pending[:]
+        del pending[:]
+        if batch and self.writer is not None:
+            try:
+                await asyncio.to_thread(self.writer, batch)
+            except Exception as e:
+                # Results stay in the cache, so a re-run writes them without new lookups
+                self.errors.extend({'id': r['id'], 'error': f'write failed: {e}'} for r in batch)
+                return
+        self.written += len(batch)
+
+    async def run(self, clinics):
+        queue = asyncio.Queue()
+        pending = []
+        for clinic in clinics:
+            queue.put_nowait(clinic)
+        for _ in range(self.workers):
+            queue.put_nowait(None)
+        try:
+            await asyncio.gather(*(self._worker(queue, pending) for _ in range(self.workers)))
+            await self._flush(pending)
+        finally:
+            self.cache.save()
+
+
+def make_db_writer(conn):
+    """Batch writer for the enrichment_data / enriched_at columns (add_enrichment_fields migration)"""
+    import db_utils
+    lock = threading.Lock()
+
+    def write(batch):
+        now = datetime.now().isoformat()
+        rows = [{
+            'id': r['id'],
+            'enrichment_data': json.dumps({k: v for k, v in r.items() if k != 'id'}),
+            'enriched_at': now,
+        } for r in batch]
+        # Flushes run in worker threads but share one connection (and its transaction)
+        with lock:
+            db_utils.bulk_update(conn, db_utils.CLINICS_TABLE, rows, ['enrichment_data', 'enriched_at'],
+                                 casts={'id': 'uuid', 'enrichment_data': 'jsonb', 'enriched_at': 'timestamptz'})
+    return write
+
+
+def load_clinics(conn, clinic_ids):
+    import db_utils
+    return db_utils.fetch_all(
+        conn,
+        f"SELECT id::text AS id, clinic_name, city, state, contact_name, contact_email, "
+        f"mail_contact_first_name, mail_contact_last_name, mail_contact_org_name, "
+        f"mail_contact_is_consultant, contact_is_consultant "
+        f"FROM {db_utils.CLINICS_TABLE} WHERE id = ANY(%s::uuid[])",
+        (list(clinic_ids),)
+    )
+
+
+def synthetic_clinics(count, seed=27):
+    rng = random.Random(seed)
+    states = ['TN', 'KY', 'AZ', 'MT', 'AK', 'TX']
+    return [{
+        'id': f'stub-{i}',
+        'clinic_name': f"Rural Health Clinic {rng.randint(1, count // 2 or 1)}",
+        'city': f"Town {rng.randint(1, 50)}",
+        'state': rng.choice(states),
+        'mail_contact_first_name': 'Contact',
+        'mail_contact_last_name': str(i),
+        'mail_contact_org_name': 'Rural Telecom Consulting',
+        'mail_contact_is_consultant': rng.random() < 0.3,
+    } for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent clinic enrichment')
+    parser.add_argument('--clinic-ids', nargs='*', default=[])
+    parser.add_argument('--ids-file', help='File with one clinic id per line')
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--batch-size', type=int, default=50, help='Rows per DB write-back')
+    parser.add_argument('--cache-file', default=DEFAULT_CACHE_FILE)
+    parser.add_argument('--ttl-hours', type=float, default=DEFAULT_TTL_HOURS)
+    parser.add_argument('--perplexity-rps', type=float, default=2)
+    parser.add_argument('--google-rps', type=float, default=5)
+    parser.add_argument('--stub', action='store_true', help='Use local stub providers')
+    parser.add_argument('--synthetic', type=int, default=0, help='Enrich N synthetic clinics (no DB)')
+    parser.add_argument('--dry-run', action='store_true', help='Skip the DB write-back')
+    args = parser.parse_args()
+
+    if args.stub:
+        providers = [StubProvider('perplexity', rate_per_sec=args.perplexity_rps * 10, seed=1),
+                     StubProvider('google', latency_ms=120, rate_per_sec=args.google_rps * 10, seed=2)]
+    else:
+        providers = [
+            PerplexityProvider(os.getenv('PERPLEXITY_API_KEY'), rate_per_sec=args.perplexity_rps),
+            GoogleSearchProvider(os.getenv('GOOGLE_API_KEY'), os.getenv('GOOGLE_CSE_ID'),
+                                 rate_per_sec=args.google_rps),
+        ]
+
+    conn = None
+    if args.synthetic:
+        clinics = synthetic_clinics(args.synthetic)
+    else:
+        import db_utils
+        ids = list(args.clinic_ids)
+        if args.ids_file:
+            with open(args.ids_file, 'r', encoding='utf-8') as f:
+                ids.extend(line.strip() for line in f if line.strip())
+        if not ids:
+            print("[ERROR] No clinic ids given (--clinic-ids / --ids-file / --synthetic)")
+            sys.exit(1)
+        conn = db_utils.get_connection()
+        clinics = load_clinics(conn, ids)
+
+    writer = make_db_writer(conn) if conn is not None and not args.dry_run else None
+    cache = TTLCache(args.cache_file, ttl_seconds=args.ttl_hours * 3600)
+    service = EnrichmentService(providers, cache, workers=args.workers,
+                                batch_size=args.batch_size, writer=writer)
+
+    print(f"[ENRICHING] {len(clinics)} clinics with {args.workers} workers")
+    with bench_utils.Stopwatch() as sw:
+        asyncio.run(service.run(clinics))
+    if conn is not None:
+        conn.close()
+
+    print(f"[SUCCESS] {service.written} enriched, {len(service.errors)} failed in {sw.seconds:.1f}s "
+          f"({len(clinics) / sw.seconds if sw.seconds else 0:.1f} clinics/sec)")
+    print(f"[CACHE] {cache.hits} hits, {cache.misses} misses")
+    bench_utils.print_latency_summary('per-clinic latency', service.latencies_ms)
+    for error in service.errors[:10]:
+        print(f"[ERROR] {error['id']}: {error['error']}")
+
+
+if __name__ == '__main__':
+    main()
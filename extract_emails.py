@@ -1,6 +1,9 @@
 import os
 import json
 import sys
+import argparse
+
+import tracing
 
 # Fix Windows console encoding
 if sys.platform == 'win32':
@@ -53,26 +56,41 @@ def extract_email_proper(msg_path):
         return {'file': os.path.basename(msg_path), 'error': str(e)}
 
 def main():
-    email_dir = r"C:\ClaudeAgents\projects\usac-rhc-automation\email examples"
-    output_file = r"C:\ClaudeAgents\projects\usac-rhc-automation\extracted_emails.json"
+    parser = argparse.ArgumentParser(description='Extract .msg emails to JSON')
+    parser.add_argument('--email-dir', default=r"C:\ClaudeAgents\projects\usac-rhc-automation\email examples")
+    parser.add_argument('--output', default=r"C:\ClaudeAgents\projects\usac-rhc-automation\extracted_emails.json")
+    tracing.add_profile_argument(parser)
+    args = parser.parse_args()
+    tracing.configure('extract_emails', profile=args.profile)
+
+    email_dir = args.email_dir
+    output_file = args.output
 
     emails = []
 
-    for filename in os.listdir(email_dir):
-        if filename.endswith('.msg'):
-            msg_path = os.path.join(email_dir, filename)
-            print(f"Processing: {filename}")
+    with tracing.span('parse_messages', profile=True,
+                      parser='extract_msg' if HAS_EXTRACT_MSG else 'simple') as s:
+        for filename in os.listdir(email_dir):
+            if filename.endswith('.msg'):
+                msg_path = os.path.join(email_dir, filename)
+                print(f"Processing: {filename}")
 
-            if HAS_EXTRACT_MSG:
-                email_data = extract_email_proper(msg_path)
-            else:
-                email_data = extract_email_simple(msg_path)
+                if HAS_EXTRACT_MSG:
+                    email_data = extract_email_proper(msg_path)
+                else:
+                    email_data = extract_email_simple(msg_path)
 
-            emails.append(email_data)
+                emails.append(email_data)
+                s.items += 1
+                s.count('bytes_in', os.path.getsize(msg_path))
+                if 'error' in email_data:
+                    s.count('errors')
 
     # Save to JSON
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(emails, f, indent=2, ensure_ascii=False)
+    with tracing.span('write_json', items=len(emails)) as s:
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(emails, f, indent=2, ensure_ascii=False)
+        s.count('bytes_out', os.path.getsize(output_file))
 
     print(f"\nExtracted {len(emails)} emails to: {output_file}")
 
@@ -8,24 +8,92 @@ Purpose: Generate weekly A/B/C email templates using Claude API and Mike's voice
 import os
 import sys
 import json
+import time
+import random
+import asyncio
+import argparse
+from types import SimpleNamespace
 from datetime import datetime, timedelta
-import anthropic
-from dotenv import load_dotenv
+
+import tracing
+import voice_conformance
+
+try:
+    import anthropic
+    HAS_ANTHROPIC = True
+except ImportError:
+    HAS_ANTHROPIC = False
 
 # Fix Windows encoding issues
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
 # Load environment variables
-load_dotenv('../dashboard/.env.local')
+try:
+    from dotenv import load_dotenv
+    load_dotenv('../dashboard/.env.local')
+except ImportError:
+    pass
 
 # Configuration
 ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
-if not ANTHROPIC_API_KEY:
-    print("[ERROR] ANTHROPIC_API_KEY not found in environment")
-    exit(1)
-
-client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+MODEL = "claude-sonnet-4-20250514"
+VARIANT_KEYS = ('template_a', 'template_b', 'template_c')
+
+_client = None
+_async_client = None
+
+
+def _require_anthropic():
+    if not HAS_ANTHROPIC:
+        print("[ERROR] anthropic not installed. Run: pip install anthropic")
+        exit(1)
+
+
+def get_client():
+    """Anthropic client, created on first API call so the module can be imported without a key"""
+    global _client
+    if _client is None:
+        _require_anthropic()
+        if not ANTHROPIC_API_KEY:
+            print("[ERROR] ANTHROPIC_API_KEY not found in environment")
+            exit(1)
+        _client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+    return _client
+
+
+def get_async_client():
+    """Async client for concurrent candidate requests (best-of-N mode)"""
+    global _async_client
+    if _async_client is None:
+        _require_anthropic()
+        if not ANTHROPIC_API_KEY:
+            print("[ERROR] ANTHROPIC_API_KEY not found in environment")
+            exit(1)
+        _async_client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
+    return _async_client
+
+
+class StubClient:
+    """Local stand-in for anthropic.Anthropic that answers with canned template sets, used for benchmarks"""
+
+    def __init__(self, template_sets, latency_ms=0, jitter_ms=0, seed=0):
+        self.template_sets = template_sets
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.messages = self
+
+    def create(self, model, messages, **kwargs):
+        templates = self.template_sets[self.calls % len(self.template_sets)]
+        self.calls += 1
+        if self.latency_ms or self.jitter_ms:
+            time.sleep((self.latency_ms + self.rng.uniform(0, self.jitter_ms)) / 1000)
+        text = '```json\n' + json.dumps(templates, indent=2) + '\n```'
+        prompt = ''.join(m['content'] for m in messages)
+        usage = SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4)
+        return SimpleNamespace(content=[SimpleNamespace(text=text)], usage=usage, model=f'{model}-stub')
 
 # Load Mike's voice profile
 with open('mike_voice_profile.json', 'r') as f:
@@ -37,14 +105,10 @@ week_number = today.isocalendar()[1]
 year = today.year
 week_version = f"week-{week_number}-{year}"
 
-def generate_templates(contact_type='direct'):
-    """Generate 3 email templates (A/B/C) for the current week"""
-
-    print(f"[GENERATING] Templates for {week_version} ({contact_type})")
-    print("=" * 60)
+def build_prompt(contact_type='direct'):
+    """Generation prompt for one A/B/C template set"""
 
-    # Build generation prompt
-    prompt = f"""Generate 3 email templates for Mike Hyam, who does USAC RHC (Rural Health Care) telecom consulting.
+    return f"""Generate 3 email templates for Mike Hyam, who does USAC RHC (Rural Health Care) telecom consulting.
 
 CONTEXT:
 - Mike reaches out to healthcare clinics that have filed USAC Form 465
@@ -134,34 +198,56 @@ Return ONLY valid JSON in this exact format:
 
 Make it authentic. Make it sound like Mike. NO AI jargon."""
 
+
+def parse_templates(content):
+    """Template dict from a response text, tolerating a markdown code fence"""
+
+    # Try to extract JSON if wrapped in markdown
+    if '```json' in content:
+        content = content.split('```json')[1].split('```')[0].strip()
+    elif '```' in content:
+        content = content.split('```')[1].split('```')[0].strip()
+
+    return json.loads(content)
+
+
+def usage_cost(usage):
+    return (usage.input_tokens / 1_000_000 * 3.00) + (usage.output_tokens / 1_000_000 * 15.00)
+
+
+@tracing.traced(profile=True)
+def generate_templates(contact_type='direct', client=None):
+    """Generate 3 email templates (A/B/C) for the current week; client defaults to get_client()"""
+
+    print(f"[GENERATING] Templates for {week_version} ({contact_type})")
+    print("=" * 60)
+
+    prompt = build_prompt(contact_type)
+
     print("[API] Calling Claude API...")
 
     try:
-        response = client.messages.create(
-            model="claude-sonnet-4-20250514",
-            max_tokens=2000,
-            temperature=0.7,
-            messages=[{
-                "role": "user",
-                "content": prompt
-            }]
-        )
-
-        # Extract JSON from response
-        content = response.content[0].text
-
-        # Try to extract JSON if wrapped in markdown
-        if '```json' in content:
-            content = content.split('```json')[1].split('```')[0].strip()
-        elif '```' in content:
-            content = content.split('```')[1].split('```')[0].strip()
-
-        templates = json.loads(content)
+        with tracing.span('api_call', model=MODEL):
+            response = (client or get_client()).messages.create(
+                model=MODEL,
+                max_tokens=2000,
+                temperature=0.7,
+                messages=[{
+                    "role": "user",
+                    "content": prompt
+                }]
+            )
+
+        templates = parse_templates(response.content[0].text)
 
         # Calculate cost
         input_tokens = response.usage.input_tokens
         output_tokens = response.usage.output_tokens
-        cost = (input_tokens / 1_000_000 * 3.00) + (output_tokens / 1_000_000 * 15.00)
+        cost = usage_cost(response.usage)
+        tracing.add_items(len(templates))
+        tracing.count('input_tokens', input_tokens)
+        tracing.count('output_tokens', output_tokens)
+        tracing.count('cost_usd', round(cost, 6))
 
         print(f"[SUCCESS] Templates generated!")
         print(f"[STATS] Tokens: {input_tokens} input, {output_tokens} output")
@@ -183,8 +269,110 @@ Make it authentic. Make it sound like Mike. NO AI jargon."""
 
     except Exception as e:
         print(f"[ERROR] Error generating templates: {e}")
+        tracing.count('errors')
+        return None
+
+async def request_candidate(prompt):
+    """One sampled response from the async client"""
+    return await get_async_client().messages.create(
+        model=MODEL,
+        max_tokens=2000,
+        temperature=0.7,
+        messages=[{"role": "user", "content": prompt}]
+    )
+
+
+async def best_of_n(prompt, scorer, candidates, threshold, sample=request_candidate):
+    """Request `candidates` samples at once and keep the best-scoring template per variant
+
+    Responses are scored as they arrive; as soon as every variant has a template at or above
+    `threshold`, the requests still in flight are cancelled.
+    """
+    tasks = [asyncio.create_task(sample(prompt)) for _ in range(candidates)]
+    index = {task: i for i, task in enumerate(tasks)}
+    best = {}
+    stats = {'requested': candidates, 'completed': 0, 'failed': 0, 'cancelled': 0,
+             'input_tokens': 0, 'output_tokens': 0, 'cost': 0.0, 'model': MODEL}
+    pending = set(tasks)
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                try:
+                    response = task.result()
+                    stats['input_tokens'] += response.usage.input_tokens
+                    stats['output_tokens'] += response.usage.output_tokens
+                    stats['cost'] += usage_cost(response.usage)
+                    stats['model'] = response.model
+                    templates = parse_templates(response.content[0].text)
+                except Exception as e:
+                    print(f"[WARNING] Candidate {index[task] + 1} failed: {e}")
+                    stats['failed'] += 1
+                    continue
+                stats['completed'] += 1
+                for key, (score, issues) in scorer.score_set(templates).items():
+                    if key in VARIANT_KEYS and (key not in best or score > best[key]['score']):
+                        best[key] = {'score': score, 'issues': issues, 'candidate': index[task] + 1,
+                                     'template': templates[key]}
+            if all(key in best and best[key]['score'] >= threshold for key in VARIANT_KEYS):
+                break
+    finally:
+        stats['cancelled'] = len(pending)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return best, stats
+
+
+@tracing.traced(profile=True)
+def generate_best_of_n(contact_type='direct', candidates=4, threshold=voice_conformance.DEFAULT_THRESHOLD):
+    """Best-of-N variant of generate_templates(): same result shape, plus per-variant scores"""
+
+    print(f"[GENERATING] Templates for {week_version} ({contact_type}), best of {candidates}")
+    print("=" * 60)
+
+    scorer = voice_conformance.ConformanceScorer(voice_profile)
+    print(f"[API] Requesting {candidates} candidates concurrently (threshold {threshold:.2f})...")
+    with tracing.span('api_calls', model=MODEL, candidates=candidates) as s:
+        best, stats = asyncio.run(best_of_n(build_prompt(contact_type), scorer, candidates, threshold))
+        s.items = stats['completed']
+        s.count('cancelled', stats['cancelled'])
+    tracing.add_items(len(best))
+    tracing.count('input_tokens', stats['input_tokens'])
+    tracing.count('output_tokens', stats['output_tokens'])
+    tracing.count('cost_usd', round(stats['cost'], 6))
+    tracing.count('errors', stats['failed'])
+
+    print(f"[CANDIDATES] {stats['completed']} scored, {stats['failed']} failed, {stats['cancelled']} cancelled")
+    print(f"[STATS] Tokens: {stats['input_tokens']} input, {stats['output_tokens']} output")
+    print(f"[COST] ${stats['cost']:.4f}")
+    missing = [key for key in VARIANT_KEYS if key not in best]
+    if missing:
+        print(f"[ERROR] No usable candidate for {', '.join(missing)}")
         return None
+    for key in VARIANT_KEYS:
+        pick = best[key]
+        print(f"[PICKED] {key}: candidate {pick['candidate']}, score {pick['score']:.2f}"
+              f"{' (' + '; '.join(pick['issues']) + ')' if pick['issues'] else ''}")
+    print()
+
+    return {
+        'templates': {key: best[key]['template'] for key in VARIANT_KEYS},
+        'metadata': {
+            'version': week_version,
+            'contact_type': contact_type,
+            'generated_at': datetime.now().isoformat(),
+            'generated_by': stats['model'],
+            'generation_cost': stats['cost'],
+            'input_tokens': stats['input_tokens'],
+            'output_tokens': stats['output_tokens'],
+            'candidates': {k: stats[k] for k in ('requested', 'completed', 'failed', 'cancelled')},
+            'conformance': {key: {'score': best[key]['score'], 'issues': best[key]['issues'],
+                                  'candidate': best[key]['candidate']} for key in VARIANT_KEYS},
+        }
+    }
 
+@tracing.traced()
 def save_templates(result, contact_type='direct'):
     """Save generated templates to JSON file"""
 
@@ -225,11 +413,8 @@ def display_templates(result):
 
     print("=" * 60)
 
-def create_sql_insert(result, contact_type='direct'):
-    """Create SQL INSERT statements for Supabase"""
-
-    if not result:
-        return
+def build_sql_insert(result, contact_type='direct'):
+    """SQL INSERT statements for one generation result, as a string"""
 
     templates = result['templates']
     metadata = result['metadata']
@@ -283,7 +468,17 @@ INSERT INTO email_templates (
 """
         sql_statements.append(sql)
 
-    sql_content = '\n'.join(sql_statements)
+    return '\n'.join(sql_statements)
+
+@tracing.traced()
+def create_sql_insert(result, contact_type='direct'):
+    """Create SQL INSERT statements for Supabase"""
+
+    if not result:
+        return
+
+    sql_content = build_sql_insert(result, contact_type)
+    metadata = result['metadata']
 
     filename = f"insert_templates_{metadata['version']}_{contact_type}.sql"
     with open(filename, 'w') as f:
@@ -293,12 +488,24 @@ INSERT INTO email_templates (
     print()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate weekly A/B/C email templates')
+    parser.add_argument('--candidates', type=int, default=1,
+                        help='Request N candidates concurrently and keep the best-scoring template per variant')
+    parser.add_argument('--threshold', type=float, default=voice_conformance.DEFAULT_THRESHOLD,
+                        help='Conformance score that ends the search early (with --candidates > 1)')
+    tracing.add_profile_argument(parser)
+    args = parser.parse_args()
+    tracing.configure('generate_templates', profile=args.profile)
+
     print("Phase 4: Template Generator")
     print("=" * 60)
     print()
 
     # Generate templates for direct contact
-    result = generate_templates(contact_type='direct')
+    if args.candidates > 1:
+        result = generate_best_of_n(contact_type='direct', candidates=args.candidates, threshold=args.threshold)
+    else:
+        result = generate_templates(contact_type='direct')
 
     if result:
         display_templates(result)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Minimal JSON-over-HTTP helper for the Python tooling (stdlib only)
+Purpose: One request function that returns status/headers/body instead of raising on 4xx/5xx
+"""
+
+import json
+import urllib.error
+import urllib.request
+
+DEFAULT_TIMEOUT = 30
+
+
+class HttpResponse:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body) if self.body else None
+
+    @property
+    def ok(self):
+        return 200 <= self.status < 300
+
+
+def request(method, url, headers=None, json_body=None, timeout=DEFAULT_TIMEOUT):
+    """Blocking HTTP request; HTTP error statuses are returned, network errors raise"""
+    data = None
+    headers = dict(headers or {})
+    if json_body is not None:
+        data = json.dumps(json_body).encode('utf-8')
+        headers.setdefault('Content-Type', 'application/json')
+    req = urllib.request.Request(url, data=data, headers=headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return HttpResponse(resp.status, dict(resp.headers.items()), resp.read())
+    except urllib.error.HTTPError as e:
+        return HttpResponse(e.code, dict(e.headers.items()) if e.headers else {}, e.read())
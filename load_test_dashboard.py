@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dashboard Load Test
+Purpose: Many concurrent dashboard users replaying the test_dashboard.py scenario
+
+Each worker process launches one headless Chromium and runs its users as
+concurrent browser contexts on it (Playwright async API), so N users cost N
+contexts rather than N browser processes. Each user replays the view / status
+filter / search / notes scenario of test_dashboard.py with randomized inputs.
+Users can be spread across worker processes with --workers.
+
+Reports throughput and p50/p95/p99 per action. With database access it also
+diffs server-side counters for clinics_pending_review (pg_stat_user_tables,
+plus pg_stat_statements when the extension is installed).
+
+Usage:
+  python load_test_dashboard.py --users 10 --iterations 5
+  python load_test_dashboard.py --users 40 --workers 4 --seed-clinics 50000 --db-stats
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import multiprocessing
+from datetime import datetime
+
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+import bench_utils
+import synthetic_data
+from test_dashboard import DEFAULT_URL, PERF_OBSERVER_SCRIPT, is_clinics_query, summarize_steps
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Search terms that hit the synthetic dataset (names, cities and states)
+SEARCH_TERMS = tuple(p.lower() for p in synthetic_data.NAME_PREFIXES) + \
+    ('clinic', 'hospital', 'medical') + tuple(synthetic_data.STATES)
+
+
+async def wait_for_paint(page):
+    await page.evaluate("() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))")
+
+
+class AsyncStepRecorder:
+    """test_dashboard.StepRecorder on the async API (same step fields)"""
+
+    def __init__(self, page, cdp):
+        self.page = page
+        self.cdp = cdp
+        self.steps = []
+        self.queries = 0
+        page.on('request', self._on_request)
+
+    @classmethod
+    async def attach(cls, page):
+        cdp = await page.context.new_cdp_session(page)
+        await cdp.send('Performance.enable')
+        return cls(page, cdp)
+
+    def _on_request(self, request):
+        if '/rest/v1/' in request.url:
+            self.queries += 1
+
+    async def metrics(self):
+        values = {m['name']: m['value'] for m in (await self.cdp.send('Performance.getMetrics'))['metrics']}
+        return {'js_heap_used_bytes': int(values.get('JSHeapUsedSize', 0)),
+                'dom_nodes': int(values.get('Nodes', 0))}
+
+    async def timed(self, name, action, expect_query=False, timeout=30000):
+        queries_before = self.queries
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            if expect_query:
+                async with self.page.expect_response(is_clinics_query, timeout=timeout):
+                    await action()
+            else:
+                await action()
+        except PlaywrightTimeoutError:
+            timed_out = True
+        await wait_for_paint(self.page)
+        step = {
+            'step': name,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            'queries': self.queries - queries_before,
+            'timed_out': timed_out,
+        }
+        step.update(await self.metrics())
+        self.steps.append(step)
+        return step
+
+
+async def run_scenario(page, recorder, url, rng):
+    """test_dashboard.load_dashboard + run_scenario on the async API, randomized by rng"""
+    await recorder.timed('initial_load', lambda: page.goto(url, wait_until='load'), expect_query=True)
+    search_input = page.locator('input[placeholder="Search all fields..."]').first
+    await search_input.wait_for(state='visible')
+    await wait_for_paint(page)
+
+    for mode in ('List', 'Compact', 'Map', 'Grid'):
+        button = page.locator(f'button[title="{mode} View"]').first
+        if await button.is_visible():
+            await recorder.timed(f'view_{mode.lower()}', button.click)
+
+    statuses = ['Pending', 'Done', 'Has Notes']
+    rng.shuffle(statuses)
+    for status in statuses + ['All']:
+        button = page.locator('button', has_text=status).first
+        if await button.is_visible():
+            await recorder.timed(f'filter_{status.lower().replace(" ", "_")}', button.click, expect_query=True)
+
+    if await search_input.is_visible():
+        term = rng.choice(SEARCH_TERMS)
+        await recorder.timed('search', lambda: search_input.fill(term), expect_query=True)
+        await recorder.timed('search_clear', search_input.clear, expect_query=True)
+
+    notes_button = page.locator('button:has-text("View Notes")').first
+    if await notes_button.is_visible():
+        async def open_notes():
+            await notes_button.click()
+            await page.locator('[role="dialog"]').wait_for(state='visible')
+        await recorder.timed('notes_open', open_notes)
+        await recorder.timed('notes_close', lambda: page.keyboard.press('Escape'))
+
+
+async def run_user(browser, user_id, url, iterations, seed, think_ms):
+    """One simulated user: a fresh context on the shared browser per iteration"""
+    rng = random.Random(seed + user_id)
+    runs = []
+    for iteration in range(iterations):
+        context = await browser.new_context(viewport={'width': 1440, 'height': 900})
+        try:
+            await context.add_init_script(PERF_OBSERVER_SCRIPT)
+            page = await context.new_page()
+            recorder = await AsyncStepRecorder.attach(page)
+            try:
+                await run_scenario(page, recorder, url, rng)
+                error = None
+            except Exception as e:
+                error = str(e)
+            runs.append({'user': user_id, 'iteration': iteration + 1, 'steps': recorder.steps, 'error': error})
+        finally:
+            await context.close()
+        if think_ms:
+            await asyncio.sleep(rng.uniform(0, think_ms) / 1000)
+    return runs
+
+
+async def run_users(user_ids, url, iterations, seed, think_ms):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True)
+        try:
+            outcomes = await asyncio.gather(*(run_user(browser, uid, url, iterations, seed, think_ms)
+                                              for uid in user_ids), return_exceptions=True)
+        finally:
+            await browser.close()
+    runs, failures = [], []
+    for uid, outcome in zip(user_ids, outcomes):
+        if isinstance(outcome, BaseException):
+            failures.append({'user': uid, 'error': f"{type(outcome).__name__}: {outcome}"})
+        else:
+            runs.extend(outcome)
+    return runs, failures
+
+
+def run_worker(job):
+    """Run a slice of users as contexts of one browser in this process; returns (runs, user failures)"""
+    user_ids, url, iterations, seed, think_ms = job
+    return asyncio.run(run_users(user_ids, url, iterations, seed, think_ms))
+
+
+def server_stats(conn):
+    """Cumulative server-side counters for the clinics table"""
+    import db_utils
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_stat_clear_snapshot()")
+    conn.commit()
+    rows = db_utils.fetch_all(conn, """
+        SELECT seq_scan, COALESCE(idx_scan, 0) AS idx_scan, seq_tup_read,
+               COALESCE(idx_tup_fetch, 0) AS idx_tup_fetch
+        FROM pg_stat_user_tables WHERE relname = %s
+    """, (db_utils.CLINICS_TABLE,))
+    stats = {k: int(v) for k, v in rows[0].items()} if rows else {}
+    try:
+        rows = db_utils.fetch_all(conn, """
+            SELECT COALESCE(SUM(calls), 0) AS calls, COALESCE(SUM(total_exec_time), 0) AS exec_ms
+            FROM pg_stat_statements WHERE query ILIKE %s
+        """, (f"%{db_utils.CLINICS_TABLE}%",))
+        stats['statements'] = int(rows[0]['calls'])
+        stats['statement_exec_ms'] = round(float(rows[0]['exec_ms']), 1)
+    except Exception:
+        conn.rollback()  # pg_stat_statements not installed
+    return stats
+
+
+def run_load_test(url=DEFAULT_URL, users=10, workers=1, iterations=3, seed=465, think_ms=500,
+                  db_stats=False, seed_clinics=0, report_path=None, allow_remote=False):
+    conn = None
+    if db_stats or seed_clinics:
+        import db_utils
+        conn = db_utils.get_connection()
+    if seed_clinics:
+        synthetic_data.clear_clinics(conn, allow_remote=allow_remote)
+        synthetic_data.seed_clinics(conn, seed_clinics, allow_remote=allow_remote)
+        print(f"🌱 Seeded {seed_clinics:,} synthetic clinics")
+
+    workers = max(1, min(workers, users))
+    jobs = [(list(range(w, users, workers)), url, iterations, seed, think_ms) for w in range(workers)]
+
+    print(f"🚀 {users} users x {iterations} iterations across {workers} worker process(es) -> {url}")
+    stats_before = server_stats(conn) if db_stats else None
+    start = time.perf_counter()
+    if workers == 1:
+        outcomes = [run_worker(jobs[0])]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            outcomes = pool.map(run_worker, jobs)
+    runs = [r for chunk, _ in outcomes for r in chunk]
+    user_failures = sorted((f for _, chunk in outcomes for f in chunk), key=lambda f: f['user'])
+    elapsed = time.perf_counter() - start
+    stats_after = server_stats(conn) if db_stats else None
+    if conn is not None:
+        conn.close()
+
+    actions = sum(len(r['steps']) for r in runs)
+    client_queries = sum(s['queries'] for r in runs for s in r['steps'])
+    errors = [r for r in runs if r['error']]
+    report = {
+        'build': bench_utils.git_build_id(),
+        'url': url,
+        'generated_at': datetime.now().isoformat(),
+        'users': users,
+        'workers': workers,
+        'iterations': iterations,
+        'seeded_clinics': seed_clinics or None,
+        'elapsed_seconds': round(elapsed, 2),
+        'scenarios_completed': len(runs) - len(errors),
+        'users_failed': user_failures,
+        'errors': [{'user': r['user'], 'iteration': r['iteration'], 'error': r['error']} for r in errors],
+        'throughput': {
+            'actions_per_second': round(actions / elapsed, 2) if elapsed else None,
+            'scenarios_per_minute': round(len(runs) / elapsed * 60, 2) if elapsed else None,
+        },
+        'client_rest_requests': client_queries,
+        'server': ({k: stats_after[k] - stats_before.get(k, 0) for k in stats_after}
+                   if db_stats else None),
+        'summary': summarize_steps([r for r in runs if r['steps']]),
+    }
+
+    print("\n" + "=" * 60)
+    for step, stats in report['summary'].items():
+        print(f"   {step:<20} n={stats['count']:<5} p50 {stats['p50_ms']:>8}ms  "
+              f"p95 {stats['p95_ms']:>8}ms  p99 {stats['p99_ms']:>8}ms")
+    print("=" * 60)
+    print(f"⏱️  {elapsed:.1f}s, {report['throughput']['actions_per_second']} actions/s, "
+          f"{report['throughput']['scenarios_per_minute']} scenarios/min, {len(errors)} failed scenarios")
+    print(f"🌐 REST requests seen by clients: {client_queries}")
+    for failure in user_failures:
+        print(f"❌ User {failure['user']} did not finish: {failure['error']}")
+    if report['server']:
+        print("🗄️  Server-side deltas: "
+              + ', '.join(f"{k}={v}" for k, v in report['server'].items()))
+
+    if report_path:
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"📄 Report saved to: {report_path}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent multi-user load test for the dashboard')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--users', type=int, default=10, help='Concurrent simulated users')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes to spread users over')
+    parser.add_argument('--iterations', type=int, default=3, help='Scenario replays per user')
+    parser.add_argument('--seed', type=int, default=465, help='Base seed for randomized inputs')
+    parser.add_argument('--think-ms', type=int, default=500, help='Max random pause between scenarios')
+    parser.add_argument('--db-stats', action='store_true', help='Diff server-side counters (needs DB access)')
+    parser.add_argument('--seed-clinics', type=int, default=0,
+                        help='Replace synthetic clinics with N rows first (local stack only)')
+    parser.add_argument('--allow-remote', action='store_true',
+                        help='Let --seed-clinics write to a database that is not on localhost')
+    parser.add_argument('--report', help='Write the JSON report here')
+    args = parser.parse_args()
+
+    run_load_test(args.url, users=args.users, workers=args.workers, iterations=args.iterations,
+                  seed=args.seed, think_ms=args.think_ms, db_stats=args.db_stats,
+                  seed_clinics=args.seed_clinics, report_path=args.report, allow_remote=args.allow_remote)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,564 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+USAC Rule Monitor
+Purpose: Poll USAC news pages cheaply and raise a system_alerts row only when a new item appears
+(replaces "Scrape USAC News Page" -> "Parse Latest News" -> "Get Last Known Update" -> "Compare"
+in 03-rule-monitor-workflow).
+
+- conditional GET per page (If-None-Match / If-Modified-Since); a 304 ends the poll
+- a hash of the whole body catches servers that ignore the conditional headers
+- the page is cut into item regions (<article> blocks, else <h2> headings), each hashed;
+  only regions whose hash was not on the previous version are parsed
+- Supabase is read and written only when a parsed region holds an item not seen before
+- ETags, hashes and seen items are kept in .cache/rule_monitor_state.json
+
+Usage:
+  python rule_monitor.py                                   # default RHC news page
+  python rule_monitor.py --url https://www.usac.org/rural-health-care/resources/news/ --url ...
+  python rule_monitor.py --interval 300                    # keep polling every 5 minutes
+  python rule_monitor.py --fixture-test                    # local HTTP fixture server, no DB
+"""
+
+import os
+import re
+import sys
+import gzip
+import html
+import json
+import time
+import zlib
+import hashlib
+import argparse
+import threading
+import http.client
+from datetime import datetime, timezone
+from email.utils import formatdate
+from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import bench_utils
+import http_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_URLS = ['https://www.usac.org/rural-health-care/resources/news/']
+DEFAULT_STATE_FILE = os.path.join('.cache', 'rule_monitor_state.json')
+ALERT_TYPE = 'usac_rule_update'
+ALERT_MESSAGE = 'New USAC RHC rule update detected. Please review the latest changes.'
+
+# Truncated reads (IncompleteRead), malformed responses and corrupt gzip bodies, besides socket errors
+FETCH_ERRORS = (OSError, EOFError, zlib.error, http.client.HTTPException)
+
+ARTICLE_RE = re.compile(r'<article\b.*?</article>', re.IGNORECASE | re.DOTALL)
+HEADING_START_RE = re.compile(r'<h2\b', re.IGNORECASE)
+TITLE_RE = re.compile(r'<h[23][^>]*>(.*?)</h[23]>', re.IGNORECASE | re.DOTALL)
+TIME_RE = re.compile(r'<time[^>]*datetime="([^"]+)"', re.IGNORECASE)
+HREF_RE = re.compile(r'<a[^>]*href="([^"]+)"', re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]*>')
+
+
+def digest(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def regions(body):
+    """Item-sized slices of the page: <article> blocks, or heading-to-heading runs as a fallback"""
+    articles = ARTICLE_RE.findall(body)
+    if articles:
+        return articles
+    starts = [m.start() for m in HEADING_START_RE.finditer(body)]
+    return [body[s:e] for s, e in zip(starts, starts[1:] + [len(body)])]
+
+
+def parse_region(region, base_url):
+    """{title, url, published} for one region, or None if it has no heading"""
+    title = TITLE_RE.search(region)
+    if not title:
+        return None
+    text = ' '.join(html.unescape(TAG_RE.sub('', title.group(1))).split())
+    if not text:
+        return None
+    href = HREF_RE.search(region)
+    published = TIME_RE.search(region)
+    return {
+        'title': text,
+        'url': urljoin(base_url, html.unescape(href.group(1))) if href else base_url,
+        'published': published.group(1) if published else None,
+    }
+
+
+def item_key(item):
+    return digest(f"{item['title']}\n{item['url']}".encode('utf-8'))
+
+
+class MonitorState:
+    """Per-URL validators, body hash, region hashes and seen item keys, persisted as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path
+        self.pages = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.pages = json.load(f)
+        self._lock = threading.Lock()
+
+    def get(self, url):
+        with self._lock:
+            return self.pages.get(url)
+
+    def put(self, url, page):
+        with self._lock:
+            self.pages[url] = page
+
+    def snapshot(self):
+        """Copy to roll back to; poll() replaces page dicts instead of mutating them"""
+        with self._lock:
+            return dict(self.pages)
+
+    def restore(self, pages):
+        with self._lock:
+            self.pages = pages
+
+    def save(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.pages, f)
+        os.replace(tmp, self.path)
+
+
+class PollResult:
+    def __init__(self, url):
+        self.url = url
+        self.status = None
+        self.outcome = None         # not_modified | same_body | parsed | error
+        self.bytes = 0
+        self.regions = 0
+        self.parsed = 0
+        self.new_items = []
+        self.error = None
+
+
+def poll(url, state, timeout=http_utils.DEFAULT_TIMEOUT):
+    """One conditional fetch; updates `state` and returns a PollResult with the unseen items"""
+    result = PollResult(url)
+    page = state.get(url)
+    headers = {'Accept-Encoding': 'gzip', 'User-Agent': 'usac-rule-monitor'}
+    if page:
+        if page.get('etag'):
+            headers['If-None-Match'] = page['etag']
+        if page.get('last_modified'):
+            headers['If-Modified-Since'] = page['last_modified']
+
+    try:
+        resp = http_utils.request('GET', url, headers=headers, timeout=timeout)
+    except FETCH_ERRORS as e:
+        result.outcome, result.error = 'error', f"{type(e).__name__}: {e}"
+        return result
+    result.status = resp.status
+    result.bytes = len(resp.body or b'')
+    if resp.status == 304 and page:
+        result.outcome = 'not_modified'
+        return result
+    if not resp.ok:
+        result.outcome, result.error = 'error', f"HTTP {resp.status}"
+        return result
+
+    raw = resp.body
+    if resp.headers.get('Content-Encoding', '').lower() == 'gzip':
+        try:
+            raw = gzip.decompress(raw)
+        except FETCH_ERRORS as e:
+            result.outcome, result.error = 'error', f"bad gzip body: {type(e).__name__}: {e}"
+            return result
+    validators = {'etag': resp.headers.get('ETag'), 'last_modified': resp.headers.get('Last-Modified')}
+    body_hash = digest(raw)
+    if page and page.get('body_hash') == body_hash:
+        # Server ignored the conditional headers but nothing changed
+        state.put(url, {**page, **validators})
+        result.outcome = 'same_body'
+        return result
+
+    body = raw.decode('utf-8', errors='replace')
+    previous = set(page['region_hashes']) if page else set()
+    seen = set(page['seen']) if page else set()
+    region_hashes = []
+    current = []
+    for region in regions(body):
+        region_hash = digest(region.encode('utf-8'))
+        region_hashes.append(region_hash)
+        if region_hash in previous:
+            continue
+        result.parsed += 1
+        item = parse_region(region, url)
+        if item:
+            item['key'] = item_key(item)
+            current.append(item)
+    result.regions = len(region_hashes)
+
+    unseen = [item for item in current if item['key'] not in seen]
+    if page is None:
+        # First poll of a page: everything already listed is history, only the newest item may alert
+        unseen = unseen[:1]
+    result.new_items = unseen
+    seen.update(item['key'] for item in current)
+    state.put(url, {
+        **validators,
+        'body_hash': body_hash,
+        'region_hashes': region_hashes,
+        'seen': sorted(seen),
+        'checked_at': datetime.now(timezone.utc).isoformat(),
+    })
+    result.outcome = 'parsed'
+    return result
+
+
+def make_db_store(connection_factory):
+    """(read, write) for system_alerts; the connection is opened on first use and dropped on error"""
+    import db_utils
+    conn = None
+
+    def connection():
+        nonlocal conn
+        if conn is None:
+            conn = connection_factory()
+        return conn
+
+    def reset():
+        nonlocal conn
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        conn = None
+
+    def existing(items):
+        try:
+            rows = db_utils.fetch_all(connection(), """
+                SELECT title, url FROM system_alerts
+                WHERE alert_type = %s AND title = ANY(%s)
+            """, (ALERT_TYPE, [i['title'] for i in items]))
+        except Exception:
+            reset()
+            raise
+        return {(r['title'], r['url']) for r in rows}
+
+    def insert(items):
+        rows = [{
+            'alert_type': ALERT_TYPE,
+            'title': i['title'],
+            'message': ALERT_MESSAGE,
+            'url': i['url'],
+            'severity': 'warning',
+            'read': False,
+        } for i in items]
+        try:
+            db_utils.bulk_insert(connection(), 'system_alerts', rows,
+                                 ['alert_type', 'title', 'message', 'url', 'severity', 'read'])
+        except Exception:
+            reset()
+            raise
+
+    def close():
+        if conn is not None:
+            conn.close()
+
+    return existing, insert, close
+
+
+def record_alerts(items, existing, insert):
+    """Insert alerts for items not already in system_alerts (state file may have been reset)"""
+    known = existing(items)
+    fresh = [i for i in items if (i['title'], i['url']) not in known]
+    if fresh:
+        insert(fresh)
+    return fresh
+
+
+def run_once(urls, state, existing=None, insert=None, workers=8, save=True):
+    """Poll every URL concurrently; touches the DB only if some page produced new items
+
+    save=False keeps the updated validators in memory only (used by --dry-run). If recording
+    the alerts fails, `state` is rolled back so the same items come up again on the next poll.
+    """
+    before = state.snapshot()
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(urls)))) as pool:
+        results = list(pool.map(lambda u: poll(u, state), urls))
+    new_items = [item for r in results for item in r.new_items]
+    alerted = []
+    if new_items and insert is not None:
+        try:
+            alerted = record_alerts(new_items, existing, insert)
+        except Exception:
+            state.restore(before)
+            raise
+    if save:
+        state.save()
+    return results, new_items, alerted
+
+
+def report(results, new_items, alerted, seconds, dry_run=False):
+    by_outcome = {}
+    for r in results:
+        by_outcome[r.outcome] = by_outcome.get(r.outcome, 0) + 1
+    print(f"[POLL] {len(results)} pages in {seconds:.2f}s: "
+          + ', '.join(f"{k}={v}" for k, v in sorted(by_outcome.items())))
+    for r in results:
+        if r.outcome == 'parsed':
+            print(f"   {r.url}: parsed {r.parsed}/{r.regions} regions, {len(r.new_items)} new")
+        elif r.outcome == 'error':
+            print(f"[ERROR] {r.url}: {r.error}")
+    for item in new_items:
+        print(f"[NEW] {item['title']} ({item['url']})")
+    if new_items:
+        action = 'would insert' if dry_run else 'inserted'
+        print(f"[ALERTS] {len(new_items) if dry_run else len(alerted)} {action}")
+
+
+class NewsFixture:
+    """Local stand-in for a USAC news page with ETag / Last-Modified support
+
+    `items` (newest first) and `footer` can be changed between polls; `honor_conditional`
+    switches off 304s to mimic a server that ignores validators.
+    """
+
+    def __init__(self, count=40, pages=1):
+        self.items = [self.item(i) for i in range(count, 0, -1)]
+        self.footer = 'Last reviewed 2025-11-01'
+        self.honor_conditional = True
+        self.pages = pages
+        self.version = 0
+        self.lock = threading.Lock()
+        self.hits = {200: 0, 304: 0}
+        fixture = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fixture.handle(self)
+
+        # Default listen backlog (5) drops connections when many pages are polled at once
+        server_class = type('FixtureServer', (ThreadingHTTPServer,), {'request_queue_size': 128})
+        self.server = server_class(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._render()
+
+    @staticmethod
+    def item(n):
+        return {'title': f"RHC Program Update {n}: FY{2020 + n % 7} filing window guidance",
+                'slug': f"rhc-program-update-{n}", 'date': f"2025-{1 + n % 12:02d}-{1 + n % 28:02d}"}
+
+    def urls(self):
+        return [f"{self.base_url}/rural-health-care/resources/news/{p}/" for p in range(self.pages)]
+
+    def publish(self, item=None, footer=None):
+        with self.lock:
+            if item:
+                self.items.insert(0, item)
+            if footer:
+                self.footer = footer
+            self._render()
+
+    def _render(self):
+        articles = ''.join(
+            f'<article class="news-item">\n  <h2><a href="/rural-health-care/resources/news/{i["slug"]}/">'
+            f'{html.escape(i["title"])}</a></h2>\n  <time datetime="{i["date"]}">{i["date"]}</time>\n'
+            f'  <p>{"Program participants should review the updated guidance. " * 6}</p>\n</article>\n'
+            for i in self.items)
+        nav = '<a href="#">Menu</a>' * 40
+        page = (f'<html><head><title>News | USAC</title></head><body>\n<nav>{nav}</nav>\n'
+                f'<main>\n{articles}</main>\n<footer>{self.footer}</footer>\n</body></html>')
+        self.version += 1
+        self.body = page.encode('utf-8')
+        self.etag = f'"v{self.version}-{digest(self.body)[:8]}"'
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+    def handle(self, request):
+        with self.lock:
+            body, etag, last_modified = self.body, self.etag, self.last_modified
+            not_modified = self.honor_conditional and (
+                request.headers.get('If-None-Match') == etag
+                or (request.headers.get('If-None-Match') is None
+                    and request.headers.get('If-Modified-Since') == last_modified))
+            self.hits[304 if not_modified else 200] += 1
+        if not_modified:
+            request.send_response(304)
+            request.send_header('ETag', etag)
+            request.end_headers()
+            return
+        if 'gzip' in request.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            encoding = 'gzip'
+        else:
+            encoding = None
+        request.send_response(200)
+        request.send_header('Content-Type', 'text/html; charset=utf-8')
+        request.send_header('Content-Length', str(len(body)))
+        if encoding:
+            request.send_header('Content-Encoding', encoding)
+        if self.honor_conditional:
+            request.send_header('ETag', etag)
+            request.send_header('Last-Modified', last_modified)
+        request.end_headers()
+        request.wfile.write(body)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+        return False
+
+
+def run_fixture_test(pages=20, polls=20):
+    """Scripted scenarios against the fixture server; returns the number of failed checks"""
+    failures = 0
+    db_calls = {'read': 0, 'write': 0}
+    alerts = []
+
+    def existing(items):
+        db_calls['read'] += 1
+        return {(a['title'], a['url']) for a in alerts}
+
+    def insert(items):
+        db_calls['write'] += 1
+        alerts.extend(items)
+
+    def check(label, condition, detail=''):
+        nonlocal failures
+        print(f"[{'PASS' if condition else 'FAIL'}] {label}{f' ({detail})' if detail else ''}")
+        failures += 0 if condition else 1
+
+    with NewsFixture(pages=1) as fixture:
+        url = fixture.urls()[0]
+        state = MonitorState()
+
+        results, new, _ = run_once([url], state, existing, insert)
+        r = results[0]
+        check('cold poll parses every region and alerts only the newest item',
+              r.outcome == 'parsed' and r.parsed == r.regions == 40 and len(new) == 1
+              and new[0]['title'] == fixture.items[0]['title'], f"{r.parsed}/{r.regions} regions, {len(new)} new")
+
+        before = dict(db_calls)
+        results, new, _ = run_once([url], state, existing, insert)
+        check('unchanged page comes back 304 without touching the DB',
+              results[0].outcome == 'not_modified' and results[0].bytes == 0 and db_calls == before)
+
+        fixture.honor_conditional = False
+        results, new, _ = run_once([url], state, existing, insert)
+        check('server ignoring validators: same body hash, nothing parsed',
+              results[0].outcome == 'same_body' and results[0].parsed == 0 and db_calls == before)
+        fixture.honor_conditional = True
+
+        fixture.publish(footer='Last reviewed 2025-11-18')
+        results, new, _ = run_once([url], state, existing, insert)
+        check('footer-only change: no region re-parsed, no DB calls',
+              results[0].outcome == 'parsed' and results[0].parsed == 0 and not new and db_calls == before,
+              f"{results[0].parsed} regions parsed")
+
+        fresh = {'title': 'FCC Order 19-78: new rules of the road for RHC funding', 'slug': 'fcc-19-78',
+                 'date': '2025-11-18'}
+        fixture.publish(item=fresh)
+        results, new, alerted = run_once([url], state, existing, insert)
+        check('new item: only its region is parsed and one alert is written',
+              results[0].parsed == 1 and [i['title'] for i in alerted] == [fresh['title']]
+              and db_calls['write'] == before['write'] + 1, f"{results[0].parsed}/{results[0].regions} regions")
+
+        state.pages.clear()
+        results, new, alerted = run_once([url], state, existing, insert)
+        check('lost state file: DB read dedupes, no duplicate alert',
+              len(new) == 1 and not alerted and len(alerts) == 2)
+
+        def failing_insert(items):
+            raise OSError('database unavailable')
+
+        outage = {'title': 'Form 466 filing window opens', 'slug': 'form-466-window', 'date': '2025-11-19'}
+        fixture.publish(item=outage)
+        try:
+            run_once([url], state, existing, failing_insert)
+            raised = False
+        except OSError:
+            raised = True
+        results, new, alerted = run_once([url], state, existing, insert)
+        check('DB outage: state rolled back, the item alerts on the next poll',
+              raised and [i['title'] for i in alerted] == [outage['title']])
+
+    with NewsFixture(pages=pages) as fixture:
+        urls = fixture.urls()
+        state = MonitorState()
+        with bench_utils.Stopwatch() as cold:
+            run_once(urls, state, existing, insert)
+        with bench_utils.Stopwatch() as warm:
+            for _ in range(polls):
+                run_once(urls, state, existing, insert)
+        full = MonitorState()
+        with bench_utils.Stopwatch() as uncached:
+            for _ in range(polls):
+                full.pages.clear()
+                for u in urls:
+                    poll(u, full)
+        warm_rate = pages * polls / warm.seconds
+        print(f"[BENCH] {pages} pages: cold poll {cold.seconds:.2f}s, conditional polls {warm_rate:,.0f} pages/sec, "
+              f"full fetch+parse {pages * polls / uncached.seconds:,.0f} pages/sec "
+              f"({fixture.hits[304]:,} 304s, {fixture.hits[200]:,} 200s)")
+        check('repeat polls of unchanged pages are all 304s', fixture.hits[304] == pages * polls)
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='USAC news monitor with conditional requests')
+    parser.add_argument('--url', action='append', help='Page to watch (repeatable)')
+    parser.add_argument('--state-file', default=DEFAULT_STATE_FILE)
+    parser.add_argument('--workers', type=int, default=8, help='Pages fetched concurrently')
+    parser.add_argument('--interval', type=float, default=0, help='Poll again every N seconds (0 = once)')
+    parser.add_argument('--dry-run', action='store_true', help='Report new items without touching the DB or the state file')
+    parser.add_argument('--fixture-test', action='store_true', help='Run scenarios against a local fixture server')
+    args = parser.parse_args()
+
+    if args.fixture_test:
+        failures = run_fixture_test()
+        sys.exit(1 if failures else 0)
+
+    urls = args.url or DEFAULT_URLS
+    state = MonitorState(args.state_file)
+    existing = insert = close = None
+    if not args.dry_run:
+        import db_utils
+        existing, insert, close = make_db_store(db_utils.get_connection)
+    try:
+        while True:
+            try:
+                with bench_utils.Stopwatch() as sw:
+                    results, new_items, alerted = run_once(urls, state, existing, insert, workers=args.workers,
+                                                             save=not args.dry_run)
+                report(results, new_items, alerted, sw.seconds, dry_run=args.dry_run)
+            except Exception as e:
+                # State was not saved, so the same items alert on the next poll
+                print(f"[ERROR] {type(e).__name__}: {e}")
+                if not args.interval:
+                    sys.exit(1)
+            if not args.interval:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if close:
+            close()
+
+
+if __name__ == '__main__':
+    main()
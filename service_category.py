@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Service Category Classifier
+Purpose: Same categories as workflows/n8n_code_snippets/parse_service_category.js, for batch use
+
+All keywords from the JS .includes() chains are compiled into one regex. A column is
+classified by joining its distinct values into a single string and scanning it once; each row ends up
+with a bitmask of the keywords it contains, and the ordered rules are evaluated on that
+mask (cached per distinct mask). Every result also names the rule clause that fired,
+e.g. 'voice:telephone' or 'both_telecom_internet:telecom+internet'.
+
+Usage:
+  python service_category.py "Voice and Internet"
+  python service_category.py --parity 20000            # compare against the JS with node
+  python service_category.py --benchmark 2000000
+  python service_category.py --backfill [--dry-run]    # re-normalize requested_service_category
+"""
+
+import os
+import re
+import sys
+import json
+import bisect
+import random
+import argparse
+import tempfile
+import subprocess
+
+import bench_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+JS_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'workflows', 'n8n_code_snippets', 'parse_service_category.js')
+
+UNKNOWN = 'unknown'
+
+# (category, clauses) in the JS if/else order; a clause is a tuple of keywords that must all appear
+RULES = [
+    ('voice', (('voice',), ('telephone',), ('voip',), ('phone',))),
+    ('data', (('data',), ('internet',), ('broadband',))),
+    ('both_telecom_internet', (('both',), ('telecom', 'internet'))),
+    ('telecommunications_only', (('telecommunications', 'only'),)),
+    ('other', (('other',), ('consulting',), ('network design',))),
+]
+
+
+class ServiceCategoryClassifier:
+    """Compiled form of the parse_service_category.js rules"""
+
+    def __init__(self, rules=RULES):
+        self.rules = rules
+        self.keywords = sorted({kw for _, clauses in rules for clause in clauses for kw in clause},
+                               key=lambda kw: (-len(kw), kw))
+        self.bits = {kw: 1 << i for i, kw in enumerate(self.keywords)}
+        # A match also implies every keyword it contains ("telecommunications" -> "telecom").
+        # Other overlaps are found anyway because the lookahead tries every position.
+        self.implied = {kw: sum(bit for other, bit in self.bits.items() if other in kw) for kw in self.keywords}
+        self.pattern = re.compile('(?=(' + '|'.join(re.escape(kw) for kw in self.keywords) + '))')
+        self.clauses = [(category, f"{category}:{'+'.join(clause)}", sum(self.bits[kw] for kw in clause))
+                        for category, clauses in rules for clause in clauses]
+        self._by_mask = {0: (UNKNOWN, None)}
+
+    def evaluate(self, mask):
+        """(category, rule) for a keyword bitmask; first clause whose keywords are all present wins"""
+        result = self._by_mask.get(mask)
+        if result is None:
+            result = (UNKNOWN, None)
+            for category, rule, required in self.clauses:
+                if mask & required == required:
+                    result = (category, rule)
+                    break
+            self._by_mask[mask] = result
+        return result
+
+    def mask(self, text):
+        mask = 0
+        for m in self.pattern.finditer(text):
+            mask |= self.implied[m.group(1)]
+        return mask
+
+    def classify(self, text):
+        """(category, rule) for one description; rule is None for 'unknown'"""
+        return self.evaluate(self.mask(str(text or '').lower().strip()))
+
+    def classify_column(self, texts):
+        """Classify many descriptions with one regex scan; returns (categories, rules) lists"""
+        lowered = [str(t or '').lower().strip() for t in texts]
+        # Backfill columns repeat a handful of USAC phrasings; scan each distinct text once
+        distinct = list(dict.fromkeys(lowered))
+        results = dict(zip(distinct, self._scan(distinct)))
+        categories, rules = [], []
+        for text in lowered:
+            category, rule = results[text]
+            categories.append(category)
+            rules.append(rule)
+        return categories, rules
+
+    def _scan(self, lowered):
+        """One finditer over all texts joined by newlines; returns (category, rule) per text"""
+        # Keywords never contain a newline, so no match can span two rows
+        joined = '\n'.join(text.replace('\n', '\0') for text in lowered)
+        starts = []
+        offset = 0
+        for text in lowered:
+            starts.append(offset)
+            offset += len(text) + 1
+
+        masks = [0] * len(lowered)
+        implied = self.implied
+        row = 0
+        next_start = starts[1] if len(starts) > 1 else offset
+        for m in self.pattern.finditer(joined):
+            pos = m.start()
+            if pos >= next_start:
+                row = bisect.bisect_right(starts, pos) - 1
+                next_start = starts[row + 1] if row + 1 < len(starts) else offset
+            masks[row] |= implied[m.group(1)]
+
+        return [self.evaluate(mask) for mask in masks]
+
+
+def service_text(filing):
+    """Same field fallback as the JS: service_type || type_of_service || request_for_services"""
+    return filing.get('service_type') or filing.get('type_of_service') or filing.get('request_for_services') or ''
+
+
+_default = None
+
+
+def classify(text):
+    """Module-level shortcut using a shared compiled classifier"""
+    global _default
+    if _default is None:
+        _default = ServiceCategoryClassifier()
+    return _default.classify(text)
+
+
+NOISE_WORDS = ['circuit', 'mbps', 'fiber', 'ethernet', 'service(s)', 'mpls', 'dark', 'equipment', 'and',
+               'lines', 'T1', 'wireless', 'upgrade', 'for', 'clinic', 'network', 'design', 'only', 'both',
+               'Telecom', 'TELEPHONE', 'Internet', 'other', 'consulting', 'telecommunications', 'Data']
+
+
+def parity_corpus(count, seed=35):
+    """Filings with realistic and adversarial service descriptions"""
+    import synthetic_data
+    rng = random.Random(seed)
+    keywords = [kw for _, clauses in RULES for clause in clauses for kw in clause]
+    fixed = synthetic_data.SERVICE_TYPES + synthetic_data.REQUEST_FOR_SERVICES + [
+        '', '   ', 'Telecommunications Only', 'telecom + internet', 'TELECOMMUNICATIONS SERVICE ONLY',
+        'internetwork design', 'Network Design', 'smartphone', 'Both', 'metadata', 'otherwise',
+        'Telecommunications\nOnly', 'network\ndesign', 'VoIP', 'bRoAdBaNd', 'tele-phone', 'network  design',
+    ]
+    filings = []
+    for i in range(count):
+        if i < len(fixed):
+            text = fixed[i]
+        else:
+            words = rng.sample(NOISE_WORDS, rng.randint(0, 4)) + rng.sample(keywords, rng.randint(0, 2))
+            rng.shuffle(words)
+            text = rng.choice([' ', '', '-', ' / ']).join(words)
+        field = rng.choice(['service_type', 'service_type', 'type_of_service', 'request_for_services'])
+        filings.append({field: text})
+    return filings
+
+
+JS_HARNESS = """
+const fs = require('fs');
+const items = JSON.parse(fs.readFileSync(process.argv[2], 'utf8')).map(json => ({ json }));
+const $input = { all: () => items };
+const out = (function () {
+%s
+})();
+process.stdout.write(JSON.stringify(out.map(o => o.json.requested_service_category)));
+"""
+
+
+def run_parity(count):
+    """Classify the corpus with the JS snippet under node and with this module; returns mismatches"""
+    filings = parity_corpus(count)
+    with open(JS_SOURCE, 'r', encoding='utf-8') as f:
+        js = f.read()
+    with tempfile.TemporaryDirectory() as tmp:
+        corpus_path = os.path.join(tmp, 'corpus.json')
+        script_path = os.path.join(tmp, 'harness.js')
+        with open(corpus_path, 'w', encoding='utf-8') as f:
+            json.dump(filings, f)
+        with open(script_path, 'w', encoding='utf-8') as f:
+            f.write(JS_HARNESS % js)
+        result = subprocess.run(['node', script_path, corpus_path], capture_output=True, text=True, check=True)
+    expected = json.loads(result.stdout)
+
+    classifier = ServiceCategoryClassifier()
+    texts = [service_text(f) for f in filings]
+    column, _ = classifier.classify_column(texts)
+    mismatches = []
+    for i, text in enumerate(texts):
+        single = classifier.classify(text)[0]
+        if not (expected[i] == column[i] == single):
+            mismatches.append({'text': text, 'js': expected[i], 'column': column[i], 'single': single})
+    return len(filings), mismatches
+
+
+def run_benchmark(count):
+    filings = parity_corpus(count)
+    texts = [service_text(f) for f in filings]
+    classifier = ServiceCategoryClassifier()
+    with bench_utils.Stopwatch() as sw:
+        categories, _ = classifier.classify_column(texts)
+    print(f"[BENCH] classify_column: {count:,} descriptions in {sw.seconds:.2f}s "
+          f"({count / sw.seconds * 60 / 1e6:.1f}M/min)")
+    sample = texts[:min(count, 200_000)]
+    with bench_utils.Stopwatch() as sw:
+        for text in sample:
+            classifier.classify(text)
+    print(f"[BENCH] classify (per row): {len(sample):,} descriptions in {sw.seconds:.2f}s "
+          f"({len(sample) / sw.seconds * 60 / 1e6:.1f}M/min)")
+    counts = {}
+    for category in categories:
+        counts[category] = counts.get(category, 0) + 1
+    print("[BENCH] " + ', '.join(f"{k}={v:,}" for k, v in sorted(counts.items())))
+
+
+def run_backfill(dry_run=False, chunk_size=50000):
+    """Re-derive requested_service_category for every clinic, writing only rows that change"""
+    import db_utils
+    classifier = ServiceCategoryClassifier()
+    read_conn = db_utils.get_connection()
+    write_conn = None if dry_run else db_utils.get_connection()
+    scanned = changed = 0
+    by_rule = {}
+
+    def flush(rows):
+        nonlocal changed
+        categories, rules = classifier.classify_column([service_text(r) for r in rows])
+        updates = []
+        for row, category, rule in zip(rows, categories, rules):
+            by_rule[rule or UNKNOWN] = by_rule.get(rule or UNKNOWN, 0) + 1
+            if row['requested_service_category'] != category:
+                updates.append({'id': row['id'], 'requested_service_category': category})
+        changed += len(updates)
+        if write_conn is not None and updates:
+            db_utils.bulk_update(write_conn, db_utils.CLINICS_TABLE, updates, ['requested_service_category'],
+                                 casts={'id': 'uuid'})
+
+    try:
+        with bench_utils.Stopwatch() as sw:
+            chunk = []
+            for row in db_utils.iter_rows(read_conn, f"""
+                SELECT id, service_type, request_for_services, requested_service_category
+                FROM {db_utils.CLINICS_TABLE}
+            """, batch_size=chunk_size, name='service_category_cursor'):
+                chunk.append(row)
+                if len(chunk) >= chunk_size:
+                    flush(chunk)
+                    scanned += len(chunk)
+                    chunk = []
+            if chunk:
+                flush(chunk)
+                scanned += len(chunk)
+    finally:
+        for conn in (read_conn, write_conn):
+            if conn is not None:
+                conn.close()
+
+    action = 'would change' if dry_run else 'updated'
+    print(f"[SUCCESS] {scanned:,} clinics scanned, {changed:,} {action} in {sw.seconds:.1f}s")
+    for rule, n in sorted(by_rule.items(), key=lambda kv: -kv[1]):
+        print(f"   {rule:<45} {n:,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Service category classifier (parse_service_category.js rules)')
+    parser.add_argument('text', nargs='*', help='Descriptions to classify')
+    parser.add_argument('--parity', type=int, metavar='N', help='Compare N generated filings against the JS')
+    parser.add_argument('--benchmark', type=int, metavar='N', help='Time classify_column over N descriptions')
+    parser.add_argument('--backfill', action='store_true', help='Re-normalize requested_service_category')
+    parser.add_argument('--dry-run', action='store_true', help='Backfill without writing')
+    args = parser.parse_args()
+
+    if args.parity:
+        total, mismatches = run_parity(args.parity)
+        for m in mismatches[:20]:
+            print(f"[MISMATCH] {m['text']!r}: js={m['js']} column={m['column']} single={m['single']}")
+        print(f"[PARITY] {total - len(mismatches):,}/{total:,} match the JS")
+        sys.exit(1 if mismatches else 0)
+    if args.benchmark:
+        run_benchmark(args.benchmark)
+        return
+    if args.backfill:
+        run_backfill(dry_run=args.dry_run)
+        return
+    for text in args.text:
+        category, rule = classify(text)
+        print(f"{text!r}: {category} ({rule or 'no rule matched'})")
+
+
+if __name__ == '__main__':
+    main()
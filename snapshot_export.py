@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parquet Snapshot Export
+Purpose: Columnar, compressed copies of clinics, email_instances, email_templates and
+weekly_performance for offline analysis, so notebooks and the analysis/scoring scripts stop
+paging the live database.
+
+Layout (hive-style, one file per partition per run, never rewritten):
+
+  data/snapshots/_manifest.json
+  data/snapshots/clinics/month=2025-11/part-20251118-090000-123456.parquet
+  data/snapshots/email_templates/version=week-46-2025/part-....parquet
+
+- rows are streamed through server-side cursors (db_utils.iter_rows) and written in row groups,
+  so memory stays at one batch per open partition
+- clinics and email_instances are incremental: each run only reads rows whose updated_at
+  is past the table's watermark and appends them as new files; readers keep the latest copy of
+  each id (email_instances needs migrations/add_email_instances_updated_at.sql). The manifest
+  remembers the (id, updated_at) pairs inside the overlap window, so re-read rows that were
+  already exported are skipped and a run with no changes writes no files
+- email_templates and weekly_performance are small and have no reliable change timestamp: they
+  are read whole, hashed per partition, and a new file is appended only for partitions whose
+  content changed; readers use the newest file of each partition
+- the manifest lists every live file; readers go through it, never through a directory glob
+
+Rows deleted in the database stay in incremental snapshots until the next --full run.
+
+Reading (memory-mapped, column-projected):
+
+  import snapshot_export
+  instances = snapshot_export.read_table('email_instances', columns=['id', 'sent_at', 'opened_at'])
+
+Usage:
+  python snapshot_export.py                          # append what changed since the last run
+  python snapshot_export.py --tables clinics email_instances
+  python snapshot_export.py --full                   # new complete snapshot; drops the old files
+  python snapshot_export.py --status
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+from datetime import datetime, timedelta, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+import bench_utils
+import db_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_SNAPSHOT_DIR = os.path.join('data', 'snapshots')
+MANIFEST_FILE = '_manifest.json'
+DEFAULT_BATCH_ROWS = 50000
+DEFAULT_COMPRESSION = 'zstd'
+
+# Re-read this much before the watermark so rows committed late are still picked up
+WATERMARK_OVERLAP = timedelta(minutes=30)
+
+# Prune the in-memory (id, change time) set of an export once it holds this many keys
+RECENT_KEYS_PRUNE_AT = 100000
+
+# Snapshot name -> source table, partition (name, SQL expression) and change timestamp.
+# changed=None means the table is re-read each run and compared per partition by content hash.
+TABLES = {
+    'clinics': {
+        'source': db_utils.CLINICS_TABLE,
+        'partition': ('month', "to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM')"),
+        'changed': 'updated_at',
+    },
+    'email_instances': {
+        'source': 'email_instances',
+        'partition': ('month', "to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM')"),
+        'changed': 'updated_at',
+    },
+    'email_templates': {
+        'source': 'email_templates',
+        'partition': ('version', 'version'),
+        'changed': None,
+    },
+    'weekly_performance': {
+        'source': 'weekly_performance',
+        'partition': ('year', "to_char(week_start, 'YYYY')"),
+        'changed': None,
+    },
+}
+
+COLUMNS_SQL = """
+    SELECT column_name, data_type, udt_name
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND table_name = %s
+    ORDER BY ordinal_position
+"""
+
+
+def require_pyarrow():
+    if not HAS_PYARROW:
+        raise RuntimeError('pyarrow not installed (pip install pyarrow)')
+
+
+def column_plan(conn, source):
+    """[(name, select expression, arrow type)] for every column of the source table"""
+    plan = []
+    for col in db_utils.fetch_all(conn, COLUMNS_SQL, (source,)):
+        name, udt = col['column_name'], col['udt_name']
+        quoted = f'"{name}"'
+        if col['data_type'] == 'ARRAY':
+            plan.append((name, f"{quoted}::text[]", pa.list_(pa.string())))
+        elif udt in ('int2', 'int4', 'int8'):
+            plan.append((name, quoted, pa.int64()))
+        elif udt in ('float4', 'float8', 'numeric'):
+            plan.append((name, f"{quoted}::float8", pa.float64()))
+        elif udt == 'bool':
+            plan.append((name, quoted, pa.bool_()))
+        elif udt == 'timestamptz':
+            plan.append((name, quoted, pa.timestamp('us', tz='UTC')))
+        elif udt == 'timestamp':
+            plan.append((name, quoted, pa.timestamp('us')))
+        elif udt == 'date':
+            plan.append((name, quoted, pa.date32()))
+        else:
+            # uuid, text, json/jsonb and anything exotic travel as text
+            plan.append((name, f"{quoted}::text", pa.string()))
+    if not plan:
+        raise RuntimeError(f"Table {source} not found in the public schema")
+    return plan
+
+
+def load_manifest(root):
+    path = os.path.join(root, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'tables': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_manifest(root, manifest):
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, MANIFEST_FILE)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, default=str)
+    os.replace(tmp, path)
+
+
+class PartitionWriter:
+    """Buffers rows per partition and writes each partition as row groups of one new Parquet file"""
+
+    def __init__(self, root, table, partition_name, schema, run_id, batch_rows, compression):
+        self.root = root
+        self.table = table
+        self.partition_name = partition_name
+        self.schema = schema
+        self.run_id = run_id
+        self.batch_rows = batch_rows
+        self.compression = compression
+        self.buffers = {}
+        self.writers = {}
+        self.rows = {}
+
+    def relative_path(self, partition):
+        return os.path.join(self.table, f"{self.partition_name}={partition}", f"part-{self.run_id}.parquet")
+
+    def add(self, partition, values):
+        buffer = self.buffers.setdefault(partition, [])
+        buffer.append(values)
+        if len(buffer) >= self.batch_rows:
+            self._flush(partition)
+
+    def _flush(self, partition):
+        buffer = self.buffers.pop(partition, None)
+        if not buffer:
+            return
+        columns = list(zip(*buffer))
+        batch = pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, self.schema)],
+                                     schema=self.schema)
+        writer = self.writers.get(partition)
+        if writer is None:
+            path = os.path.join(self.root, self.relative_path(partition))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            writer = pq.ParquetWriter(path + '.tmp', self.schema, compression=self.compression)
+            self.writers[partition] = writer
+        writer.write_table(batch, row_group_size=self.batch_rows)
+        self.rows[partition] = self.rows.get(partition, 0) + len(buffer)
+
+    def close(self):
+        """Finish every file; returns manifest entries for the partitions written"""
+        for partition in list(self.buffers):
+            self._flush(partition)
+        files = []
+        for partition, writer in sorted(self.writers.items()):
+            writer.close()
+            relative = self.relative_path(partition)
+            path = os.path.join(self.root, relative)
+            os.replace(path + '.tmp', path)
+            files.append({'path': relative, 'partition': partition, 'rows': self.rows[partition],
+                          'bytes': os.path.getsize(path), 'run_id': self.run_id})
+        return files
+
+    def abort(self):
+        for partition, writer in self.writers.items():
+            writer.close()
+            os.remove(os.path.join(self.root, self.relative_path(partition)) + '.tmp')
+
+
+def partition_hash(rows):
+    digest = hashlib.blake2b(digest_size=16)
+    for values in sorted(rows, key=lambda r: str(r[0])):
+        digest.update(json.dumps(values, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def export_table(conn, name, root, manifest, run_id, full=False, batch_rows=DEFAULT_BATCH_ROWS,
+                 compression=DEFAULT_COMPRESSION):
+    """Append one run's worth of files for a table; returns (rows read, files written)"""
+    spec = TABLES[name]
+    partition_name, partition_sql = spec['partition']
+    entry = manifest['tables'].get(name)
+    if full or entry is None:
+        entry = {'files': [], 'watermark': None}
+    entry['mode'] = 'rows' if spec['changed'] else 'partitions'
+    entry['key'] = 'id'
+
+    plan = column_plan(conn, spec['source'])
+    exported_at = datetime.now(timezone.utc)
+    schema = pa.schema([pa.field(col, arrow_type) for col, _, arrow_type in plan]
+                       + [pa.field('_exported_at', pa.timestamp('us', tz='UTC'))])
+    select = ', '.join(f"{expr} AS \"{col}\"" for col, expr, _ in plan)
+    changed_sql = spec['changed'] or 'NULL::timestamptz'
+    sql = f"SELECT {select}, {partition_sql} AS _partition, {changed_sql} AS _changed FROM {spec['source']}"
+    params = None
+    if spec['changed'] and entry.get('watermark'):
+        sql += f" WHERE {spec['changed']} > %(since)s"
+        params = {'since': datetime.fromisoformat(entry['watermark']) - WATERMARK_OVERLAP}
+
+    writer = PartitionWriter(root, name, partition_name, schema, run_id, batch_rows, compression)
+    by_partition = {}
+    watermark = entry.get('watermark')
+    latest = None
+    rows_read = 0
+    # (id, change time) already exported in the overlap window of the previous run
+    exported = {tuple(k) for k in entry.get('recent', [])}
+    recent = set()
+    try:
+        for row in db_utils.iter_rows(conn, sql, params, batch_size=batch_rows, name=f'snapshot_{name}'):
+            rows_read += 1
+            partition = str(row['_partition'] or 'none').replace('/', '_').replace('\\', '_')
+            values = [row[col] for col, _, _ in plan] + [exported_at]
+            if spec['changed']:
+                changed = row['_changed']
+                key = (str(row['id']), changed.isoformat() if changed is not None else None)
+                if key in exported:
+                    continue
+                writer.add(partition, values)
+                if changed is not None:
+                    recent.add(key)
+                    if latest is None or changed > latest:
+                        latest = changed
+                    if len(recent) >= RECENT_KEYS_PRUNE_AT:
+                        recent = {k for k in recent if datetime.fromisoformat(k[1]) > latest - WATERMARK_OVERLAP}
+            else:
+                by_partition.setdefault(partition, []).append(values)
+
+        if not spec['changed']:
+            previous = {}
+            for f in entry['files']:
+                previous[f['partition']] = f.get('hash')
+            for partition, rows in by_partition.items():
+                digest = partition_hash([r[:-1] for r in rows])
+                if previous.get(partition) != digest:
+                    for values in rows:
+                        writer.add(partition, values)
+                    by_partition[partition] = digest
+                else:
+                    by_partition[partition] = None
+        files = writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    for f in files:
+        if not spec['changed']:
+            f['hash'] = by_partition[f['partition']]
+    if latest is not None:
+        watermark = latest.isoformat()
+    if spec['changed'] and watermark:
+        window_start = datetime.fromisoformat(watermark) - WATERMARK_OVERLAP
+        entry['recent'] = sorted(k for k in recent | exported if datetime.fromisoformat(k[1]) > window_start)
+    entry['files'].extend(files)
+    entry['watermark'] = watermark
+    entry['exported_at'] = exported_at.isoformat()
+    manifest['tables'][name] = entry
+    return rows_read, files
+
+
+def referenced_files(manifest):
+    return {f['path'] for entry in manifest['tables'].values() for f in entry['files']}
+
+
+def remove_unreferenced(root, before, manifest):
+    """Delete files a --full run replaced (only after the new manifest is saved)"""
+    stale = before - referenced_files(manifest)
+    for relative in stale:
+        path = os.path.join(root, relative)
+        if os.path.exists(path):
+            os.remove(path)
+    return len(stale)
+
+
+def run_export(tables, root=DEFAULT_SNAPSHOT_DIR, full=False, batch_rows=DEFAULT_BATCH_ROWS,
+               compression=DEFAULT_COMPRESSION):
+    require_pyarrow()
+    manifest = load_manifest(root)
+    before = referenced_files(manifest)
+    # Microseconds so two runs in the same second never write the same part file
+    run_id = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S-%f')
+    conn = db_utils.get_connection()
+    try:
+        for name in tables:
+            with bench_utils.Stopwatch() as sw:
+                rows, files = export_table(conn, name, root, manifest, run_id, full=full,
+                                           batch_rows=batch_rows, compression=compression)
+            written = sum(f['rows'] for f in files)
+            size = sum(f['bytes'] for f in files) / (1024 * 1024)
+            print(f"[EXPORT] {name}: {rows:,} rows read, {written:,} written to {len(files)} new files "
+                  f"({size:.1f} MB) in {sw.seconds:.1f}s")
+            # Save after every table so a failure later in the run keeps the finished ones
+            save_manifest(root, manifest)
+    finally:
+        conn.close()
+    if full:
+        removed = remove_unreferenced(root, before, manifest)
+        if removed:
+            print(f"[CLEANUP] {removed} files from the previous snapshot removed")
+
+
+def _concat(tables):
+    try:
+        return pa.concat_tables(tables, promote_options='default')
+    except TypeError:
+        # pyarrow < 14
+        return pa.concat_tables(tables, promote=True)
+
+
+def read_table(name, root=DEFAULT_SNAPSHOT_DIR, columns=None):
+    """Snapshot of one table as a pyarrow Table (files memory-mapped, only `columns` read)
+
+    Incremental tables are reduced to the latest exported copy of each id.
+    """
+    require_pyarrow()
+    entry = load_manifest(root)['tables'].get(name)
+    if not entry or not entry['files']:
+        raise FileNotFoundError(f"No {name} snapshot in {root} (run snapshot_export.py first)")
+
+    files = entry['files']
+    if entry['mode'] == 'partitions':
+        newest = {}
+        for f in files:
+            newest[f['partition']] = f
+        files = list(newest.values())
+
+    key = entry.get('key')
+    wanted = None
+    if columns is not None:
+        wanted = list(dict.fromkeys(list(columns) + ([key] if key and entry['mode'] == 'rows' else [])))
+    tables = []
+    for f in files:
+        path = os.path.join(root, f['path'])
+        names = pq.read_schema(path).names
+        tables.append(pq.read_table(path, columns=[c for c in wanted if c in names] if wanted else None,
+                                    memory_map=True))
+    table = _concat(tables)
+
+    if entry['mode'] == 'rows' and key in table.column_names:
+        # Files are in export order, so the highest row index of an id is its newest copy
+        table = table.append_column('_row', pa.array(range(table.num_rows), type=pa.int64()))
+        rows = table.group_by(key).aggregate([('_row', 'max')])['_row_max']
+        table = table.take(pc.take(rows, pc.sort_indices(rows)))
+        table = table.drop_columns(['_row'])
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table
+
+
+def iter_rows(name, root=DEFAULT_SNAPSHOT_DIR, columns=None, batch_size=10000):
+    """Snapshot rows as dicts, one record batch at a time"""
+    for batch in read_table(name, root, columns).to_batches(max_chunksize=batch_size):
+        yield from batch.to_pylist()
+
+
+def print_status(root):
+    manifest = load_manifest(root)
+    if not manifest['tables']:
+        print(f"[INFO] No snapshots in {root}")
+        return
+    for name, entry in manifest['tables'].items():
+        rows = sum(f['rows'] for f in entry['files'])
+        size = sum(f['bytes'] for f in entry['files']) / (1024 * 1024)
+        partitions = len({f['partition'] for f in entry['files']})
+        print(f"   {name:<20} {len(entry['files']):>5} files  {partitions:>4} partitions  {rows:>12,} rows stored  "
+              f"{size:>8.1f} MB  watermark {entry.get('watermark') or '-'}  exported {entry.get('exported_at')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export Postgres tables to partitioned Parquet snapshots')
+    parser.add_argument('--tables', nargs='+', choices=list(TABLES), default=list(TABLES))
+    parser.add_argument('--out', default=DEFAULT_SNAPSHOT_DIR, help='Snapshot root directory')
+    parser.add_argument('--full', action='store_true', help='Ignore watermarks and write a complete new snapshot')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help='Cursor batch / row group size')
+    parser.add_argument('--compression', default=DEFAULT_COMPRESSION, choices=['zstd', 'snappy', 'gzip', 'none'])
+    parser.add_argument('--status', action='store_true', help='Summarize the manifest and exit')
+    args = parser.parse_args()
+
+    if args.status:
+        print_status(args.out)
+        return
+    run_export(args.tables, root=args.out, full=args.full, batch_rows=args.batch_rows,
+               compression=args.compression)
+    print_status(args.out)
+
+
+if __name__ == '__main__':
+    main()
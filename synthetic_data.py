@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Synthetic Data Generator
+Purpose: Deterministic fake clinics for load/benchmark runs against a local stack
+
+Synthetic clinic rows use hcp_number 'SYN-xxxxxxx' so they can be cleared again.
+The corpus generators (emails, raw USAC filings, funding history, template sets) feed
+benchmark_pipeline.py; the same seed and scale always give byte-identical output.
+
+Usage:
+  python synthetic_data.py seed-clinics --count 10000
+  python synthetic_data.py clear-clinics
+  python synthetic_data.py corpus --scale 10 --out data/synthetic
+"""
+
+import os
+import sys
+import json
+import random
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+SYNTHETIC_HCP_PREFIX = 'SYN-'
+
+# Hosts seed/clear accept without --allow-remote (a leading '/' is a local Unix socket)
+LOCAL_DB_HOSTS = ('localhost', '127.0.0.1', '::1')
+
+STATES = ['AK', 'AZ', 'CA', 'CO', 'GA', 'ID', 'KS', 'KY', 'MN', 'MO', 'MT', 'NC', 'ND', 'NE',
+          'NM', 'NV', 'OK', 'OR', 'SD', 'TN', 'TX', 'UT', 'VA', 'WA', 'WI', 'WV', 'WY']
+NAME_PREFIXES = ['Valley', 'Mountain', 'Prairie', 'River', 'Lakeside', 'Pine', 'Cedar', 'Red Rock',
+                 'Sunrise', 'Canyon', 'Frontier', 'Big Sky', 'Heartland', 'Eagle', 'Northern']
+NAME_SUFFIXES = ['Rural Health Clinic', 'Medical Center', 'Community Health Center', 'Family Clinic',
+                 'Regional Hospital', 'Health Services', 'Critical Access Hospital']
+STREETS = ['Main St', 'Oak Ave', 'Hospital Dr', 'Highway 12', 'Center St', 'Elm St', 'Clinic Rd']
+REQUEST_FOR_SERVICES = ['Voice', 'Internet', 'Data', 'Voice and Internet', 'Other']
+SERVICE_TYPES = ['Telecommunications Service(s)', 'Internet Access', 'Network Equipment',
+                 'Dark Fiber', 'MPLS Circuit', 'Ethernet 100 Mbps']
+CONSULTANT_ORGS = ['RHC Telecom Partners', 'Rural Connect Consulting', 'E-Rate & RHC Advisors']
+FIRST_NAMES = ['Mary', 'James', 'Linda', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Susan', 'David']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Miller', 'Davis', 'Wilson', 'Moore', 'Clark']
+
+# Corpus sizes at --scale 1; benchmark_pipeline.py runs 1x/10x/100x of these
+CORPUS_BASE_SIZES = {'emails': 100, 'filings': 1000, 'template_sets': 20}
+
+MIKE_SENDER = 'Michael Hyams <michael@chargeraccess.com>'
+MIKE_SIGNATURE = ('Mike Hyams\r\n\r\nCharger Access, LLC\r\n\r\n615-622-4603 Office\r\n\r\n'
+                  '206 Gothic Ct, Suite 304\r\n\r\nFranklin, TN 37067\r\n\r\nwww.chargeraccess.com')
+EMAIL_OPENINGS = ["I saw {clinic}'s Form 465 posting for {year}.", 'I wanted to check in on the USAC circuits.',
+                  'I just tried to call but wanted to follow up by email.', 'Thanks for getting back to me.',
+                  'Looks like they are extending the filing window.']
+EMAIL_SENTENCES = ['Let me know if we can help with the bids.', 'We can put together pricing for each site.',
+                   'Do you have a copy of the current contract?', 'Would you like to see options with higher speeds?',
+                   'We are happy to handle the competitive bidding paperwork.', 'If you want, I can resend it in that format.',
+                   'Manage services and hosted phone systems are our specialty.',
+                   'I would love to get you a proposal before the window closes.',
+                   'Are these speeds working for you or would you like to see other solutions?',
+                   'We do a bunch of things outside of USAC if we can help.']
+EMAIL_CLOSINGS = ['Thanks,', 'Let me know.', 'Look forward to hearing from you.', 'Happy to help.',
+                  'Have a great weekend.']
+EMAIL_SUBJECTS = ['USAC 465 - {clinic}', 'USAC Telecom', 'USAC Bid', 'USAC {year} - {clinic}', 'USAC contact']
+TEMPLATE_SUBJECTS = ['USAC RHC Support - {{clinic_name}}', 'Quick question - {{clinic_name}} Form 465',
+                     'USAC {{funding_year}} - {{clinic_name}}', 'Form 465 - {{clinic_name}}']
+ENRICHMENT_SNIPPETS = ["Here's what I found:\n- {clinic} opened a new wing in {city}\n- The clinic added telehealth visits\n- Staff grew 20%",
+                       'Based on my research: {clinic} in {city} recently expanded its rural outreach program. '
+                       'It also partnered with a regional hospital. The board approved a new budget.',
+                       'No recent news found.']
+
+
+def synthetic_emails(count, seed=10):
+    """Records shaped like extracted_emails.json (extract_emails.py output); ~60% sent by Mike"""
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 6, 9, 0)
+    emails = []
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        clinic = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}"
+        contact = f"{first} {last} <{first[0].lower()}{last.lower()}@{clinic.lower().replace(' ', '')[:12]}.org>"
+        year = rng.choice(['FY 2024', 'FY 2025', 'FY 2026'])
+        subject = rng.choice(EMAIL_SUBJECTS).format(clinic=clinic, year=year)
+        from_mike = rng.random() < 0.6
+        sent = start + timedelta(days=rng.randint(0, 2000), minutes=rng.randint(0, 600))
+
+        sentences = [rng.choice(EMAIL_OPENINGS).format(clinic=clinic, year=year)]
+        sentences += rng.sample(EMAIL_SENTENCES, rng.randint(1, 5))
+        own = f"{first},\r\n" + '  '.join(sentences) + f"\r\n\r\n{rng.choice(EMAIL_CLOSINGS)}\r\n\r\n"
+        quoted = (f"\r\n________________________________\r\nFrom: {contact if from_mike else MIKE_SENDER}\r\n"
+                  f"Sent: {sent - timedelta(hours=rng.randint(1, 72)):%A, %B %d, %Y %I:%M %p}\r\n"
+                  f"Subject: {subject}\r\n\r\n{' '.join(rng.sample(EMAIL_SENTENCES, 3))}\r\n")
+        body = own + (MIKE_SIGNATURE if from_mike else f"{first}") + (quoted if rng.random() < 0.7 else '')
+        emails.append({
+            'file': f"SYN_{i:06d}_{subject[:30].replace(' ', '_')}.msg",
+            'subject': subject if rng.random() < 0.5 else f"Re: {subject}",
+            'sender': MIKE_SENDER if from_mike else contact,
+            'to': contact if from_mike else MIKE_SENDER,
+            'date': sent.isoformat(sep=' ') + '-05:00',
+            'body': body,
+            'method': 'extract_msg_library',
+        })
+    return emails
+
+
+def email_msg_bytes(email):
+    """A .msg stand-in (UTF-16 property text with binary padding), readable by extract_email_simple"""
+    text = f"Subject: {email['subject']}\r\nFrom: {email['sender']}\r\nTo: {email['to']}\r\n\r\n{email['body']}"
+    return b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1' + bytes(504) + text.encode('utf-16-le') + bytes(1024)
+
+
+def synthetic_usac_filings(count, seed=465, hcp_pool=None):
+    """Raw USAC API records with the field names EXTRACT_AND_TRANSFORM_CODE.js reads"""
+    rng = random.Random(seed)
+    hcp_pool = hcp_pool or max(count // 3, 1)
+    posted = datetime(2025, 7, 1)
+    filings = []
+    for _ in range(count):
+        consultant = rng.random() < 0.35
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        site = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}"
+        domain = f"{site.lower().replace(' ', '')[:16]}.org"
+        org = rng.choice(CONSULTANT_ORGS) if consultant else site
+        mail_domain = f"{org.lower().replace(' ', '').replace('&', '')[:14]}.com" if consultant else domain
+        posting = posted + timedelta(days=rng.randint(0, 180))
+        filings.append({
+            'hcp_number': f"{SYNTHETIC_HCP_PREFIX}{rng.randint(1, hcp_pool):07d}",
+            'application_number': f"{rng.randint(25000000, 26999999)}",
+            'site_name': site,
+            'site_address': f"{rng.randint(1, 9999)} {rng.choice(STREETS)}",
+            'site_city': f"{rng.choice(NAME_PREFIXES)} City",
+            'site_state': rng.choice(STATES),
+            'site_zip': f"{rng.randint(10000, 99999)}",
+            'contact_person_name': f"{first} {last}",
+            'contact_person_title': rng.choice(['CEO', 'IT Director', 'Office Manager', 'CFO']),
+            'contact_email_address': f"{first.lower()}.{last.lower()}@{domain}",
+            'contact_phone_number': f"{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}",
+            'mail_contact_first_name': first,
+            'mail_contact_last_name': last,
+            'mail_contact_email': f"{first[0].lower()}{last.lower()}@{mail_domain}",
+            'mail_contact_company': org,
+            'posting_date': posting.strftime('%Y-%m-%dT00:00:00.000'),
+            'form_465_date_certified': (posting - timedelta(days=rng.randint(0, 5))).strftime('%Y-%m-%dT00:00:00.000'),
+            'allowable_contract_date': (posting + timedelta(days=28)).strftime('%Y-%m-%dT00:00:00.000'),
+            'request_for_services': rng.choice(REQUEST_FOR_SERVICES),
+            'service_type': rng.choice(SERVICE_TYPES),
+            'narrative_description': f"{rng.choice(SERVICE_TYPES)} for {site}, {rng.choice([10, 50, 100, 1000])} Mbps",
+            'contract_term_months': rng.choice([12, 36, 60]),
+            'bandwidth_mbps': rng.choice([10, 50, 100, 1000]),
+        })
+    return filings
+
+
+def synthetic_funding_history(hcp_numbers, seed=2023):
+    """{hcp_number: [records newest first]} shaped like the USAC funding history lookups"""
+    rng = random.Random(seed)
+    history = {}
+    for hcp in sorted(set(hcp_numbers)):
+        years = sorted(rng.sample(range(2019, 2026), rng.choice([0, 1, 2, 3, 3, 4])), reverse=True)
+        history[hcp] = [{'hcp_number': hcp, 'funding_year': str(y),
+                         'total_approved_one_time_cost': f"{rng.randint(1, 600) * 250:.2f}"} for y in years]
+    return history
+
+
+def synthetic_template_sets(count, seed=46):
+    """generate_templates.py results ({'templates': {template_a..c}, 'metadata'}) with all placeholders"""
+    rng = random.Random(seed)
+    sets = []
+    for i in range(count):
+        templates = {}
+        for variant in 'abc':
+            sentences = rng.sample(EMAIL_SENTENCES, rng.randint(2, 5))
+            body = ("{{first_name}},\n\nI saw {{clinic_name}}'s Form 465 for {{funding_year}}.\n\n"
+                    "{{enrichment_context}}\n\n" + ' '.join(sentences) +
+                    "  We work with clinics across {{city}}, {{state}}.\n\n\n\nThanks,\nMike\n\n{{signature}}")
+            templates[f'template_{variant}'] = {'subject': rng.choice(TEMPLATE_SUBJECTS), 'body': body}
+        week = 1 + i % 52
+        sets.append({
+            'templates': templates,
+            'metadata': {
+                'version': f"week-{week}-{2025 + i // 52}",
+                'contact_type': rng.choice(['direct', 'consultant']),
+                'generated_at': (datetime(2025, 1, 6) + timedelta(weeks=i)).isoformat(),
+                'generated_by': 'claude-sonnet-4-20250514',
+                'generation_cost': round(rng.uniform(0.01, 0.02), 6),
+                'input_tokens': rng.randint(900, 1100),
+                'output_tokens': rng.randint(600, 900),
+            },
+        })
+    return sets
+
+
+# (name, text in the rendered draft, what Mike changes it to); '' means he deletes it
+SCRIPTED_EDITS = [
+    ('remove_hope_well', 'I hope this email finds you well. ', ''),
+    ('remove_dont_hesitate', " Please don't hesitate to reach out with any questions.", ''),
+    ('shorten_opening', 'I noticed {clinic} submitted a Form 465 for {year} and I wanted to reach out to introduce myself.',
+     "I saw {clinic}'s Form 465 for {year}."),
+    ('direct_cta', 'Would you have 15 minutes sometime this week to discuss how we might be able to support you?',
+     'Do you have time for a quick call this week?'),
+]
+
+
+def synthetic_edit_pairs(count, seed=45):
+    """email_instances-like rows with original_body/edited_body; 'injected' names the scripted edits applied"""
+    rng = random.Random(seed)
+    pairs = []
+    for i in range(count):
+        first = rng.choice(FIRST_NAMES)
+        clinic = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}"
+        city = f"{rng.choice(NAME_PREFIXES)} City"
+        year = rng.choice(['FY 2025', 'FY 2026'])
+        fill = {'clinic': clinic, 'year': year}
+        chosen = [e for e in SCRIPTED_EDITS if rng.random() < 0.4]
+        opening, cta = SCRIPTED_EDITS[2][1].format(**fill), SCRIPTED_EDITS[3][1]
+        middle = ' '.join(rng.sample(EMAIL_SENTENCES, rng.randint(2, 5)))
+        original = (f"{first},\n\n{SCRIPTED_EDITS[0][1]}{opening}\n\n{clinic} in {city} recently expanded "
+                    f"its telehealth program.\n\n{middle}{SCRIPTED_EDITS[1][1]}\n\n{cta}\n\nThanks,\nMike")
+        edited = original
+        for name, before, after in chosen:
+            edited = edited.replace(before.format(**fill), after.format(**fill))
+        if rng.random() < 0.3:
+            # One-off wording tweaks that should not become patterns
+            edited = edited.replace(rng.choice(middle.split()), rng.choice(['really', 'also', 'quickly']), 1)
+        pairs.append({
+            'id': f"00000000-0000-4000-8000-{i:012d}",
+            'original_body': original,
+            'edited_body': edited,
+            'clinic_name': clinic,
+            'city': city,
+            'first_name': first,
+            'injected': [name for name, _, _ in chosen],
+        })
+    return pairs
+
+
+def build_corpus(scale=1, seed=465):
+    """All corpus parts at CORPUS_BASE_SIZES * scale"""
+    emails = synthetic_emails(CORPUS_BASE_SIZES['emails'] * scale, seed=seed)
+    filings = synthetic_usac_filings(CORPUS_BASE_SIZES['filings'] * scale, seed=seed)
+    return {
+        'emails': emails,
+        'filings': filings,
+        'funding_history': synthetic_funding_history([f['hcp_number'] for f in filings], seed=seed),
+        'template_sets': synthetic_template_sets(CORPUS_BASE_SIZES['template_sets'] * scale, seed=seed),
+    }
+
+
+def write_corpus(corpus, out_dir, msg_files=True):
+    """One JSON file per part (emails.json matches extracted_emails.json) plus msg/*.msg stand-ins"""
+    os.makedirs(out_dir, exist_ok=True)
+    for name, data in corpus.items():
+        with open(os.path.join(out_dir, f"{name}.json"), 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=1, ensure_ascii=False, sort_keys=True)
+    if msg_files:
+        msg_dir = os.path.join(out_dir, 'msg')
+        os.makedirs(msg_dir, exist_ok=True)
+        for email in corpus['emails']:
+            with open(os.path.join(msg_dir, email['file']), 'wb') as f:
+                f.write(email_msg_bytes(email))
+    return out_dir
+
+
+def synthetic_clinic_rows(count, seed=465, start=0, hcp_pool=None):
+    """Rows shaped like clinics_pending_review (v4 columns), deterministic for a given seed"""
+    rng = random.Random(seed)
+    hcp_pool = hcp_pool or max(count // 3, 1)
+    today = datetime(2025, 11, 17)
+    rows = []
+    for i in range(start, start + count):
+        # A few HCPs file several applications, like the real data
+        hcp = f"{SYNTHETIC_HCP_PREFIX}{rng.randint(1, hcp_pool):07d}"
+        consultant = rng.random() < 0.35
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        clinic_name = f"{rng.choice(NAME_PREFIXES)} {rng.choice(NAME_SUFFIXES)}"
+        state = rng.choice(STATES)
+        city = f"{rng.choice(NAME_PREFIXES)} City"
+        address = f"{rng.randint(1, 9999)} {rng.choice(STREETS)}"
+        filing_date = today - timedelta(days=rng.randint(0, 365), minutes=rng.randint(0, 1440))
+        domain = f"{clinic_name.lower().replace(' ', '')[:16]}.org"
+        org_domain = 'rhcpartners.com' if consultant else domain
+        funding_years = rng.sample(['2022', '2023', '2024', '2025'], rng.randint(0, 3))
+        rows.append({
+            'hcp_number': hcp,
+            'application_number': f"{rng.randint(25000000, 26999999)}",
+            'clinic_name': clinic_name,
+            'address': address,
+            'city': city,
+            'state': state,
+            'zip': f"{rng.randint(10000, 99999)}",
+            'contact_phone': f"{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}",
+            'contact_email': f"{first.lower()}.{last.lower()}@{domain}",
+            'mail_contact_first_name': first,
+            'mail_contact_last_name': last,
+            'mail_contact_org_name': rng.choice(CONSULTANT_ORGS) if consultant else clinic_name,
+            'mail_contact_phone': f"{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}",
+            'mail_contact_email': f"{first[0].lower()}{last.lower()}@{org_domain}",
+            'mail_contact_is_consultant': consultant,
+            'contact_is_consultant': False,
+            'filing_date': filing_date.isoformat(),
+            'form_465_hash': hashlib.sha256(f"{hcp}-{i}-{seed}".encode('utf-8')).hexdigest(),
+            'funding_year': rng.choice(['2025', '2026']),
+            'application_type': rng.choice(['New', 'Renewal']),
+            'request_for_services': rng.choice(REQUEST_FOR_SERVICES),
+            'service_type': rng.choice(SERVICE_TYPES),
+            'historical_funding': json.dumps([
+                {'year': y, 'amount': rng.randint(5, 400) * 1000} for y in sorted(funding_years)
+            ]),
+            'processed': rng.random() < 0.2,
+            'notes': '[]',
+        })
+    return rows
+
+
+def require_local_database(conn, allow_remote=False):
+    """Refuse to write synthetic clinics unless conn points at a local Postgres (or allow_remote)
+
+    With no POSTGRES_URL, db_utils resolves the Supabase project from dashboard/.env.local,
+    i.e. the live dashboard.
+    """
+    host = conn.info.host or 'localhost'
+    if allow_remote or host in LOCAL_DB_HOSTS or host.startswith('/'):
+        return
+    raise RuntimeError(f"Refusing to write synthetic clinics to {host}: not a local database "
+                       f"(point POSTGRES_URL at the local stack or pass --allow-remote)")
+
+
+def seed_clinics(conn, count, seed=465, chunk=5000, allow_remote=False):
+    """Insert `count` synthetic clinics in chunks; returns rows inserted"""
+    import db_utils
+    require_local_database(conn, allow_remote)
+    inserted = 0
+    for start in range(0, count, chunk):
+        rows = synthetic_clinic_rows(min(chunk, count - start), seed=seed + start, start=start,
+                                     hcp_pool=max(count // 3, 1))
+        inserted += db_utils.bulk_insert(conn, db_utils.CLINICS_TABLE, rows, list(rows[0].keys()),
+                                         on_conflict='(form_465_hash) DO NOTHING')
+    return inserted
+
+
+def clear_clinics(conn, allow_remote=False):
+    import db_utils
+    require_local_database(conn, allow_remote)
+    with conn.cursor() as cur:
+        cur.execute(f"DELETE FROM {db_utils.CLINICS_TABLE} WHERE hcp_number LIKE %s",
+                    (SYNTHETIC_HCP_PREFIX + '%',))
+        deleted = cur.rowcount
+    conn.commit()
+    return deleted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Deterministic synthetic data for local benchmarks')
+    sub = parser.add_subparsers(dest='command', required=True)
+    seed = sub.add_parser('seed-clinics', help='Insert synthetic clinics into the local database')
+    seed.add_argument('--count', type=int, default=10000)
+    seed.add_argument('--seed', type=int, default=465)
+    seed.add_argument('--replace', action='store_true', help='Clear earlier synthetic clinics first')
+    clear = sub.add_parser('clear-clinics', help='Delete all synthetic clinics')
+    for command in (seed, clear):
+        command.add_argument('--allow-remote', action='store_true',
+                             help='Write even if the database is not on localhost')
+    corpus = sub.add_parser('corpus', help='Write a benchmark corpus (emails, filings, funding history, templates)')
+    corpus.add_argument('--scale', type=int, default=1, help=f"Multiple of {CORPUS_BASE_SIZES}")
+    corpus.add_argument('--seed', type=int, default=465)
+    corpus.add_argument('--out', default=os.path.join('data', 'synthetic'))
+    args = parser.parse_args()
+
+    if args.command == 'corpus':
+        out_dir = write_corpus(build_corpus(args.scale, args.seed), os.path.join(args.out, f"x{args.scale}"))
+        print(f"[OK] Corpus x{args.scale} written to {out_dir}")
+        return
+
+    import db_utils
+    conn = db_utils.get_connection()
+    try:
+        require_local_database(conn, args.allow_remote)
+        if args.command == 'clear-clinics' or getattr(args, 'replace', False):
+            print(f"[OK] Deleted {clear_clinics(conn, args.allow_remote)} synthetic clinics")
+        if args.command == 'seed-clinics':
+            print(f"[OK] Inserted {seed_clinics(conn, args.count, args.seed, allow_remote=args.allow_remote)} "
+                  f"synthetic clinics")
+    except RuntimeError as e:
+        print(f"[ERROR] {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
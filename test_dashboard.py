@@ -1,24 +1,256 @@
-from playwright.sync_api import sync_playwright
-import time
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import os
 import sys
+import json
+import time
+import argparse
+from datetime import datetime
+
+import bench_utils
 
 # Fix Windows console encoding
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-def test_dashboard():
+SCREENSHOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'screenshots')
+REPORT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_reports')
+DEFAULT_URL = 'http://localhost:3000'
+
+# Supabase REST calls the dashboard makes for the clinic list (use-clinics.ts)
+CLINICS_QUERY_MARKER = '/rest/v1/clinics_pending_review'
+
+# Collects LCP and CLS from the first paint on; read back with window.__perf
+PERF_OBSERVER_SCRIPT = """
+window.__perf = { lcp: null, cls: 0 };
+new PerformanceObserver((list) => {
+  const entries = list.getEntries();
+  window.__perf.lcp = entries[entries.length - 1].startTime;
+}).observe({ type: 'largest-contentful-paint', buffered: true });
+new PerformanceObserver((list) => {
+  for (const entry of list.getEntries()) {
+    if (!entry.hadRecentInput) window.__perf.cls += entry.value;
+  }
+}).observe({ type: 'layout-shift', buffered: true });
+"""
+
+
+def screenshot(page, name):
+    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+    page.screenshot(path=os.path.join(SCREENSHOT_DIR, name), full_page=True)
+
+
+def wait_for_paint(page):
+    """Resolve after the next two animation frames (the DOM update has been painted)"""
+    page.evaluate("() => new Promise(r => requestAnimationFrame(() => requestAnimationFrame(r)))")
+
+
+def wait_for_ui(page, timeout=10000):
+    """Event-based replacement for fixed sleeps: network quiet, then a painted frame"""
+    try:
+        page.wait_for_load_state('networkidle', timeout=timeout)
+    except PlaywrightTimeoutError:
+        pass
+    wait_for_paint(page)
+
+
+def is_clinics_query(response):
+    return CLINICS_QUERY_MARKER in response.url and response.request.method == 'GET'
+
+
+class StepRecorder:
+    """Per-step timing, JS heap and Supabase query counts for one page"""
+
+    def __init__(self, page):
+        self.page = page
+        self.steps = []
+        self.queries = 0
+        self.cdp = page.context.new_cdp_session(page)
+        self.cdp.send('Performance.enable')
+        page.on('request', self._on_request)
+
+    def _on_request(self, request):
+        if '/rest/v1/' in request.url:
+            self.queries += 1
+
+    def metrics(self):
+        values = {m['name']: m['value'] for m in self.cdp.send('Performance.getMetrics')['metrics']}
+        return {'js_heap_used_bytes': int(values.get('JSHeapUsedSize', 0)),
+                'dom_nodes': int(values.get('Nodes', 0))}
+
+    def timed(self, name, action, expect_query=False, timeout=30000):
+        """Run action, wait for the clinics query (if expected) and the next paint, record the latency"""
+        queries_before = self.queries
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            if expect_query:
+                with self.page.expect_response(is_clinics_query, timeout=timeout):
+                    action()
+            else:
+                action()
+        except PlaywrightTimeoutError:
+            timed_out = True
+        wait_for_paint(self.page)
+        step = {
+            'step': name,
+            'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+            'queries': self.queries - queries_before,
+            'timed_out': timed_out,
+        }
+        step.update(self.metrics())
+        self.steps.append(step)
+        return step
+
+
+def load_dashboard(page, recorder, url):
+    """Navigate and wait for the first clinics query to render; returns navigation timing + vitals"""
+    recorder.timed('initial_load', lambda: page.goto(url, wait_until='load'), expect_query=True)
+    page.locator('input[placeholder="Search all fields..."]').wait_for(state='visible')
+    wait_for_paint(page)
+    navigation = page.evaluate("""() => {
+        const n = performance.getEntriesByType('navigation')[0];
+        return {
+            ttfb_ms: n.responseStart - n.requestStart,
+            dom_content_loaded_ms: n.domContentLoadedEventEnd,
+            load_event_ms: n.loadEventEnd,
+            transfer_bytes: n.transferSize,
+        };
+    }""")
+    vitals = page.evaluate("() => window.__perf")
+    return {k: round(v, 1) if isinstance(v, float) else v for k, v in navigation.items()}, {
+        'lcp_ms': round(vitals['lcp'], 1) if vitals and vitals['lcp'] is not None else None,
+        'cls': round(vitals['cls'], 4) if vitals else None,
+    }
+
+
+def run_scenario(page, recorder, rng=None, search_terms=('clinic', 'medical', 'valley')):
+    """View switch / status filter / search / notes scenario used by benchmark and load modes
+
+    With an rng, the search term and the order of status filters are randomized per run.
+    """
+    for mode in ('List', 'Compact', 'Map', 'Grid'):
+        button = page.locator(f'button[title="{mode} View"]').first
+        if button.is_visible():
+            recorder.timed(f'view_{mode.lower()}', button.click)
+
+    statuses = ['Pending', 'Done', 'Has Notes']
+    if rng is not None:
+        rng.shuffle(statuses)
+    for status in statuses + ['All']:
+        button = page.locator('button', has_text=status).first
+        if button.is_visible():
+            recorder.timed(f'filter_{status.lower().replace(" ", "_")}', button.click, expect_query=True)
+
+    search_input = page.locator('input[placeholder="Search all fields..."]').first
+    if search_input.is_visible():
+        term = rng.choice(search_terms) if rng is not None else search_terms[0]
+        # Includes the 500ms debounce in ClinicList before the query fires
+        recorder.timed('search', lambda: search_input.fill(term), expect_query=True)
+        recorder.timed('search_clear', search_input.clear, expect_query=True)
+
+    notes_button = page.locator('button:has-text("View Notes")').first
+    if notes_button.is_visible():
+        recorder.timed('notes_open', lambda: (notes_button.click(),
+                                              page.locator('[role="dialog"]').wait_for(state='visible')))
+        recorder.timed('notes_close', lambda: page.keyboard.press('Escape'))
+
+
+def summarize_steps(runs):
+    """Per-step latency percentiles and max heap across runs"""
+    by_step = {}
+    for run in runs:
+        for step in run['steps']:
+            entry = by_step.setdefault(step['step'], {'latencies': [], 'heap': [], 'queries': []})
+            entry['latencies'].append(step['latency_ms'])
+            entry['heap'].append(step['js_heap_used_bytes'])
+            entry['queries'].append(step['queries'])
+    return {name: {**bench_utils.latency_summary(e['latencies']),
+                   'max_js_heap_mb': round(max(e['heap']) / 1024 / 1024, 1),
+                   'avg_queries': round(sum(e['queries']) / len(e['queries']), 2)}
+            for name, e in by_step.items()}
+
+
+def compare_reports(report, baseline_path):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n📊 Compared with {baseline.get('build')} ({baseline_path})")
+    for step, stats in report['summary'].items():
+        before = baseline.get('summary', {}).get(step)
+        if not before:
+            continue
+        delta = stats['p50_ms'] - before['p50_ms']
+        pct = delta / before['p50_ms'] * 100 if before['p50_ms'] else 0
+        print(f"   {step:<20} p50 {before['p50_ms']:>8}ms -> {stats['p50_ms']:>8}ms ({pct:+.1f}%)")
+
+
+def benchmark_dashboard(url=DEFAULT_URL, runs=3, headless=True, seed_clinics=0, report_path=None,
+                        baseline_path=None, allow_remote=False):
+    """Headless timing run: navigation timing, LCP/CLS, interaction latency and JS heap per step"""
+    if seed_clinics:
+        import db_utils
+        import synthetic_data
+        conn = db_utils.get_connection()
+        try:
+            synthetic_data.clear_clinics(conn, allow_remote=allow_remote)
+            synthetic_data.seed_clinics(conn, seed_clinics, allow_remote=allow_remote)
+        finally:
+            conn.close()
+        print(f"🌱 Seeded {seed_clinics:,} synthetic clinics")
+
+    results = []
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)  # Visual mode for testing
+        browser = p.chromium.launch(headless=headless)
+        for run in range(runs):
+            context = browser.new_context(viewport={'width': 1440, 'height': 900})
+            context.add_init_script(PERF_OBSERVER_SCRIPT)
+            page = context.new_page()
+            recorder = StepRecorder(page)
+            navigation, vitals = load_dashboard(page, recorder, url)
+            run_scenario(page, recorder)
+            results.append({'run': run + 1, 'navigation': navigation, 'vitals': vitals, 'steps': recorder.steps})
+            print(f"⏱️  Run {run + 1}/{runs}: load {recorder.steps[0]['latency_ms']}ms, "
+                  f"LCP {vitals['lcp_ms']}ms, CLS {vitals['cls']}")
+            context.close()
+        browser.close()
+
+    report = {
+        'build': bench_utils.git_build_id(),
+        'url': url,
+        'generated_at': datetime.now().isoformat(),
+        'seeded_clinics': seed_clinics or None,
+        'runs': results,
+        'summary': summarize_steps(results),
+    }
+    os.makedirs(REPORT_DIR, exist_ok=True)
+    report_path = report_path or os.path.join(
+        REPORT_DIR, f"dashboard_{report['build'] or 'local'}_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n" + "=" * 60)
+    for step, stats in report['summary'].items():
+        print(f"   {step:<20} p50 {stats['p50_ms']:>8}ms  p95 {stats['p95_ms']:>8}ms  "
+              f"heap {stats['max_js_heap_mb']:>6}MB  queries {stats['avg_queries']}")
+    print("=" * 60)
+    print(f"📄 Report saved to: {report_path}")
+    if baseline_path:
+        compare_reports(report, baseline_path)
+    return report
+
+
+def test_dashboard(url=DEFAULT_URL, headless=False):
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=headless)  # Visual mode for testing
         page = browser.new_page()
 
         print("🚀 Starting USAC RHC Dashboard Test Suite\n")
 
         # 1. Load Dashboard
         print("1️⃣ Loading dashboard...")
-        page.goto('http://localhost:3000')
-        page.wait_for_load_state('networkidle')
-        time.sleep(2)  # Allow React to hydrate
-        page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/01_initial_load.png', full_page=True)
+        page.goto(url)
+        page.locator('input[placeholder*="Search"]').first.wait_for(state='visible')  # React hydrated
+        wait_for_ui(page)
+        screenshot(page, '01_initial_load.png')
         print("   ✅ Dashboard loaded successfully\n")
 
         # 2. Check for all filters
@@ -59,7 +291,7 @@ def test_dashboard():
         if view_toggle.is_visible():
             print("   ✅ View mode toggle found")
 
-        page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/02_filters_visible.png', full_page=True)
+        screenshot(page, '02_filters_visible.png')
         print()
 
         # 3. Test Dark Mode Toggle
@@ -67,13 +299,13 @@ def test_dashboard():
         dark_mode_button = page.locator('button').filter(has_text='☀️').or_(page.locator('button').filter(has_text='🌙')).first
         if dark_mode_button.is_visible():
             dark_mode_button.click()
-            time.sleep(1)
-            page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/03_dark_mode_on.png', full_page=True)
+            wait_for_ui(page)
+            screenshot(page, '03_dark_mode_on.png')
             print("   ✅ Dark mode toggled ON")
 
             dark_mode_button.click()
-            time.sleep(1)
-            page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/04_dark_mode_off.png', full_page=True)
+            wait_for_ui(page)
+            screenshot(page, '04_dark_mode_off.png')
             print("   ✅ Dark mode toggled OFF")
         print()
 
@@ -81,16 +313,15 @@ def test_dashboard():
         print("4️⃣ Testing view modes (Grid/List/Compact/Map)...")
 
         # Try to find view mode buttons
-        view_buttons = page.locator('button').all()
         view_mode_texts = ['Grid', 'List', 'Compact', 'Map']
 
         for mode in view_mode_texts:
             try:
-                mode_button = page.locator(f'button:has-text("{mode}")').first
+                mode_button = page.locator(f'button[title="{mode} View"], button:has-text("{mode}")').first
                 if mode_button.is_visible():
                     mode_button.click()
-                    time.sleep(2)
-                    page.screenshot(path=f'C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/05_{mode.lower()}_view.png', full_page=True)
+                    wait_for_ui(page)
+                    screenshot(page, f'05_{mode.lower()}_view.png')
                     print(f"   ✅ {mode} view working")
             except:
                 print(f"   ⚠️  {mode} view button not found")
@@ -98,10 +329,10 @@ def test_dashboard():
 
         # Switch back to Grid view
         try:
-            grid_button = page.locator('button:has-text("Grid")').first
+            grid_button = page.locator('button[title="Grid View"], button:has-text("Grid")').first
             if grid_button.is_visible():
                 grid_button.click()
-                time.sleep(1)
+                wait_for_ui(page)
         except:
             pass
 
@@ -109,12 +340,16 @@ def test_dashboard():
         print("5️⃣ Testing search functionality and highlighting...")
         search_input = page.locator('input[placeholder*="Search"]').first
         if search_input.is_visible():
-            search_input.fill('clinic')
-            time.sleep(2)
-            page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/06_search_highlight.png', full_page=True)
+            try:
+                with page.expect_response(is_clinics_query, timeout=10000):
+                    search_input.fill('clinic')
+            except PlaywrightTimeoutError:
+                pass
+            wait_for_ui(page)
+            screenshot(page, '06_search_highlight.png')
             print("   ✅ Search with highlighting tested")
             search_input.clear()
-            time.sleep(1)
+            wait_for_ui(page)
         print()
 
         # 6. Test State Filter
@@ -123,13 +358,13 @@ def test_dashboard():
             state_button = page.locator('text=Select State').first
             if state_button.is_visible():
                 state_button.click()
-                time.sleep(1)
                 # Try to select a state
                 arizona = page.locator('text=Arizona').first
+                arizona.wait_for(state='visible', timeout=3000)
                 if arizona.is_visible():
                     arizona.click()
-                    time.sleep(2)
-                    page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/07_state_filter.png', full_page=True)
+                    wait_for_ui(page)
+                    screenshot(page, '07_state_filter.png')
                     print("   ✅ State filter working")
         except:
             print("   ⚠️  State filter interaction failed")
@@ -142,23 +377,24 @@ def test_dashboard():
             view_notes_button = page.locator('button:has-text("View Notes")').first
             if view_notes_button.is_visible(timeout=3000):
                 view_notes_button.click()
-                time.sleep(2)
-                page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/08_notes_modal.png', full_page=True)
+                page.locator('[role="dialog"]').wait_for(state='visible')
+                wait_for_ui(page)
+                screenshot(page, '08_notes_modal.png')
                 print("   ✅ Notes modal opened")
 
                 # Look for timeline toggle
                 timeline_toggle = page.locator('button:has-text("Timeline")').first
                 if timeline_toggle.is_visible():
                     timeline_toggle.click()
-                    time.sleep(1)
-                    page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/09_timeline_view.png', full_page=True)
+                    wait_for_ui(page)
+                    screenshot(page, '09_timeline_view.png')
                     print("   ✅ Timeline view working")
 
                 # Close modal
                 close_button = page.locator('button').filter(has_text='×').or_(page.locator('button[aria-label="Close"]')).first
                 if close_button.is_visible():
                     close_button.click()
-                    time.sleep(1)
+                    page.locator('[role="dialog"]').wait_for(state='hidden')
             else:
                 print("   ℹ️  No clinic cards with notes available to test")
         except Exception as e:
@@ -167,13 +403,13 @@ def test_dashboard():
 
         # 8. Test Status Filters
         print("8️⃣ Testing status filter buttons...")
-        status_filters = ['All', 'Pending', 'Contacted', 'Qualified']
+        status_filters = ['All', 'Pending', 'Done', 'Has Notes']
         for status in status_filters:
             try:
                 status_btn = page.locator(f'button:has-text("{status}")').first
                 if status_btn.is_visible():
                     status_btn.click()
-                    time.sleep(1)
+                    wait_for_ui(page)
                     print(f"   ✅ {status} status filter working")
             except:
                 print(f"   ⚠️  {status} status filter not found")
@@ -181,7 +417,7 @@ def test_dashboard():
 
         # 9. Check Animations
         print("9️⃣ Checking for smooth animations...")
-        page.screenshot(path='C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/10_final_state.png', full_page=True)
+        screenshot(page, '10_final_state.png')
         print("   ✅ Final state captured")
         print()
 
@@ -195,8 +431,7 @@ def test_dashboard():
 
         page.on('console', handle_console)
         page.reload()
-        page.wait_for_load_state('networkidle')
-        time.sleep(2)
+        wait_for_ui(page)
 
         if console_messages:
             print("   ⚠️  Console messages found:")
@@ -209,9 +444,31 @@ def test_dashboard():
         print("=" * 60)
         print("✅ TEST SUITE COMPLETE")
         print("=" * 60)
-        print(f"\n📸 Screenshots saved to: C:/ClaudeAgents/projects/usac-rhc-automation/screenshots/")
+        print(f"\n📸 Screenshots saved to: {SCREENSHOT_DIR}")
 
         browser.close()
 
+
 if __name__ == '__main__':
-    test_dashboard()
+    parser = argparse.ArgumentParser(description='USAC RHC dashboard UI test / benchmark')
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--headless', action='store_true', help='Run the visual suite headless')
+    parser.add_argument('--benchmark', action='store_true', help='Headless timing run with a JSON report')
+    parser.add_argument('--runs', type=int, default=3, help='Benchmark runs (fresh context each)')
+    parser.add_argument('--seed-clinics', type=int, default=0,
+                        help='Replace synthetic clinics with N rows first (local stack only, e.g. 10000/50000)')
+    parser.add_argument('--allow-remote', action='store_true',
+                        help='Let --seed-clinics write to a database that is not on localhost')
+    parser.add_argument('--report', help='Benchmark report path (default: benchmark_reports/)')
+    parser.add_argument('--compare', help='Earlier benchmark report to diff p50 latencies against')
+    parser.add_argument('--client-aggregation', action='store_true',
+                        help='Aggregate clinics in the browser instead of reading clinic_hcp_aggregates (baseline)')
+    args = parser.parse_args()
+    if args.client_aggregation:
+        args.url += ('&' if '?' in args.url else '?') + 'aggregation=client'
+
+    if args.benchmark:
+        benchmark_dashboard(args.url, runs=args.runs, seed_clinics=args.seed_clinics,
+                            report_path=args.report, baseline_path=args.compare, allow_remote=args.allow_remote)
+    else:
+        test_dashboard(args.url, headless=args.headless)
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Stage-level tracing for the Python pipeline
+Purpose: Per-run performance history (wall/CPU time, peak RSS, items, custom counters) as JSON lines
+
+In a script:
+
+    import tracing
+
+    tracing.configure('extract_emails', profile=args.profile)
+    with tracing.span('parse_messages', profile=True) as s:   # profile=True marks the hot stage
+        for path in files:
+            ...
+            s.items += 1
+            s.count('errors')
+
+    @tracing.traced('call_api')
+    def call_api(...):
+        tracing.count('input_tokens', usage.input_tokens)     # adds to the innermost open span
+
+Each finished span appends one line to .traces/<script>.jsonl. With --profile, spans
+marked profile=True are also run under cProfile (or pyinstrument) and the dump path is
+recorded on the span line.
+
+Usage:
+  python tracing.py summary .traces/generate_templates.jsonl
+  python tracing.py diff .traces/extract_emails.jsonl        # last run vs the one before
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import functools
+import contextvars
+from datetime import datetime
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    HAS_RESOURCE = False
+
+try:
+    import psutil
+    HAS_PSUTIL = True
+except ImportError:
+    HAS_PSUTIL = False
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+DEFAULT_TRACE_DIR = '.traces'
+PROFILERS = ('cprofile', 'pyinstrument')
+
+_current_span = contextvars.ContextVar('tracing_current_span', default=None)
+
+
+def peak_rss_mb():
+    """Process high-water RSS in MB (None where neither resource nor psutil is available)"""
+    if HAS_RESOURCE:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+    if HAS_PSUTIL:
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / (1024 * 1024), 1)
+    return None
+
+
+class Tracer:
+    """Writes finished spans for one script run to a JSON-lines file"""
+
+    def __init__(self, script=None, path=None, profile=None, enabled=True):
+        self.script = script or os.path.splitext(os.path.basename(sys.argv[0] or 'python'))[0]
+        self.run_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+        self.path = path or os.path.join(DEFAULT_TRACE_DIR, f"{self.script}.jsonl")
+        self.profile = profile
+        self.enabled = enabled
+
+    def emit(self, record):
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + '\n')
+
+    def profile_path(self, span_name, ext):
+        directory = os.path.join(os.path.dirname(self.path) or '.', 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, f"{self.script}_{span_name}_{self.run_id}.{ext}")
+
+
+# Unconfigured scripts still time spans but write nothing
+_tracer = Tracer(enabled=False)
+
+
+def configure(script, path=None, profile=None):
+    """Start a traced run for `script`; profile is None, 'cprofile' or 'pyinstrument'"""
+    global _tracer
+    _tracer = Tracer(script, path=path, profile=profile)
+    return _tracer
+
+
+def add_profile_argument(parser):
+    """--profile [cprofile|pyinstrument] for the scripts' argparse parsers"""
+    parser.add_argument('--profile', nargs='?', const='cprofile', choices=PROFILERS,
+                        help='Also profile the hot stage (dump goes to .traces/profiles/)')
+
+
+class Span:
+    """One timed stage; use through span() / traced()"""
+
+    def __init__(self, name, items=0, profile=False, **attrs):
+        self.name = name
+        self.items = items
+        self.counters = {}
+        self.attrs = attrs
+        self.wants_profile = profile
+        self.parent = None
+        self.wall_s = self.cpu_s = 0.0
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def _start_profiler(self):
+        if not (self.wants_profile and _tracer.profile):
+            return None
+        if _tracer.profile == 'pyinstrument':
+            try:
+                import pyinstrument
+            except ImportError:
+                print("[WARNING] pyinstrument not installed, falling back to cProfile")
+            else:
+                profiler = pyinstrument.Profiler()
+                profiler.start()
+                return profiler
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler
+
+    def _stop_profiler(self, profiler):
+        if profiler is None:
+            return None
+        if hasattr(profiler, 'output_html'):
+            profiler.stop()
+            path = _tracer.profile_path(self.name, 'html')
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(profiler.output_html())
+        else:
+            profiler.disable()
+            path = _tracer.profile_path(self.name, 'prof')
+            profiler.dump_stats(path)
+        return path
+
+    def __enter__(self):
+        parent = _current_span.get()
+        self.parent = parent.name if parent else None
+        self._token = _current_span.set(self)
+        self._started_at = datetime.now()
+        self._rss_before = peak_rss_mb()
+        self._profiler = self._start_profiler()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wall_s = time.perf_counter() - self._wall
+        self.cpu_s = time.process_time() - self._cpu
+        profile_file = self._stop_profiler(self._profiler)
+        _current_span.reset(self._token)
+        rss = peak_rss_mb()
+        record = {
+            'run_id': _tracer.run_id,
+            'script': _tracer.script,
+            'span': self.name,
+            'parent': self.parent,
+            'started_at': self._started_at.isoformat(),
+            'wall_s': round(self.wall_s, 4),
+            'cpu_s': round(self.cpu_s, 4),
+            'peak_rss_mb': rss,
+            'rss_growth_mb': round(rss - self._rss_before, 1) if rss is not None else None,
+            'items': self.items,
+            'items_per_s': round(self.items / self.wall_s, 2) if self.items and self.wall_s else None,
+            'counters': self.counters,
+        }
+        if self.attrs:
+            record['attrs'] = self.attrs
+        if profile_file:
+            record['profile'] = profile_file
+        if exc_type is not None:
+            record['error'] = f"{exc_type.__name__}: {exc}"
+        _tracer.emit(record)
+        return False
+
+
+def span(name, items=0, profile=False, **attrs):
+    """Context manager timing one stage"""
+    return Span(name, items=items, profile=profile, **attrs)
+
+
+def traced(name=None, profile=False):
+    """Decorator form of span(); the span is named after the function by default"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name or func.__name__, profile=profile):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    return _current_span.get()
+
+
+def count(name, value=1):
+    """Add to a counter on the innermost open span (no-op outside a span)"""
+    s = _current_span.get()
+    if s is not None:
+        s.count(name, value)
+
+
+def add_items(n=1):
+    s = _current_span.get()
+    if s is not None:
+        s.items += n
+
+
+def load_runs(path):
+    """{run_id: [span records]} in file order"""
+    runs = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                runs.setdefault(record['run_id'], []).append(record)
+    return runs
+
+
+def print_summary(path, last=5):
+    runs = load_runs(path)
+    for run_id, spans in list(runs.items())[-last:]:
+        print(f"\n[RUN] {run_id}")
+        for s in spans:
+            extra = ' '.join(f"{k}={v}" for k, v in s['counters'].items())
+            print(f"   {s['span']:<28} wall {s['wall_s']:>9.3f}s  cpu {s['cpu_s']:>9.3f}s  "
+                  f"rss {s['peak_rss_mb']}MB  items {s['items']}  {extra}")
+
+
+def print_diff(path):
+    """Compare the last run's spans with the previous run's"""
+    runs = list(load_runs(path).items())
+    if len(runs) < 2:
+        print("[INFO] Need at least two runs to diff")
+        return
+    (old_id, old_spans), (new_id, new_spans) = runs[-2], runs[-1]
+    old_by_name = {s['span']: s for s in old_spans}
+    print(f"[DIFF] {old_id} -> {new_id}")
+    for s in new_spans:
+        before = old_by_name.get(s['span'])
+        if not before:
+            print(f"   {s['span']:<28} new span, wall {s['wall_s']:.3f}s")
+            continue
+        delta = s['wall_s'] - before['wall_s']
+        pct = delta / before['wall_s'] * 100 if before['wall_s'] else 0
+        print(f"   {s['span']:<28} wall {before['wall_s']:>9.3f}s -> {s['wall_s']:>9.3f}s ({pct:+.1f}%)  "
+              f"cpu {before['cpu_s']:.3f}s -> {s['cpu_s']:.3f}s  rss {before['peak_rss_mb']} -> {s['peak_rss_mb']}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect pipeline trace files')
+    sub = parser.add_subparsers(dest='command', required=True)
+    summary = sub.add_parser('summary', help='Span table for the most recent runs')
+    summary.add_argument('path')
+    summary.add_argument('--last', type=int, default=5)
+    diff = sub.add_parser('diff', help='Last run vs the previous run')
+    diff.add_argument('path')
+    args = parser.parse_args()
+
+    if args.command == 'summary':
+        print_summary(args.path, args.last)
+    else:
+        print_diff(args.path)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,14 @@
 import json
 import re
 import sys
+import argparse
+
+import tracing
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
+@tracing.traced(profile=True)
 def analyze_voice_profile(emails_file):
     """Analyze Mike's writing style from extracted emails"""
 
@@ -13,6 +17,8 @@ def analyze_voice_profile(emails_file):
 
     # Filter to only Mike's emails (sent by him)
     mikes_emails = [e for e in emails if 'Michael Hyams' in e.get('sender', '')]
+    tracing.add_items(len(emails))
+    tracing.count('sent_by_mike', len(mikes_emails))
 
     print(f"=" * 70)
     print(f"VOICE PROFILE ANALYSIS FOR MIKE HYAMS")
@@ -38,6 +44,7 @@ def analyze_voice_profile(emails_file):
         if len(mike_text.strip()) > 50:  # Only substantial text
             mikes_text.append(mike_text.strip())
 
+    tracing.count('bodies', len(mikes_text))
     print(f"✅ Extracted {len(mikes_text)} email bodies (Mike's actual writing)\n")
 
     # OPENING LINES
@@ -84,6 +91,7 @@ def analyze_voice_profile(emails_file):
 
     sentences = re.split(r'[.!?]+', all_text)
     sentences = [s.strip() for s in sentences if len(s.strip()) > 5]
+    tracing.count('sentences', len(sentences))
 
     word_counts = [len(s.split()) for s in sentences]
     avg_words = sum(word_counts) / len(word_counts) if word_counts else 0
@@ -249,12 +257,19 @@ AVOID:
     }
 
 if __name__ == '__main__':
-    emails_file = r"C:\ClaudeAgents\projects\usac-rhc-automation\extracted_emails.json"
-    profile = analyze_voice_profile(emails_file)
+    parser = argparse.ArgumentParser(description="Build Mike's voice profile from extracted emails")
+    parser.add_argument('--emails', default=r"C:\ClaudeAgents\projects\usac-rhc-automation\extracted_emails.json")
+    parser.add_argument('--output', default=r"C:\ClaudeAgents\projects\usac-rhc-automation\mike_voice_profile.json")
+    tracing.add_profile_argument(parser)
+    args = parser.parse_args()
+    tracing.configure('voice_analysis', profile=args.profile)
+
+    profile = analyze_voice_profile(args.emails)
 
     # Save voice profile
-    output_file = r"C:\ClaudeAgents\projects\usac-rhc-automation\mike_voice_profile.json"
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(profile, f, indent=2)
+    output_file = args.output
+    with tracing.span('save_profile'):
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, indent=2)
 
     print(f"\n✅ Voice profile saved to: {output_file}")
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Voice Conformance Scoring
+Purpose: Fast local check of generated A/B/C templates against mike_voice_profile.json and the
+rules in the generate_templates.py prompt, so candidates can be ranked without another API call.
+
+Each template starts at 1.0 and loses points for:
+- avoid_phrases found in the subject or body
+- average sentence length away from avg_sentence_length (measured the way voice_analysis.py does)
+- missing required placeholders, unknown placeholders, or leftover "[body]"-style brackets
+- a subject outside 3-5 words
+
+Usage:
+  python voice_conformance.py templates_week-46-2025_direct.json
+  python voice_conformance.py --snapshot data/snapshots      # every email_templates row in a snapshot
+"""
+
+import re
+import sys
+import json
+import argparse
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+VOICE_PROFILE_FILE = 'mike_voice_profile.json'
+DEFAULT_THRESHOLD = 0.85
+
+# Placeholders the renderer fills; anything else would go out literally
+KNOWN_PLACEHOLDERS = {'clinic_name', 'first_name', 'funding_year', 'enrichment_context', 'city', 'state', 'signature'}
+REQUIRED_PLACEHOLDERS = ('first_name', 'clinic_name', 'enrichment_context', 'signature')
+SUBJECT_WORDS = (3, 5)
+
+PENALTIES = {
+    'avoid_phrase': 0.25,        # per hit
+    'sentence_length': 0.30,     # scaled by relative deviation, capped at 1
+    'missing_placeholder': 0.20,  # per placeholder
+    'unknown_placeholder': 0.20,  # per placeholder
+    'unfilled_bracket': 0.30,
+    'subject_length': 0.15,
+}
+
+PLACEHOLDER_RE = re.compile(r'\{\{\s*(\w+)\s*\}\}')
+PLACEHOLDER_LINE_RE = re.compile(r'^\s*\{\{\s*\w+\s*\}\}\s*$', re.MULTILINE)
+BRACKET_RE = re.compile(r'\[[^\]\n]{2,40}\]')
+# A placeholder counts as one word; bare punctuation like "-" counts as none
+SUBJECT_WORD_RE = re.compile(r"\{\{\s*\w+\s*\}\}|\w+(?:['’]\w+)*")
+
+
+def load_profile(path=VOICE_PROFILE_FILE):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def sentence_lengths(body):
+    """Words per sentence, split like voice_analysis.py; lines holding only a placeholder are skipped"""
+    text = PLACEHOLDER_LINE_RE.sub('', body)
+    sentences = [s.strip() for s in re.split(r'[.!?]+', text)]
+    return [len(s.split()) for s in sentences if len(s) > 5]
+
+
+class ConformanceScorer:
+    """Scores one template dict ({subject, body}) against a voice profile"""
+
+    def __init__(self, profile, penalties=PENALTIES):
+        self.penalties = penalties
+        self.target_length = float(profile['avg_sentence_length'])
+        # Whole words only, so "As per" does not match inside "has personnel"; lookarounds act like
+        # \b...\b but also hold for mined phrases that start or end with punctuation
+        self.avoid = [(p, re.compile(r'(?<!\w)' + re.escape(p) + r'(?!\w)', re.IGNORECASE))
+                      for p in profile.get('avoid_phrases', [])]
+
+    def score(self, template):
+        """(score in [0, 1], [issue strings])"""
+        subject = template.get('subject') or ''
+        body = template.get('body') or ''
+        issues = []
+        penalty = 0.0
+
+        text = f"{subject}\n{body}"
+        for phrase, pattern in self.avoid:
+            hits = len(pattern.findall(text))
+            if hits:
+                penalty += self.penalties['avoid_phrase'] * hits
+                issues.append(f"avoid phrase: {phrase!r}")
+
+        lengths = sentence_lengths(body)
+        if lengths:
+            mean = sum(lengths) / len(lengths)
+            deviation = min(abs(mean - self.target_length) / self.target_length, 1.0)
+            penalty += self.penalties['sentence_length'] * deviation
+            if deviation > 0.25:
+                issues.append(f"avg sentence {mean:.1f} words (target {self.target_length:.1f})")
+        else:
+            penalty += self.penalties['sentence_length']
+            issues.append('no sentences')
+
+        used = set(PLACEHOLDER_RE.findall(f"{subject}\n{body}"))
+        for name in REQUIRED_PLACEHOLDERS:
+            if name not in used:
+                penalty += self.penalties['missing_placeholder']
+                issues.append(f"missing {{{{{name}}}}}")
+        for name in sorted(used - KNOWN_PLACEHOLDERS):
+            penalty += self.penalties['unknown_placeholder']
+            issues.append(f"unknown {{{{{name}}}}}")
+        if BRACKET_RE.search(body):
+            penalty += self.penalties['unfilled_bracket']
+            issues.append('unfilled [bracket] text')
+
+        words = len(SUBJECT_WORD_RE.findall(subject))
+        if not SUBJECT_WORDS[0] <= words <= SUBJECT_WORDS[1]:
+            penalty += self.penalties['subject_length']
+            issues.append(f"subject is {words} words")
+
+        return round(max(0.0, 1.0 - penalty), 4), issues
+
+    def score_set(self, templates):
+        """{template_key: (score, issues)} for a template_a/b/c dict"""
+        return {key: self.score(t) for key, t in templates.items() if isinstance(t, dict)}
+
+
+def score_snapshot(scorer, root, threshold):
+    """Score the email_templates table of a snapshot_export.py snapshot; returns the count below threshold"""
+    import snapshot_export
+    rows = snapshot_export.read_table('email_templates', root, columns=[
+        'version', 'template_variant', 'contact_type', 'active', 'subject_template', 'body_template']).to_pylist()
+    below = 0
+    for row in sorted(rows, key=lambda r: (r['version'] or '', r['contact_type'] or '', r['template_variant'] or '')):
+        score, issues = scorer.score({'subject': row['subject_template'], 'body': row['body_template']})
+        below += score < threshold
+        label = f"{row['version']} {row['template_variant']} {row['contact_type']}"
+        print(f"   {label:<32} {score:.2f}  {'active ' if row['active'] else ''}{'; '.join(issues) or 'ok'}")
+    print(f"[SNAPSHOT] {len(rows)} templates scored, {below} below {threshold:.2f}")
+    return below
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score generated templates against the voice profile')
+    parser.add_argument('files', nargs='*', help='templates_*.json files from generate_templates.py')
+    parser.add_argument('--snapshot', metavar='DIR', help='Score email_templates from a Parquet snapshot')
+    parser.add_argument('--profile-file', default=VOICE_PROFILE_FILE)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    args = parser.parse_args()
+    if not args.files and not args.snapshot:
+        parser.error('give at least one templates file or --snapshot')
+
+    scorer = ConformanceScorer(load_profile(args.profile_file))
+    below = 0
+    if args.snapshot:
+        below += score_snapshot(scorer, args.snapshot, args.threshold)
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        print(f"\n[FILE] {path}")
+        for key, (score, issues) in scorer.score_set(data.get('templates', data)).items():
+            below += score < args.threshold
+            print(f"   {key:<12} {score:.2f}  {'; '.join(issues) or 'ok'}")
+    sys.exit(1 if below else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Weekly Performance Rollup
+Purpose: Incrementally materialize email_instances into weekly_template_stats, then derive
+weekly_performance rows and the aggregate counters on email_templates from those rollups.
+
+Each run:
+  1. finds weeks touched since the last watermark: instances whose updated_at moved (any
+     edit, including a new template_id), instances of clinics whose updated_at moved (route
+     changes), and deleted instances (email_instance_deletions); a changed instance touches
+     both its current week and its created_at week, since sending a draft later moves it out
+     of the week it was counted in
+  2. deletes and re-inserts only those weeks' (week, template, route) counters in one
+     transaction, so groups that dropped to zero (e.g. after a route change) disappear
+  3. rebuilds weekly_performance for those weeks and email_templates counters for the
+     templates involved - both read O(weeks) rollup rows, never email_instances
+
+Weeks are bucketed by COALESCE(sent_at, created_at) in UTC. A sent_at moved from one week to
+another only recomputes the new week; run --full after back-dating sends. Requires
+database/migrations/add_weekly_template_stats.sql, add_email_instances_updated_at.sql and
+add_email_instance_deletions.sql.
+
+Usage:
+  python weekly_rollup.py                 # incremental
+  python weekly_rollup.py --full          # ignore watermark, rebuild every week
+  python weekly_rollup.py --benchmark --rows 5000000   # local Postgres only
+"""
+
+import os
+import sys
+import json
+import argparse
+from datetime import timedelta
+
+import bench_utils
+import db_utils
+
+# Fix Windows encoding issues
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+JOB_NAME = 'weekly_rollup'
+
+# Re-scan this much before the watermark so rows committed late are still picked up
+WATERMARK_OVERLAP = timedelta(minutes=30)
+
+CHANGED_WEEKS_SQL = f"""
+    SELECT week_start, max(changed_at) AS latest
+    FROM (
+        SELECT w.week_start, ei.updated_at AS changed_at
+        FROM email_instances ei
+        CROSS JOIN LATERAL (VALUES (date_trunc('week', COALESCE(ei.sent_at, ei.created_at))::date),
+                                   (date_trunc('week', ei.created_at)::date)) AS w(week_start)
+        WHERE %(since)s::timestamptz IS NULL OR ei.updated_at > %(since)s
+        UNION ALL
+        -- Any clinic update may be a route change: recompute every week holding its instances
+        SELECT date_trunc('week', COALESCE(ei.sent_at, ei.created_at))::date, c.updated_at
+        FROM {db_utils.CLINICS_TABLE} c
+        JOIN email_instances ei ON ei.clinic_id = c.id
+        WHERE %(since)s::timestamptz IS NOT NULL AND c.updated_at > %(since)s
+        UNION ALL
+        SELECT w.week_start, d.deleted_at
+        FROM email_instance_deletions d
+        CROSS JOIN LATERAL (VALUES (date_trunc('week', COALESCE(d.sent_at, d.created_at))::date),
+                                   (date_trunc('week', d.created_at)::date)) AS w(week_start)
+        WHERE %(since)s::timestamptz IS NULL OR d.deleted_at > %(since)s
+    ) changes
+    WHERE week_start IS NOT NULL
+    GROUP BY week_start
+"""
+
+CLEAR_WEEKS_SQL = """
+    DELETE FROM weekly_template_stats
+    WHERE week_start = ANY(%(weeks)s::date[])
+    RETURNING template_id::text
+"""
+
+ROLLUP_WEEKS_SQL = f"""
+    INSERT INTO weekly_template_stats
+        (week_start, template_id, route, drafted, sent, opens, clicks, responses,
+         response_hours_total, updated_at)
+    SELECT w.week_start,
+           ei.template_id,
+           COALESCE(c.abc_route_assignment, 'unassigned'),
+           count(*),
+           count(ei.sent_at),
+           count(ei.opened_at),
+           count(ei.clicked_at),
+           count(ei.responded_at),
+           COALESCE(sum(ei.response_time_hours), 0),
+           now()
+    FROM unnest(%(weeks)s::date[]) AS w(week_start)
+    JOIN email_instances ei
+      ON COALESCE(ei.sent_at, ei.created_at) >= w.week_start
+     AND COALESCE(ei.sent_at, ei.created_at) < w.week_start + 7
+    LEFT JOIN {db_utils.CLINICS_TABLE} c ON c.id = ei.clinic_id
+    WHERE ei.template_id IS NOT NULL
+    GROUP BY 1, 2, 3
+"""
+
+WEEK_STATS_SQL = """
+    SELECT s.week_start, s.template_id::text AS template_id, t.template_variant, s.route,
+           s.drafted, s.sent, s.opens, s.clicks, s.responses, s.response_hours_total
+    FROM weekly_template_stats s
+    JOIN email_templates t ON t.id = s.template_id
+    WHERE s.week_start = ANY(%s::date[])
+"""
+
+REFRESH_TEMPLATES_SQL = """
+    UPDATE email_templates t SET
+        times_used = COALESCE(s.drafted, 0),
+        total_opens = COALESCE(s.opens, 0),
+        total_clicks = COALESCE(s.clicks, 0),
+        total_responses = COALESCE(s.responses, 0),
+        avg_open_rate = round(100.0 * s.opens / NULLIF(s.sent, 0), 2),
+        avg_response_rate = round(100.0 * s.responses / NULLIF(s.sent, 0), 2),
+        quality_score = round(100.0 * (0.3 * s.opens + 0.2 * s.clicks + 0.5 * s.responses)
+                              / NULLIF(s.sent, 0), 2)
+    FROM (
+        -- LEFT JOIN so a template whose last rollup rows were just deleted drops to zero
+        SELECT ids.template_id, sum(w.drafted) AS drafted, sum(w.sent) AS sent, sum(w.opens) AS opens,
+               sum(w.clicks) AS clicks, sum(w.responses) AS responses
+        FROM unnest(%s::uuid[]) AS ids(template_id)
+        LEFT JOIN weekly_template_stats w ON w.template_id = ids.template_id
+        GROUP BY ids.template_id
+    ) s
+    WHERE t.id = s.template_id
+"""
+
+
+def _rates(stats):
+    sent = stats['sent']
+    stats['open_rate'] = round(stats['opens'] / sent, 4) if sent else 0.0
+    stats['click_rate'] = round(stats['clicks'] / sent, 4) if sent else 0.0
+    stats['response_rate'] = round(stats['responses'] / sent, 4) if sent else 0.0
+    stats['avg_response_hours'] = round(stats['response_hours_total'] / stats['responses'], 1) \
+        if stats['responses'] else None
+    return stats
+
+
+def build_weekly_performance(stat_rows):
+    """Fold rollup rows into one weekly_performance row per week (template_{a,b,c}_stats + winner)"""
+    counters = ('drafted', 'sent', 'opens', 'clicks', 'responses', 'response_hours_total')
+    weeks = {}
+    for row in stat_rows:
+        variant = (row['template_variant'] or '').lower()
+        if variant not in ('a', 'b', 'c'):
+            continue
+        week = weeks.setdefault(row['week_start'], {})
+        entry = week.setdefault(variant, {'templates': {}, 'stats': dict.fromkeys(counters, 0), 'by_route': {}})
+        for key in counters:
+            entry['stats'][key] += row[key]
+        entry['templates'][row['template_id']] = entry['templates'].get(row['template_id'], 0) + row['drafted']
+        route = entry['by_route'].setdefault(row['route'], dict.fromkeys(counters, 0))
+        for key in counters:
+            route[key] += row[key]
+
+    perf_rows = []
+    for week_start, variants in weeks.items():
+        row = {'week_start': week_start, 'week_end': week_start + timedelta(days=6),
+               'winning_template': None, 'winner_metrics': None}
+        best = None
+        for variant in ('a', 'b', 'c'):
+            entry = variants.get(variant)
+            if entry is None:
+                row[f'template_{variant}_id'] = None
+                row[f'template_{variant}_stats'] = None
+                continue
+            stats = _rates(entry['stats'])
+            stats['by_route'] = {name: _rates(r) for name, r in entry['by_route'].items()}
+            row[f'template_{variant}_id'] = max(entry['templates'], key=entry['templates'].get)
+            row[f'template_{variant}_stats'] = json.dumps(stats)
+            score = (stats['response_rate'], stats['open_rate'], stats['sent'])
+            if stats['sent'] and (best is None or score > best[0]):
+                best = (score, variant, stats)
+        if best is not None:
+            row['winning_template'] = best[1].upper()
+            row['winner_metrics'] = json.dumps({k: best[2][k] for k in
+                                                ('sent', 'open_rate', 'click_rate', 'response_rate')})
+        perf_rows.append(row)
+    return perf_rows
+
+
+def run_rollup(conn, full=False):
+    """One incremental pass; returns a summary dict"""
+    with conn.cursor() as cur:
+        cur.execute("SET TIME ZONE 'UTC'")
+    watermark = None if full else db_utils.get_watermark(conn, JOB_NAME)
+    since = watermark - WATERMARK_OVERLAP if watermark else None
+
+    summary = {'weeks': 0, 'stat_rows': 0, 'templates': 0}
+    with bench_utils.Stopwatch() as sw:
+        changed = db_utils.fetch_all(conn, CHANGED_WEEKS_SQL, {'since': since})
+        if changed:
+            weeks = sorted(r['week_start'] for r in changed)
+            latest = max((r['latest'] for r in changed if r['latest']), default=watermark)
+
+            # Delete + re-insert in one transaction: readers never see a half-rebuilt week
+            with conn.cursor() as cur:
+                cur.execute(CLEAR_WEEKS_SQL, {'weeks': weeks})
+                cleared_templates = {r[0] for r in cur.fetchall()}
+                cur.execute(ROLLUP_WEEKS_SQL, {'weeks': weeks})
+                summary['stat_rows'] = cur.rowcount
+            conn.commit()
+
+            stat_rows = db_utils.fetch_all(conn, WEEK_STATS_SQL, (weeks,))
+            perf_rows = build_weekly_performance(stat_rows)
+            empty_weeks = sorted(set(weeks) - {r['week_start'] for r in perf_rows})
+            if empty_weeks:
+                with conn.cursor() as cur:
+                    cur.execute("DELETE FROM weekly_performance WHERE week_start = ANY(%s::date[])", (empty_weeks,))
+                conn.commit()
+            perf_columns = ['week_start', 'week_end',
+                            'template_a_id', 'template_a_stats', 'template_b_id', 'template_b_stats',
+                            'template_c_id', 'template_c_stats', 'winning_template', 'winner_metrics']
+            db_utils.bulk_upsert(conn, 'weekly_performance', perf_rows, perf_columns, ['week_start'])
+
+            template_ids = sorted({r['template_id'] for r in stat_rows} | cleared_templates)
+            with conn.cursor() as cur:
+                cur.execute(REFRESH_TEMPLATES_SQL, (template_ids,))
+            conn.commit()
+
+            # Deletions behind the new watermark (minus the overlap) will never be read again
+            with conn.cursor() as cur:
+                cur.execute("DELETE FROM email_instance_deletions WHERE deleted_at < %s",
+                            (latest - WATERMARK_OVERLAP,))
+            db_utils.set_watermark(conn, JOB_NAME, latest)
+            summary.update(weeks=len(weeks), templates=len(template_ids))
+    summary['seconds'] = round(sw.seconds, 3)
+    return summary
+
+
+BENCH_SCHEMA_SQL = """
+    DROP SCHEMA IF EXISTS rollup_bench CASCADE;
+    CREATE SCHEMA rollup_bench;
+    SET search_path TO rollup_bench, public;
+    CREATE TABLE clinics_pending_review (id uuid PRIMARY KEY, abc_route_assignment text,
+                                         updated_at timestamptz DEFAULT now());
+    CREATE TABLE email_templates (
+        id uuid PRIMARY KEY, template_variant text, times_used integer DEFAULT 0,
+        total_opens integer DEFAULT 0, total_clicks integer DEFAULT 0, total_responses integer DEFAULT 0,
+        avg_open_rate numeric(5, 2), avg_response_rate numeric(5, 2), quality_score numeric(5, 2));
+    CREATE TABLE email_instances (
+        id uuid PRIMARY KEY DEFAULT gen_random_uuid(), clinic_id uuid, template_id uuid,
+        sent_at timestamptz, opened_at timestamptz, clicked_at timestamptz, responded_at timestamptz,
+        response_time_hours integer, created_at timestamptz DEFAULT now(), updated_at timestamptz DEFAULT now());
+    CREATE TABLE email_instance_deletions (
+        id bigserial PRIMARY KEY, instance_id uuid NOT NULL, created_at timestamptz, sent_at timestamptz,
+        deleted_at timestamptz NOT NULL DEFAULT now());
+    CREATE TABLE weekly_performance (
+        id uuid PRIMARY KEY DEFAULT gen_random_uuid(), week_start date NOT NULL UNIQUE, week_end date NOT NULL,
+        template_a_id uuid, template_a_stats jsonb, template_b_id uuid, template_b_stats jsonb,
+        template_c_id uuid, template_c_stats jsonb, winning_template text, winner_metrics jsonb);
+    CREATE TABLE weekly_template_stats (
+        week_start date NOT NULL, template_id uuid NOT NULL, route text NOT NULL DEFAULT 'unassigned',
+        drafted integer NOT NULL DEFAULT 0, sent integer NOT NULL DEFAULT 0, opens integer NOT NULL DEFAULT 0,
+        clicks integer NOT NULL DEFAULT 0, responses integer NOT NULL DEFAULT 0,
+        response_hours_total bigint NOT NULL DEFAULT 0, updated_at timestamptz DEFAULT now(),
+        PRIMARY KEY (week_start, template_id, route));
+    CREATE TABLE job_watermarks (job text PRIMARY KEY, watermark timestamptz, updated_at timestamptz DEFAULT now());
+"""
+
+BENCH_SEED_SQL = """
+    INSERT INTO clinics_pending_review
+    SELECT gen_random_uuid(), (ARRAY['route_a', 'route_b', 'route_c', NULL])[1 + (g %% 4)],
+           now() - interval '105 weeks'
+    FROM generate_series(1, 20000) g;
+
+    INSERT INTO email_templates (id, template_variant)
+    SELECT gen_random_uuid(), (ARRAY['A', 'B', 'C'])[1 + (g %% 3)] FROM generate_series(1, 312) g;
+
+    CREATE TEMP TABLE bench_clinics AS SELECT row_number() OVER () AS n, id FROM clinics_pending_review;
+    CREATE TEMP TABLE bench_templates AS SELECT row_number() OVER () AS n, id FROM email_templates;
+
+    INSERT INTO email_instances (clinic_id, template_id, created_at, sent_at, opened_at, clicked_at,
+                                 responded_at, response_time_hours, updated_at)
+    SELECT c.id, t.id, ts, ts + interval '1 hour',
+           CASE WHEN r < 0.6 THEN ts + interval '5 hours' END,
+           CASE WHEN r < 0.2 THEN ts + interval '6 hours' END,
+           CASE WHEN r < 0.1 THEN ts + interval '30 hours' END,
+           CASE WHEN r < 0.1 THEN 29 END,
+           ts
+    FROM (
+        SELECT g, now() - interval '104 weeks' + (g::float / %(rows)s) * interval '104 weeks' AS ts,
+               random() AS r
+        FROM generate_series(1, %(rows)s) g
+    ) s
+    JOIN bench_clinics c ON c.n = 1 + (s.g %% 20000)
+    JOIN bench_templates t ON t.n = 1 + ((s.g / 1000) %% 312);
+"""
+
+ADHOC_SQL = f"""
+    SELECT date_trunc('week', COALESCE(ei.sent_at, ei.created_at))::date, t.template_variant,
+           COALESCE(c.abc_route_assignment, 'unassigned'),
+           count(*), count(ei.sent_at), count(ei.opened_at), count(ei.responded_at)
+    FROM email_instances ei
+    JOIN email_templates t ON t.id = ei.template_id
+    LEFT JOIN {db_utils.CLINICS_TABLE} c ON c.id = ei.clinic_id
+    GROUP BY 1, 2, 3
+"""
+
+
+def run_benchmark(conn, rows, changed):
+    """Seed a throwaway schema with `rows` instances and time full vs incremental vs ad hoc"""
+    with bench_utils.Stopwatch() as sw:
+        with conn.cursor() as cur:
+            cur.execute(BENCH_SCHEMA_SQL)
+            cur.execute(BENCH_SEED_SQL, {'rows': rows})
+            index_sql = []
+            for migration in ('add_weekly_template_stats.sql', 'add_email_instances_updated_at.sql'):
+                with open(os.path.join('database', 'migrations', migration), 'r', encoding='utf-8') as f:
+                    index_sql += [s for s in f.read().split(';') if 'CREATE INDEX' in s and 'email_instances' in s]
+            for statement in index_sql:
+                cur.execute(statement.replace('public.', ''))
+            cur.execute("ANALYZE")
+        conn.commit()
+    print(f"[BENCH] Seeded {rows:,} email_instances in {sw.seconds:.1f}s")
+
+    results = {'rows': rows}
+    with bench_utils.Stopwatch() as sw:
+        db_utils.fetch_all(conn, ADHOC_SQL)
+    results['adhoc_aggregate_s'] = round(sw.seconds, 3)
+
+    results['full_rollup'] = run_rollup(conn, full=True)
+
+    with bench_utils.Stopwatch() as sw:
+        perf = db_utils.fetch_all(conn, "SELECT * FROM weekly_performance ORDER BY week_start")
+    results['read_weekly_performance_s'] = round(sw.seconds, 4)
+    results['weekly_performance_rows'] = len(perf)
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE email_instances SET opened_at = now(), updated_at = now()
+            WHERE id IN (SELECT id FROM email_instances WHERE opened_at IS NULL LIMIT %s)
+        """, (changed,))
+        cur.execute("""
+            INSERT INTO email_instances (clinic_id, template_id, created_at, sent_at)
+            SELECT clinic_id, template_id, now(), now() FROM email_instances LIMIT %s
+        """, (changed,))
+    conn.commit()
+    results['incremental_rollup'] = run_rollup(conn)
+
+    print(f"[BENCH] ad hoc aggregate over email_instances: {results['adhoc_aggregate_s']}s")
+    print(f"[BENCH] full rollup: {results['full_rollup']['seconds']}s "
+          f"({results['full_rollup']['weeks']} weeks)")
+    print(f"[BENCH] incremental rollup after {changed:,} opens + {changed:,} new sends: "
+          f"{results['incremental_rollup']['seconds']}s ({results['incremental_rollup']['weeks']} weeks)")
+    print(f"[BENCH] read weekly_performance: {results['read_weekly_performance_s']}s "
+          f"({results['weekly_performance_rows']} rows)")
+
+    with conn.cursor() as cur:
+        cur.execute("DROP SCHEMA rollup_bench CASCADE")
+    conn.commit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental weekly_performance rollup')
+    parser.add_argument('--full', action='store_true', help='Ignore the watermark and rebuild all weeks')
+    parser.add_argument('--benchmark', action='store_true', help='Run against a throwaway schema')
+    parser.add_argument('--rows', type=int, default=5_000_000, help='Benchmark email_instances rows')
+    parser.add_argument('--changed', type=int, default=10_000, help='Benchmark rows changed before re-run')
+    args = parser.parse_args()
+
+    conn = db_utils.get_connection()
+    try:
+        if args.benchmark:
+            results = run_benchmark(conn, args.rows, args.changed)
+            with open('rollup_benchmark.json', 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, default=str)
+            print("[SAVED] rollup_benchmark.json")
+            return
+
+        summary = run_rollup(conn, full=args.full)
+        if summary['weeks']:
+            print(f"[SUCCESS] Rolled up {summary['weeks']} weeks, {summary['stat_rows']} stat rows, "
+                  f"{summary['templates']} templates in {summary['seconds']}s")
+        else:
+            print("[OK] No email_instances changed since last run")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()